@@ -252,7 +252,14 @@ class Configurator(PyramidConfigurator):
                            make_default=False, configuration=None, _info=u''):
         if configuration is None:
             configuration = {}
-        setting_info = [('db_string', 'db_string')]
+        setting_info = [('db_string', 'db_string'),
+                        ('pool_size', 'db_pool_size'),
+                        ('pool_max_overflow', 'db_pool_max_overflow'),
+                        ('pool_timeout', 'db_pool_timeout'),
+                        ('pool_recycle', 'db_pool_recycle'),
+                        ('pool_pre_ping', 'db_pool_pre_ping'),
+                        ('pool_statistics', 'db_pool_statistics'),
+                        ('replica_db_strings', 'db_replica_strings')]
         configuration.update(
                         self.get_configuration_from_settings(setting_info))
         self.add_repository(name, REPOSITORY_TYPES.RDB, repository_class,
@@ -265,7 +272,8 @@ class Configurator(PyramidConfigurator):
         if configuration is None:
             configuration = {}
         setting_info = [('directory', 'fs_directory'),
-                        ('content_type', 'fs_contenttype')]
+                        ('content_type', 'fs_contenttype'),
+                        ('dump_delay', 'fs_dump_delay')]
         configuration.update(
                         self.get_configuration_from_settings(setting_info))
         self.add_repository(name, REPOSITORY_TYPES.FILE_SYSTEM,
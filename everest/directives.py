@@ -28,6 +28,8 @@ from zope.configuration.fields import Tokens # pylint: disable=E0611,F0401
 from zope.interface import Interface # pylint: disable=E0611,F0401
 from zope.interface import implementer # pylint: disable=E0611,F0401
 from zope.schema import Choice # pylint: disable=E0611,F0401
+from zope.schema import Float # pylint: disable=E0611,F0401
+from zope.schema import Int # pylint: disable=E0611,F0401
 from zope.schema import TextLine # pylint: disable=E0611,F0401
 from everest.constants import ResourceReferenceRepresentationKinds
 
@@ -102,14 +104,29 @@ class IMemoryRepositoryDirective(IRepositoryDirective):
                             "returns a sequence of entity instances which "
                             "will be used to populate the cache on startup.",
                      required=False)
+    columnar_store = \
+        Bool(title=u"Indicates if the entity state should be stored in "
+                    "compact columnar caches. Defaults to False.",
+             required=False
+             )
+    entity_cache_class = \
+        GlobalObject(title=u"The entity cache class to use for the caches "
+                            "of this repository and of its sessions. "
+                            "Defaults to the ordered entity cache.",
+                     required=False)
 
 
 def memory_repository(_context, name=None, make_default=False,
                       aggregate_class=None, repository_class=None,
-                      cache_loader=None):
+                      cache_loader=None, columnar_store=None,
+                      entity_cache_class=None):
     cnf = {}
     if not cache_loader is None:
         cnf['cache_loader'] = cache_loader
+    if not columnar_store is None:
+        cnf['columnar_store'] = columnar_store
+    if not entity_cache_class is None:
+        cnf['entity_cache_class'] = entity_cache_class
     _repository(_context, name, make_default,
                 aggregate_class, repository_class,
                 REPOSITORY_TYPES.MEMORY, 'add_memory_repository', cnf)
@@ -126,11 +143,23 @@ class IFileSystemRepositoryDirective(IRepositoryDirective):
         GlobalObject(title=u"The (MIME) content type to use for the "
                             "representation files. Defaults to CSV.",
                      required=False)
+    dump_delay = \
+        Float(title=u"Delay (in seconds) for writing changes back to the "
+                     "representation files. All changes committed within "
+                     "the delay period are written together. Defaults to "
+                     "0 (changes are written with each commit).",
+              required=False)
+    dump_hook = \
+        GlobalObject(title=u"A callable that is invoked after each write with "
+                            "a dictionary mapping the written entity classes "
+                            "to the number of bytes written.",
+                     required=False)
 
 
 def filesystem_repository(_context, name=None, make_default=False,
                           aggregate_class=None, repository_class=None,
-                          directory=None, content_type=None):
+                          directory=None, content_type=None,
+                          dump_delay=None, dump_hook=None):
     """
     Directive for registering a file-system based repository.
     """
@@ -139,6 +168,10 @@ def filesystem_repository(_context, name=None, make_default=False,
         cnf['directory'] = directory
     if not content_type is None:
         cnf['content_type'] = content_type
+    if not dump_delay is None:
+        cnf['dump_delay'] = dump_delay
+    if not dump_hook is None:
+        cnf['dump_hook'] = dump_hook
     _repository(_context, name, make_default,
                 aggregate_class, repository_class,
                 REPOSITORY_TYPES.FILE_SYSTEM, 'add_filesystem_repository',
@@ -154,11 +187,47 @@ class IRdbRepositoryDirective(IRepositoryDirective):
         GlobalObject(title=u"Callback that initializes and returns the "
                             "metadata for the DB.",
                      required=False)
+    pool_class = \
+        GlobalObject(title=u"Connection pool class to use for the DB engine. "
+                            "Defaults to the pool class selected by the "
+                            "DB dialect.",
+                     required=False)
+    pool_size = \
+        Int(title=u"Number of connections to keep open in the pool.",
+            required=False)
+    pool_max_overflow = \
+        Int(title=u"Number of connections that can be opened in excess of "
+                   "the pool size.",
+            required=False)
+    pool_timeout = \
+        Int(title=u"Number of seconds to wait for a connection from the "
+                   "pool before giving up.",
+            required=False)
+    pool_recycle = \
+        Int(title=u"Number of seconds after which pooled connections are "
+                   "recycled.",
+            required=False)
+    pool_pre_ping = \
+        Bool(title=u"Test connections for liveness on checkout from the "
+                    "pool. Defaults to false.",
+             required=False)
+    pool_statistics = \
+        Bool(title=u"Record connection pool usage statistics. Defaults to "
+                    "false.",
+             required=False)
+    replica_db_strings = \
+        Tokens(title=u"Strings to use to connect to read replicas of the DB. "
+                      "Read only queries are routed to the replicas.",
+               value_type=TextLine(),
+               required=False)
 
 
 def rdb_repository(_context, name=None, make_default=False,
                    aggregate_class=None, repository_class=None,
-                   db_string=None, metadata_factory=None):
+                   db_string=None, metadata_factory=None,
+                   pool_class=None, pool_size=None, pool_max_overflow=None,
+                   pool_timeout=None, pool_recycle=None, pool_pre_ping=None,
+                   pool_statistics=None, replica_db_strings=None):
     """
     Directive for registering a RDBM based repository.
     """
@@ -167,6 +236,16 @@ def rdb_repository(_context, name=None, make_default=False,
         cnf['db_string'] = db_string
     if not metadata_factory is None:
         cnf['metadata_factory'] = metadata_factory
+    for option, value in (('pool_class', pool_class),
+                          ('pool_size', pool_size),
+                          ('pool_max_overflow', pool_max_overflow),
+                          ('pool_timeout', pool_timeout),
+                          ('pool_recycle', pool_recycle),
+                          ('pool_pre_ping', pool_pre_ping),
+                          ('pool_statistics', pool_statistics),
+                          ('replica_db_strings', replica_db_strings)):
+        if not value is None:
+            cnf[option] = value
     _repository(_context, name, make_default,
                 aggregate_class, repository_class,
                 REPOSITORY_TYPES.RDB, 'add_rdb_repository', cnf)
@@ -94,6 +94,12 @@ class Aggregate(object):
         self._order_spec = None
         #: Key for slicing. (:type:`slice`).
         self._slice_key = None
+        #: Key for keyset pagination
+        #: (:class:`everest.querying.ordering.Keyset`).
+        self._keyset = None
+        #: (Possibly dotted) names of related entity attributes to load
+        #: eagerly.
+        self._load_attributes = None
 
     def clone(self):
         """
@@ -104,6 +110,8 @@ class Aggregate(object):
         clone._filter_spec = self._filter_spec
         clone._order_spec = self._order_spec
         clone._slice_key = self._slice_key
+        clone._keyset = self._keyset
+        clone._load_attributes = self._load_attributes
         # pylint: enable=W0212
         return clone
 
@@ -116,7 +124,13 @@ class Aggregate(object):
 
         :returns: An iterator for the aggregate entities.
         """
-        return iter(self._get_ordered_query(None))
+        query = self._get_ordered_query(None)
+        if not self._keyset is None and not self._keyset.is_forward:
+            # Backward keyset pages are retrieved in reverse order.
+            result = reversed(list(query))
+        else:
+            result = iter(query)
+        return result
 
     def __iter__(self):
         return self.iterator()
@@ -145,6 +159,24 @@ class Aggregate(object):
         """
         raise NotImplementedError('Abstract method.')
 
+    def get_by_ids(self, id_keys):
+        """
+        Returns the entities for the given sequence of IDs. This default
+        implementation looks up the entities one by one; subclasses may
+        override this with a batched lookup.
+
+        :note: If a filter is set, only entities matching it are returned.
+        :param id_keys: Sequence of ID values to look up.
+        :returns: List of the entities found, in the order of the given IDs
+          (IDs without a matching entity are skipped).
+        """
+        ents = []
+        for id_key in id_keys:
+            ent = self.get_by_id(id_key)
+            if not ent is None:
+                ents.append(ent)
+        return ents
+
     def get_by_slug(self, slug):
         """
         Returns an entity by slug or `None` if the entity is not found.
@@ -261,6 +293,30 @@ class Aggregate(object):
 
     slice = property(_get_slice, _set_slice)
 
+    def _get_keyset(self):
+        #: Returns the keyset for this aggregate.
+        return self._keyset
+
+    def _set_keyset(self, keyset):
+        #: Sets the keyset for this aggregate. If a keyset is set, the
+        #: slice key is applied relative to the keyset position.
+        self._keyset = keyset
+
+    keyset = property(_get_keyset, _set_keyset)
+
+    def _get_load_attributes(self):
+        #: Returns the names of the related entity attributes to load
+        #: eagerly.
+        return self._load_attributes
+
+    def _set_load_attributes(self, attribute_names):
+        #: Sets the names of the related entity attributes to load eagerly
+        #: when iterating over this aggregate. This is used to avoid one
+        #: query per entity when related entities are accessed later.
+        self._load_attributes = attribute_names
+
+    load_attributes = property(_get_load_attributes, _set_load_attributes)
+
     def _query_optimizer(self, query, slice_key): # unused pylint: disable=W0613
         """
         Override this to generate optimized queries based on the given
@@ -300,20 +356,52 @@ class Aggregate(object):
         query = self._query_optimizer(self.query(), key)
         query = self.__filter_query(query)
         query = self.__order_query(query)
+        query = self.__load_query(query)
         return self.__slice_query(query)
 
+    def _apply_filter(self, query, filter_spec):
+        """
+        Applies the given filter specification to the given query.
+
+        Override this to customize the way filter expressions are built.
+        """
+        vst = self._filter_visitor_factory()
+        filter_spec.accept(vst)
+        return vst.filter_query(query)
+
+    def _get_order_visitor(self, order_spec):
+        """
+        Returns an order specification visitor that has visited the given
+        order specification.
+
+        Override this to customize the way order expressions are built.
+        """
+        vst = self._order_visitor_factory()
+        order_spec.accept(vst)
+        return vst
+
     def __filter_query(self, query):
         if not self.filter is None:
-            vst = self._filter_visitor_factory()
-            self.filter.accept(vst)
-            query = vst.filter_query(query)
+            query = self._apply_filter(query, self.filter)
         return query
 
     def __order_query(self, query):
-        if not self._order_spec is None:
-            vst = self._order_visitor_factory()
-            self._order_spec.accept(vst)
-            query = vst.order_query(query)
+        if not self._keyset is None:
+            order_spec = self._keyset.get_order(self._order_spec)
+        else:
+            order_spec = self._order_spec
+        if not order_spec is None:
+            vst = self._get_order_visitor(order_spec)
+            if not self._keyset is None \
+               and not self._keyset.values is None:
+                query = vst.seek_query(query, self._keyset.values)
+            else:
+                query = vst.order_query(query)
+        return query
+
+    def __load_query(self, query):
+        if self._load_attributes:
+            query = query.load(*self._load_attributes)
         return query
 
     def __slice_query(self, query):
@@ -385,13 +473,21 @@ class RootAggregate(Aggregate):
             ent = None
         return ent
 
+    def get_by_ids(self, id_keys):
+        ents = self._session.get_by_ids(self.entity_class, id_keys)
+        if not self._filter_spec is None:
+            ents = [ent for ent in ents
+                    if self._filter_spec.is_satisfied_by(ent)]
+        return ents
+
     def get_by_slug(self, slug):
-        ent = self._session.get_by_slug(self.entity_class, slug)
-        if ent is None:
-            try:
+        try:
+            ent = self._session.get_by_slug(self.entity_class, slug)
+            if ent is None:
+                # The session can not look up slugs; run a query.
                 ent = self.query().filter_by(slug=slug).one()
-            except NoResultsException:
-                pass
+        except NoResultsException:
+            ent = None
         if not ent is None \
            and not self._filter_spec is None \
            and not self._filter_spec.is_satisfied_by(ent):
@@ -446,12 +542,24 @@ class RelationshipAggregate(Aggregate):
         self._root_aggregate = root_aggregate
         self._relationship = relationship
 
+    def clone(self):
+        clone = Aggregate.clone(self)
+        # protected pylint: disable=W0212
+        clone._root_aggregate = self._root_aggregate
+        clone._relationship = self._relationship
+        # pylint: enable=W0212
+        return clone
+
     def get_by_id(self, id_key):
         ent = self._root_aggregate.get_by_id(id_key)
         if not ent is None and not self.filter.is_satisfied_by(ent):
             ent = None
         return ent
 
+    def get_by_ids(self, id_keys):
+        return [ent for ent in self._root_aggregate.get_by_ids(id_keys)
+                if self.filter.is_satisfied_by(ent)]
+
     def get_by_slug(self, slug):
         ent = self._root_aggregate.get_by_slug(slug)
         if not ent is None and not self.filter.is_satisfied_by(ent):
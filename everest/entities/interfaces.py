@@ -56,6 +56,10 @@ class IAggregate(Interface):
         """
         """
 
+    def get_by_ids(id_keys):
+        """
+        """
+
     def get_by_slug(slug):
         """
         """
@@ -194,6 +194,8 @@ class AruVisitor(ResourceDataTreeVisitor):
 
 
 class DomainDataTraversalProxy(DataTraversalProxy):
+    __slots__ = ()
+
     def get_id(self):
         return self._data.id
 
@@ -218,6 +220,9 @@ class DomainDataTraversalProxy(DataTraversalProxy):
     def _make_accessor(self, value_type):
         return self._accessor.get_root_aggregate(value_type)
 
+    def _get_attribute_cache_key(self):
+        return type(self._data)
+
 
 class DomainDataTraversalProxyAdapter(DataTraversalProxyAdapter):
     proxy_class = DomainDataTraversalProxy
@@ -235,6 +240,8 @@ class DomainDataTraversalProxyAdapter(DataTraversalProxyAdapter):
 
 
 class LinkedDomainDataTraversalProxy(DomainDataTraversalProxy):
+    __slots__ = ()
+
     def do_traverse(self):
         return False
 
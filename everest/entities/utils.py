@@ -8,6 +8,7 @@ Created on Nov 3, 2011.
 """
 from everest.entities.interfaces import IEntity
 from everest.repositories.utils import as_repository
+from everest.resources.classmap import lookup_resource_class
 from pyramid.threadlocal import get_current_registry
 from zope.interface import providedBy as provided_by # pylint: disable=E0611,F0401
 from zope.interface.interfaces import IInterface # pylint: disable=E0611,F0401
@@ -44,11 +45,13 @@ def get_entity_class(resource):
     :return: entity class
         (class implementing `everest.entities.interfaces.IEntity`)
     """
-    reg = get_current_registry()
-    if IInterface in provided_by(resource):
-        ent_cls = reg.getUtility(resource, name='entity-class')
-    else:
-        ent_cls = reg.getAdapter(resource, IEntity, name='entity-class')
+    ent_cls = lookup_resource_class(resource, 'entity-class')
+    if ent_cls is None:
+        reg = get_current_registry()
+        if IInterface in provided_by(resource):
+            ent_cls = reg.getUtility(resource, name='entity-class')
+        else:
+            ent_cls = reg.getAdapter(resource, IEntity, name='entity-class')
     return ent_cls
 
 
@@ -7,10 +7,10 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 Created on Nov 24, 2011.
 """
 from everest.entities.system import UserMessage
-from everest.interfaces import IUserMessage
 from everest.interfaces import IUserMessageChecker
 from everest.interfaces import IUserMessageNotifier
 from pyramid.threadlocal import get_current_registry
+from threading import local
 from zope.interface import implementer # pylint: disable=E0611,F0401
 
 __docformat__ = 'reStructuredText en'
@@ -35,7 +35,10 @@ class UserMessageNotifier(object):
         msg = UserMessage(message_text)
         reg = get_current_registry()
         vote = True
-        checkers = reg.subscribers([msg], IUserMessageChecker)
+        checkers = reg.subscribers([msg], IUserMessageChecker) \
+                   + [checker(msg)
+                      for (chk_reg, checker) in _checker_state.checkers
+                      if chk_reg is reg]
         for checker in checkers:
             vote = checker.check()
             if vote is False:
@@ -78,10 +81,26 @@ class UserMessageChecker(object):
         raise NotImplementedError('Abstract method.')
 
 
+class _CheckerState(local):
+    # Thread local state for the user message handling context manager.
+    # Holds (registry, checker) tuples in the order the checkers were
+    # subscribed.
+    def __init__(self):
+        local.__init__(self)
+        self.checkers = []
+
+_checker_state = _CheckerState()
+
+
 class UserMessageHandlingContextManager(object):
     """
     A context which sets up a user message checker as a subscriber to
     user messages.
+
+    The checker is notified of messages sent through the current registry
+    from the current thread only, after the checkers registered as
+    subscribers with the registry. The registry itself is not modified, so
+    concurrent requests do not see each other's checkers.
     """
     def __init__(self, checker):
         """
@@ -91,13 +110,11 @@ class UserMessageHandlingContextManager(object):
         :type checker: :class:`everest.messaging.UserMessageChecker` instance.
         """
         self.__checker = checker
+        self.__item = None
 
     def __enter__(self):
-        reg = get_current_registry()
-        reg.registerSubscriptionAdapter(self.__checker, (IUserMessage,),
-                                        IUserMessageChecker)
+        self.__item = (get_current_registry(), self.__checker)
+        _checker_state.checkers.append(self.__item)
 
     def __exit__(self, ext_type, value, tb):
-        reg = get_current_registry()
-        reg.unregisterSubscriptionAdapter(self.__checker, (IUserMessage,),
-                                          IUserMessageChecker)
+        _checker_state.checkers.remove(self.__item)
@@ -191,6 +191,10 @@ class Query(object):
         self._slice_key = slice(start, stop)
         return self
 
+    def load(self, *attribute_names): # pylint: disable=W0613
+        # Related entities are held in memory; nothing to load eagerly.
+        return self
+
 
 class ExpressionBuilderMixin(object):
     """
@@ -77,6 +77,9 @@ class FilterSpecificationVisitor(SpecificationVisitor):
     def _in_range_op(self, spec):
         raise NotImplementedError('Abstract method.')
 
+    def _in_set_op(self, spec):
+        raise NotImplementedError('Abstract method.')
+
 
 class CqlFilterExpression(CqlExpression):
     """
@@ -133,6 +136,19 @@ class CqlFilterSpecificationVisitor(FilterSpecificationVisitor):
 
     __cql_range_format = '%(from_value)s-%(to_value)s'
 
+    def __init__(self):
+        FilterSpecificationVisitor.__init__(self)
+        self.__has_resource_values = False
+
+    @property
+    def has_resource_values(self):
+        """
+        Flag indicating if the visited specification contains resource
+        values. These are rendered as URLs which depend on the current
+        request, so the expression should not be cached in this case.
+        """
+        return self.__has_resource_values
+
     def _starts_with_op(self, spec):
         return CqlFilterExpression(self.__preprocess_attribute(spec.attr_name),
                                    STARTS_WITH.name,
@@ -190,6 +206,16 @@ class CqlFilterSpecificationVisitor(FilterSpecificationVisitor):
                                    IN_RANGE.name,
                                    value)
 
+    def _in_set_op(self, spec):
+        # In-set specifications are written as multi-valued equal to
+        # criteria; the values are sorted by their string representation to
+        # make the expression stable (also for values of mixed types).
+        value_string = ','.join(sorted([self.__preprocess_value(val)
+                                        for val in spec.attr_value]))
+        return CqlFilterExpression(self.__preprocess_attribute(spec.attr_name),
+                                   EQUAL_TO.name,
+                                   value_string)
+
     def _conjunction_op(self, spec, *expressions):
         return func_reduce(operator_and, expressions)
 
@@ -206,6 +232,7 @@ class CqlFilterSpecificationVisitor(FilterSpecificationVisitor):
         if isinstance(value, string_types):
             result = '"%s"' % value
         elif IResource.providedBy(value): # pylint: disable=E1101
+            self.__has_resource_values = True
             result = '"%s"' % resource_to_url(value)
         else:
             result = str(value)
@@ -13,9 +13,12 @@ from pyparsing import Combine
 from pyparsing import Empty
 from pyparsing import Forward
 from pyparsing import Group
+from pyparsing import Keyword
 from pyparsing import Literal
 from pyparsing import OneOrMore
 from pyparsing import Optional
+from pyparsing import ParseException
+from pyparsing import ParserElement
 from pyparsing import Regex
 from pyparsing import Word
 from pyparsing import ZeroOrMore
@@ -48,16 +51,22 @@ from everest.querying.specifications import ends
 from everest.querying.specifications import eq
 from everest.querying.specifications import ge
 from everest.querying.specifications import gt
+from everest.querying.specifications import in_set
 from everest.querying.specifications import le
 from everest.querying.specifications import lt
 from everest.querying.specifications import rng
 from everest.querying.specifications import starts
 from everest.resources.interfaces import ICollectionResource
+from everest.resources.interfaces import IResource
 from everest.resources.utils import url_to_resource
+from everest.utils import get_registry_lru_cache
+import re
 
 
 __docformat__ = 'reStructuredText en'
-__all__ = ['parse_filter',
+__all__ = ['CqlFilterParser',
+           'parse_filter',
+           'parse_filter_reference',
            ]
 
 # Adapted from the iso8601 package to *require* a full yyyy-mm-ddThh:mm:ssZ
@@ -73,15 +82,19 @@ ISO8601_REGEX = r'(?P<year>[0-9]{4})' \
                 r'(?P<timezone>Z|(([-+])([0-9]{2}):([0-9]{2})))?'
 
 
+# Maximum number of parsed filter specifications to cache.
+PARSE_CACHE_SIZE = 256
+
 AND_PAT = 'and'
 OR_PAT = 'or'
+TILDE_PAT = '~'
 
 BINARY = 2
 
 colon = Literal(':')
 comma = Literal(',')
 dot = Literal('.')
-tilde = Literal('~')
+tilde = Literal(TILDE_PAT)
 slash = Literal('/')
 open_paren = Literal('(')
 close_paren = Literal(')')
@@ -98,7 +111,10 @@ or_op = CaselessKeyword(OR_PAT).setParseAction(replaceWith(OR_PAT))
 
 
 def convert_number(toks):
-    str_val = toks[0]
+    return convert_number_value(toks[0])
+
+
+def convert_number_value(str_val):
     if '.' in str_val or 'e' in str_val:
         val = float(str_val)
     else:
@@ -107,7 +123,10 @@ def convert_number(toks):
 
 
 def convert_date(toks):
-    date_val = toks[0][0]
+    return convert_date_value(toks[0][0])
+
+
+def convert_date_value(date_val):
     try:
         res = parse_date(date_val)
     except ParseError:
@@ -135,17 +154,25 @@ class CriterionConverter(object):
     @classmethod
     def convert(cls, toks):
         crit = toks[0]
+        return cls.make_spec(crit.name, crit.operator, crit.value)
+
+    @classmethod
+    def make_spec(cls, name, operator, values):
+        """
+        Creates a filter specification from the given criterion attribute
+        name, operator name and sequence of values.
+        """
         # Extract attribute name.
-        attr_name = cls.__prepare_identifier(crit.name)
+        attr_name = cls.__prepare_identifier(name)
         # Extract operator name.
-        op_name = cls.__prepare_identifier(crit.operator)
+        op_name = cls.__prepare_identifier(operator)
         if op_name.startswith("not_"):
             op_name = op_name[4:]
             negate = True
         else:
             negate = False
         # Extract attribute value.
-        if len(crit.value) == 0:
+        if len(values) == 0:
             raise ValueError('Criterion does not define a value.')
 #        elif len(crit.value) == 1 and isinstance(crit.value, ParseResults):
 #            # URLs - convert to resource.
@@ -162,21 +189,32 @@ class CriterionConverter(object):
 #                rc.filter = url_val.query
 #            attr_value = rc
 #            value_is_resource = True
-        elif len(crit.value) == 1 \
-             and ICollectionResource.providedBy(crit.value[0]): # pylint: disable=E1101
-            attr_value = crit.value[0]
+        elif len(values) == 1 \
+             and ICollectionResource.providedBy(values[0]): # pylint: disable=E1101
+            attr_value = values[0]
             value_is_resource = True
         else:
-            attr_value = cls.__prepare_values(crit.value)
+            attr_value = cls.__prepare_values(values)
             value_is_resource = False
         spec_gen = cls.spec_map[op_name]
         if op_name == CONTAINED.name or value_is_resource:
             spec = spec_gen(**{attr_name:attr_value})
             if negate:
                 spec = ~spec
+        elif op_name == EQUAL_TO.name and len(attr_value) > 1 \
+             and not any([IResource.providedBy(val) # pylint: disable=E1101
+                          for val in attr_value]):
+            # Multiple equal to values are checked with a single set lookup;
+            # the negated form is NOT IN.
+            spec = in_set(**{attr_name:attr_value})
+            if negate:
+                spec = ~spec
         else:
             # Create a spec for each value and concatenate with OR.
             spec = cls.__make_spec(spec_gen, attr_name, attr_value, negate)
+            if spec is None:
+                # All values were empty strings.
+                raise ValueError('Criterion does not define a value.')
         return spec
 
     @classmethod
@@ -210,15 +248,20 @@ class CriterionConverter(object):
 
 
 def convert_conjunction(toks):
-    left_spec = toks[0][0]
-    right_spec = toks[0][-1]
-    return left_spec & right_spec
+    # The operands are interleaved with the operator tokens.
+    specs = toks[0][::2]
+    spec = specs[0]
+    for right_spec in specs[1:]:
+        spec = spec & right_spec
+    return spec
 
 
 def convert_disjunction(toks):
-    left_spec = toks[0][0]
-    right_spec = toks[0][-1]
-    return left_spec | right_spec
+    specs = toks[0][::2]
+    spec = specs[0]
+    for right_spec in specs[1:]:
+        spec = spec | right_spec
+    return spec
 
 
 def convert_simple_criteria(toks):
@@ -233,11 +276,15 @@ def convert_simple_criteria(toks):
 
 
 def convert_string(toks):
-    unquoted = toks[0][1:-1]
-    if len(url_protocol.searchString(unquoted)) > 0:
-        result = [url_to_resource(unquoted)]
+    return [convert_string_value(toks[0][1:-1])]
+
+
+def convert_string_value(value):
+    # URLs are detected as strings containing the http(s) protocol.
+    if 'http' in value:
+        result = url_to_resource(value)
     else:
-        result = [unquoted]
+        result = value
     return result
 
 
@@ -255,9 +302,6 @@ cql_date = Combine(dbl_quote.suppress() + Regex(ISO8601_REGEX) +
 # removed.
 cql_string = (dblQuotedString | sglQuotedString).setParseAction(convert_string)
 
-# URLs are detected as strings starting with the http(s) protocol.
-url_protocol = Combine(Literal('http') + Optional('s'))
-
 # Number range.
 # FIXME: char ranges are not supported yet
 cql_number_range = Group(cql_number + '-' + cql_number
@@ -301,8 +345,275 @@ simple_criteria.setParseAction(convert_simple_criteria)
 query = (simple_criteria | junctions) # pylint: disable=W0104
 
 
+WHITESPACE_CHARS = ParserElement.DEFAULT_WHITE_CHARS
+KEYWORD_CHARS = Keyword.DEFAULT_KEYWORD_CHARS
+IDENTIFIER_REGEX = r'[a-zA-Z][a-zA-Z0-9-]*(?:\.[a-zA-Z][a-zA-Z0-9-]*)*'
+NUMBER_REGEX = r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][0-9+-][0-9]*)?'
+STRING_REGEX = dblQuotedString.re.pattern + '|' + sglQuotedString.re.pattern
+
+
+class CqlFilterParser(object):
+    """
+    Hand-written recursive descent parser for CQL filter expressions.
+
+    Accepts the language of the pyparsing grammar in this module (which
+    serves as the reference implementation) and builds the same filter
+    specifications. This includes the grammar's quirks: trailing input is
+    ignored and, as with the look-ahead in pyparsing's operator precedence
+    expressions, criteria are only converted to specifications (which may
+    raise errors) once the enclosing junction is known to parse.
+
+    All rules take a start position and a flag indicating if the matched
+    input should be converted; they return a tuple holding the
+    specification (or **None** if not converting) and the end position, or
+    **None** if the rule does not match.
+    """
+    __identifier = re.compile(IDENTIFIER_REGEX)
+    __number = re.compile(NUMBER_REGEX)
+    __date = re.compile(ISO8601_REGEX)
+    __string = re.compile(STRING_REGEX)
+
+    def __init__(self, query_string):
+        # Like pyparsing, we expand tabs before parsing.
+        self.__text = query_string.expandtabs()
+        self.__memo = {}
+        self.__has_resources = False
+
+    def parse(self):
+        """
+        Parses the query string.
+
+        :raises ParseException: if the query string does not start with a
+          valid filter expression.
+        :returns: filter specification.
+        """
+        result = self.__parse_simple_criteria(0)
+        if result is None:
+            result = self.__apply(self.__parse_disjunction, 0, True)
+            if result is None:
+                raise ParseException(self.__text, 0,
+                                     'Expected filter expression')
+        return result[0]
+
+    @property
+    def has_resources(self):
+        """
+        Flag indicating if the last parse resolved resource URLs.
+        """
+        return self.__has_resources
+
+    def __apply(self, rule, pos, convert):
+        # Packrat style memoization of rule results.
+        key = (rule, pos, convert)
+        if key in self.__memo:
+            result = self.__memo[key]
+        else:
+            result = self.__memo[key] = rule(pos, convert)
+        return result
+
+    def __parse_simple_criteria(self, pos):
+        # Old-style criteria separated by "~"; at least two are required.
+        result = self.__apply(self.__parse_criterion, pos, True)
+        if not result is None:
+            spec, pos = result
+            crit_count = 1
+            while True:
+                sep_pos = self.__skip_whitespace(pos)
+                if not self.__text.startswith(TILDE_PAT, sep_pos):
+                    break
+                crit_result = self.__apply(self.__parse_criterion,
+                                           sep_pos + 1, True)
+                if crit_result is None:
+                    break
+                spec = spec & crit_result[0]
+                pos = crit_result[1]
+                crit_count += 1
+            if crit_count == 1:
+                result = None
+            else:
+                result = spec, pos
+        return result
+
+    def __parse_disjunction(self, pos, convert):
+        return self.__parse_junction(pos, convert, OR_PAT,
+                                     self.__parse_conjunction,
+                                     lambda left, right: left | right)
+
+    def __parse_conjunction(self, pos, convert):
+        return self.__parse_junction(pos, convert, AND_PAT,
+                                     self.__parse_element,
+                                     lambda left, right: left & right)
+
+    def __parse_junction(self, pos, convert, keyword, operand_rule,
+                         combine):
+        # Look ahead for at least one operator and operand without
+        # converting anything.
+        is_junction = False
+        result = self.__apply(operand_rule, pos, False)
+        if not result is None:
+            op_pos = self.__match_keyword(keyword, result[1])
+            is_junction = not op_pos is None \
+                and not self.__apply(operand_rule, op_pos, False) is None
+        if not is_junction:
+            result = self.__apply(operand_rule, pos, convert)
+        else:
+            spec, pos = self.__apply(operand_rule, pos, convert)
+            while True:
+                op_pos = self.__match_keyword(keyword, pos)
+                if op_pos is None:
+                    break
+                operand_result = self.__apply(operand_rule, op_pos, convert)
+                if operand_result is None:
+                    break
+                if convert:
+                    spec = combine(spec, operand_result[0])
+                pos = operand_result[1]
+            result = spec, pos
+        return result
+
+    def __parse_element(self, pos, convert):
+        result = self.__apply(self.__parse_criterion, pos, convert)
+        if result is None:
+            pos = self.__skip_whitespace(pos)
+            if self.__text.startswith('(', pos):
+                result = self.__apply(self.__parse_disjunction, pos + 1,
+                                      convert)
+                if not result is None:
+                    close_pos = self.__skip_whitespace(result[1])
+                    if self.__text.startswith(')', close_pos):
+                        result = result[0], close_pos + 1
+                    else:
+                        result = None
+        return result
+
+    def __parse_criterion(self, pos, convert):
+        result = None
+        name_match = self.__identifier.match(self.__text,
+                                             self.__skip_whitespace(pos))
+        if not name_match is None:
+            pos = self.__match_colon(name_match.end())
+            if not pos is None:
+                op_match = self.__identifier.match(self.__text, pos)
+                if not op_match is None:
+                    pos = self.__match_colon(op_match.end())
+                    if not pos is None:
+                        values, pos = self.__parse_values(pos, convert)
+                        if convert:
+                            spec = CriterionConverter.make_spec(
+                                                    name_match.group(),
+                                                    op_match.group(),
+                                                    values)
+                        else:
+                            spec = None
+                        result = spec, pos
+        return result
+
+    def __parse_values(self, pos, convert):
+        # Comma separated values; each value may be empty.
+        values = []
+        while True:
+            pos = self.__parse_value(pos, convert, values)
+            sep_pos = self.__skip_whitespace(pos)
+            if not self.__text.startswith(',', sep_pos):
+                break
+            pos = sep_pos + 1
+        return values, pos
+
+    def __parse_value(self, pos, convert, values):
+        text = self.__text
+        pos = self.__skip_whitespace(pos)
+        number_match = self.__number.match(text, pos)
+        if not number_match is None:
+            if convert:
+                value = convert_number_value(number_match.group())
+            pos = number_match.end()
+            # Check for a number range.
+            sep_pos = self.__skip_whitespace(pos)
+            if text.startswith('-', sep_pos):
+                to_match = \
+                    self.__number.match(text,
+                                        self.__skip_whitespace(sep_pos + 1))
+                if not to_match is None:
+                    if convert:
+                        value = (value,
+                                 convert_number_value(to_match.group()))
+                    pos = to_match.end()
+            if convert:
+                values.append(value)
+            return pos
+        if text.startswith('"', pos):
+            date_match = self.__date.match(text, pos + 1)
+            if not date_match is None \
+               and text.startswith('"', date_match.end()):
+                if convert:
+                    values.append(convert_date_value(date_match.group()))
+                return date_match.end() + 1
+        string_match = self.__string.match(text, pos)
+        if not string_match is None:
+            if convert:
+                value = convert_string_value(string_match.group()[1:-1])
+                if IResource.providedBy(value): # pylint: disable=E1101
+                    self.__has_resources = True
+                values.append(value)
+            return string_match.end()
+        for keyword, value in (('true', True), ('false', False)):
+            keyword_pos = self.__match_keyword(keyword, pos)
+            if not keyword_pos is None:
+                if convert:
+                    values.append(value)
+                return keyword_pos
+        # Empty value.
+        return pos
+
+    def __match_colon(self, pos):
+        pos = self.__skip_whitespace(pos)
+        if self.__text.startswith(':', pos):
+            result = self.__skip_whitespace(pos + 1)
+        else:
+            result = None
+        return result
+
+    def __match_keyword(self, keyword, pos):
+        text = self.__text
+        pos = self.__skip_whitespace(pos)
+        end_pos = pos + len(keyword)
+        if text[pos:end_pos].upper() == keyword.upper() \
+           and (end_pos >= len(text)
+                or not text[end_pos].upper() in KEYWORD_CHARS):
+            result = end_pos
+        else:
+            result = None
+        return result
+
+    def __skip_whitespace(self, pos):
+        text = self.__text
+        while pos < len(text) and text[pos] in WHITESPACE_CHARS:
+            pos += 1
+        return pos
+
+
 def parse_filter(query_string):
     """
     Parses the given filter criteria string.
+
+    Parsed specifications are cached on the query string (per registry, as
+    they are built by the registered filter specification factory) unless
+    parsing resolved resource URLs; these have to be resolved for each
+    request.
+    """
+    parse_cache = get_registry_lru_cache(__name__, PARSE_CACHE_SIZE)
+    spec = parse_cache.get(query_string)
+    if spec is None:
+        parser = CqlFilterParser(query_string)
+        spec = parser.parse()
+        if not parser.has_resources:
+            parse_cache.set(query_string, spec)
+    return spec
+
+
+def parse_filter_reference(query_string):
+    """
+    Parses the given filter criteria string with the (slower) pyparsing
+    reference grammar.
     """
     return query.parseString(query_string)[0]
@@ -74,6 +74,9 @@ class IFilterSpecificationFactory(Interface):
         "Create an in-range filter specification."
         raise NotImplementedError('Abstract method')
 
+    def create_in_set(attr_name, attr_values):
+        "Create an in-set filter specification."
+
     def create_conjunction(left_spec, right_spec):
         "Create a conjunction of two filter specifications."
 
@@ -202,6 +205,11 @@ class IFilterSpecificationVisitor(ISpecificationVisitor):
         Visiting operation for value in range specifications.
         """
 
+    def _in_set_op(spec):
+        """
+        Visiting operation for value in set specifications.
+        """
+
 
 class IOrderSpecificationVisitor(ISpecificationVisitor):
     """
@@ -216,6 +224,15 @@ class IOrderSpecificationVisitor(ISpecificationVisitor):
         Needs to be called after :method:`accept` has been run.
         """
 
+    def seek_query(query, key_values):
+        """
+        Returns the given query ordered by the expression built by this
+        visitor and restricted to the records following the given order
+        key values.
+
+        Needs to be called after :method:`accept` has been run.
+        """
+
     def _conjunction_op(spec, *expressions):
         """
         Visiting operation for conjunction specifications.
@@ -305,4 +322,13 @@ class IQuery(Interface):
         Sets the slice key for this query. Generative (returns a clone).
         """
 
+    def load(*attribute_names):
+        """
+        Requests eager loading of the given related entity attributes.
+        Backends that do not load related entities lazily may ignore this.
+
+        :param tuple attribute_names: (possibly dotted) names of related
+          entity attributes.
+        """
+
 # end interfaces pylint: enable=E0213,W0232,E0211
@@ -23,6 +23,7 @@ __all__ = ['ASCENDING',
            'GREATER_OR_EQUALS',
            'GREATER_THAN',
            'IN_RANGE',
+           'IN_SET',
            'LESS_OR_EQUALS',
            'LESS_THAN',
            'NEGATION',
@@ -165,6 +166,15 @@ class IN_RANGE(BinaryOperator):
         return value >= ref_value[0] and value <= ref_value[1]
 
 
+class IN_SET(BinaryOperator):
+    name = 'in_set'
+
+    @staticmethod
+    def apply(value, ref_value):
+        # The reference value is a frozenset; this is a hash lookup.
+        return value in ref_value
+
+
 class ASCENDING(BinaryOperator):
     name = 'asc'
 
@@ -11,6 +11,8 @@ from everest.querying.base import CqlExpression
 from everest.querying.base import SpecificationVisitor
 from everest.querying.interfaces import IOrderSpecificationVisitor
 from everest.querying.operators import CQL_ORDER_OPERATORS
+from everest.querying.utils import get_order_specification_factory
+from everest.utils import get_nested_attribute
 from functools import reduce as func_reduce
 from operator import and_ as and_operator
 from zope.interface import implementer # pylint: disable=E0611,F0401
@@ -19,6 +21,8 @@ __docformat__ = 'reStructuredText en'
 __all__ = ['BubbleSorter',
            'CqlOrderExpression',
            'CqlOrderSpecificationVisitor',
+           'Keyset',
+           'KeysetOrderSpecificationVisitor',
            'OrderSpecificationVisitor',
            'RepositoryOrderSpecificationVisitor',
            'Sorter',
@@ -143,3 +147,106 @@ class RepositoryOrderSpecificationVisitor(OrderSpecificationVisitor): # pylint:
         Returns the given query ordered by this visitor's order expression.
         """
         return query.order(self.expression)
+
+    def seek_query(self, query, key_values):
+        """
+        Returns the given query ordered by this visitor's order expression
+        and restricted to the records following the given order key values
+        (keyset or "seek" pagination).
+
+        :param key_values: sequence of order key values, one for each
+          attribute in the visited order specification (in order).
+        """
+        raise NotImplementedError('Abstract method.')
+
+
+class KeysetOrderSpecificationVisitor(OrderSpecificationVisitor):
+    """
+    Order specification visitor building a list of (attribute name,
+    ascending flag) tuples for keyset pagination.
+    """
+    def _conjunction_op(self, spec, *expressions):
+        return [key for expr in expressions for key in expr]
+
+    def _asc_op(self, spec):
+        return [(spec.attr_name, True)]
+
+    def _desc_op(self, spec):
+        return [(spec.attr_name, False)]
+
+
+class Keyset(object):
+    """
+    Key for keyset (or "seek") pagination.
+
+    Instead of skipping a number of records (which translates into a costly
+    OFFSET clause for relational backends), keyset pagination seeks to the
+    records following the order key values of the boundary record of the
+    current page. The order keys are the attributes of the order
+    specification extended by the entity ID as a tie breaker. If no values
+    are given, the keyset addresses the first (forward) or last (backward)
+    page.
+    """
+    def __init__(self, values=None, is_forward=True):
+        #: Order key values of the boundary record or `None`.
+        self.values = values
+        #: Flag indicating the paging direction.
+        self.is_forward = is_forward
+
+    def __eq__(self, other):
+        return isinstance(other, Keyset) \
+               and self.values == other.values \
+               and self.is_forward == other.is_forward
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __str__(self):
+        return '<%s values: %s, is_forward: %s>' \
+                % (self.__class__.__name__, self.values, self.is_forward)
+
+    @staticmethod
+    def get_keys(order_spec):
+        """
+        Returns a list of (attribute name, ascending flag) tuples for the
+        given order specification with the entity ID appended as a tie
+        breaker.
+
+        :param order_spec: order specification or `None`.
+        """
+        if not order_spec is None:
+            vst = KeysetOrderSpecificationVisitor()
+            order_spec.accept(vst)
+            keys = vst.expression
+        else:
+            keys = []
+        if not 'id' in [attr_name for (attr_name, _) in keys]:
+            keys.append(('id', True))
+        return keys
+
+    @classmethod
+    def get_values(cls, order_spec, entity):
+        """
+        Returns the order key values for the given order specification
+        and entity.
+        """
+        return [get_nested_attribute(entity, attr_name)
+                for (attr_name, _) in cls.get_keys(order_spec)]
+
+    def get_order(self, order_spec):
+        """
+        Returns the order specification to use for seeking from this keyset.
+        For backward paging, all sort directions are reversed.
+        """
+        spec_fac = get_order_specification_factory()
+        keyset_spec = None
+        for attr_name, is_ascending in self.get_keys(order_spec):
+            if is_ascending is self.is_forward:
+                spec = spec_fac.create_ascending(attr_name)
+            else:
+                spec = spec_fac.create_descending(attr_name)
+            if keyset_spec is None:
+                keyset_spec = spec
+            else:
+                keyset_spec = spec_fac.create_conjunction(keyset_spec, spec)
+        return keyset_spec
@@ -11,6 +11,7 @@ from everest.querying.operators import ASCENDING
 from everest.querying.operators import DESCENDING
 from everest.querying.specifications import asc
 from everest.querying.specifications import desc
+from everest.utils import get_registry_lru_cache
 from pyparsing import Combine
 from pyparsing import Group
 from pyparsing import Literal
@@ -35,6 +36,9 @@ direction = oneOf("asc desc").setName('direction')
 
 BINARY = 2
 
+# Maximum number of parsed order specifications to cache.
+PARSE_CACHE_SIZE = 256
+
 class CriterionConverter(object):
     spec_map = {ASCENDING.name:asc,
                 DESCENDING.name:desc}
@@ -76,6 +80,13 @@ order = criteria | criterion
 
 def parse_order(criteria_string):
     """
-    Parses the given order criteria string.
+    Parses the given order criteria string. Parsed specifications are
+    cached on the criteria string (per registry, as they are built by the
+    registered order specification factory).
     """
-    return order.parseString(criteria_string)[0]
+    parse_cache = get_registry_lru_cache(__name__, PARSE_CACHE_SIZE)
+    spec = parse_cache.get(criteria_string)
+    if spec is None:
+        spec = order.parseString(criteria_string)[0]
+        parse_cache.set(criteria_string, spec)
+    return spec
@@ -16,17 +16,22 @@ from pyparsing import alphanums
 from pyparsing import alphas
 from pyparsing import delimitedList
 from pyparsing import replaceWith
+from pyramid.compat import iteritems_
 
 from everest.constants import ResourceReferenceRepresentationKinds
 from everest.entities.utils import identifier_from_slug
 from everest.representers.config import IGNORE_OPTION
 from everest.representers.config import WRITE_AS_LINK_OPTION
+from everest.utils import get_registry_lru_cache
 
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['parse_refs',
            ]
 
+# Maximum number of parsed reference configurations to cache.
+PARSE_CACHE_SIZE = 256
+
 TILDE_PAT = '~'
 URL_PAT = ResourceReferenceRepresentationKinds.URL
 INLINE_PAT = ResourceReferenceRepresentationKinds.INLINE
@@ -79,4 +84,14 @@ refs.setParseAction(RefsConverter.convert)
 
 
 def parse_refs(refs_string):
-    return refs.parseString(refs_string)[0]
+    """
+    Parses the given resource references string. Parsed configurations are
+    cached on the references string (per registry, like the other parse
+    caches); callers receive a copy they are free to modify.
+    """
+    parse_cache = get_registry_lru_cache(__name__, PARSE_CACHE_SIZE)
+    config = parse_cache.get(refs_string)
+    if config is None:
+        config = refs.parseString(refs_string)[0]
+        parse_cache.set(refs_string, config)
+    return dict((key, opts.copy()) for (key, opts) in iteritems_(config))
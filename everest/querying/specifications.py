@@ -26,6 +26,7 @@ from everest.querying.operators import EQUAL_TO
 from everest.querying.operators import GREATER_OR_EQUALS
 from everest.querying.operators import GREATER_THAN
 from everest.querying.operators import IN_RANGE
+from everest.querying.operators import IN_SET
 from everest.querying.operators import LESS_OR_EQUALS
 from everest.querying.operators import LESS_THAN
 from everest.querying.operators import NEGATION
@@ -63,6 +64,7 @@ __all__ = ['AscendingOrderSpecification',
            'ValueGreaterThanFilterSpecification',
            'ValueGreaterThanOrEqualToFilterSpecification',
            'ValueInRangeFilterSpecification',
+           'ValueInSetFilterSpecification',
            'ValueLessThanFilterSpecification',
            'ValueLessThanOrEqualToFilterSpecification',
            'ValueStartsWithFilterSpecification',
@@ -74,6 +76,7 @@ __all__ = ['AscendingOrderSpecification',
            'ends',
            'ge',
            'gt',
+           'in_set',
            'le',
            'lt',
            'order',
@@ -88,6 +91,10 @@ class Specification(object):
     Abstract base classs for all specifications.
     """
     operator = None
+    #: Memoized CQL string representation of this specification. Since
+    #: specifications are immutable, this is set on first rendering by
+    #: :class:`everest.url.UrlPartsConverter`.
+    cql_string = None
 
     def __init__(self):
         if self.__class__ is Specification:
@@ -387,6 +394,20 @@ class ValueInRangeFilterSpecification(CriterionFilterSpecification):
         return self.attr_value[1]
 
 
+class ValueInSetFilterSpecification(CriterionFilterSpecification):
+    """
+    Concrete specification for equality with any value from a set of values.
+
+    Equivalent to a disjunction of equal to specifications for the same
+    attribute, but evaluated with a single set lookup.
+    """
+    operator = IN_SET
+
+    def __init__(self, attr_name, attr_value):
+        CriterionFilterSpecification.__init__(self, attr_name,
+                                              frozenset(attr_value))
+
+
 @implementer(IFilterSpecificationFactory)
 class FilterSpecificationFactory(object):
     """
@@ -423,6 +444,9 @@ class FilterSpecificationFactory(object):
     def create_in_range(self, attr_name, range_tuple):
         return ValueInRangeFilterSpecification(attr_name, range_tuple)
 
+    def create_in_set(self, attr_name, attr_values):
+        return ValueInSetFilterSpecification(attr_name, attr_values)
+
     def create_conjunction(self, left_spec, right_spec):
         return ConjunctionFilterSpecification(left_spec, right_spec)
 
@@ -669,6 +693,8 @@ class FilterSpecificationGenerator(_SpecificationGenerator):
                                    'create_contained')
     rng = specification_attribute(IFilterSpecificationFactory,
                                   'create_in_range')
+    in_set = specification_attribute(IFilterSpecificationFactory,
+                                     'create_in_set')
 
     def __call__(self, **kw):
         fn = getattr(self._factory, self.method_name)
@@ -775,6 +801,11 @@ def rng(**kw):
     return FilterSpecificationGenerator.rng(**kw)
 
 
+def in_set(**kw):
+    "Convenience function to create an in_set specification."
+    return FilterSpecificationGenerator.in_set(**kw)
+
+
 def asc(*args):
     "Convenience function to create an ascending order specification."
     return SingleOrderSpecificationGenerator.asc(*args)
@@ -49,12 +49,30 @@ class Session(object):
         """
         raise NotImplementedError('Abstract method.')
 
+    def get_by_ids(self, entity_class, id_keys):
+        """
+        Retrieves the entities for the specified entity class and sequence
+        of IDs in one batch.
+
+        :param entity_class: the type of the entities to retrieve.
+        :param id_keys: sequence of IDs of the entities to retrieve.
+        :returns: list of the entities found, in the order of the given IDs
+          (IDs without a matching entity are skipped).
+        """
+        raise NotImplementedError('Abstract method.')
+
     def get_by_slug(self, entity_class, slug):
         """
         Retrieves the entity for the specified entity class and slug.
 
         :param entity_class: the type of the entity to retrieve.
         :param slug: slug of the entity to retrieve.
+        :raises: :class:`everest.exceptions.NoResultsException` if the
+          session knows that no entity has the given slug and
+          :class:`everest.exceptions.MultipleResultsException` if more than
+          one entity has the given slug.
+        :returns: entity or `None` if the entity was not found, but the
+          session can not rule out that it exists.
         """
         raise NotImplementedError('Abstract method.')
 
@@ -9,13 +9,18 @@ Created on Jan 7, 2013.
 from everest.mime import CsvMime
 from everest.repositories.memory.repository import MemoryRepository
 from everest.repositories.memory.repository import MemorySessionFactory
+from everest.repositories.state import ENTITY_STATUS
 from everest.resources.storing import dump_resource
 from everest.resources.storing import get_read_collection_path
 from everest.resources.storing import get_write_collection_path
 from everest.resources.storing import load_collection_from_url
 from everest.resources.utils import get_collection_class
 from everest.resources.utils import get_root_collection
+from pyramid.threadlocal import get_current_registry
+from pyramid.threadlocal import manager
+from threading import Timer
 import os
+import transaction
 
 __all__ = ['FileSystemRepository',
            ]
@@ -26,11 +31,18 @@ class FileSystemRepository(MemoryRepository):
     Repository using the file system as storage.
 
     On initialization, this repository loads resource representations from
-    files into the root repository. Each commit operation writes the specified
-    resource back to file.
+    files into the root repository. Each commit operation writes the
+    resources that were added, modified or removed back to file.
+
+    If the "dump_delay" option is set to a positive number of seconds, the
+    dumps are deferred and coalesced across all commits that happen within
+    the delay period. The "dump_hook" option can be set to a callable which
+    is invoked with a dictionary mapping the dumped entity classes to the
+    number of bytes written after each dump.
     """
     _configurables = MemoryRepository._configurables \
-                     + ['directory', 'content_type']
+                     + ['directory', 'content_type', 'dump_delay',
+                        'dump_hook']
 
     def __init__(self, name, aggregate_class=None,
                  join_transaction=True, autocommit=False):
@@ -39,7 +51,10 @@ class FileSystemRepository(MemoryRepository):
                                   join_transaction=join_transaction,
                                   autocommit=autocommit)
         self.configure(directory=os.getcwd(), content_type=CsvMime,
-                       cache_loader=self.__load_entities)
+                       cache_loader=self.__load_entities,
+                       dump_delay=0, dump_hook=None)
+        self.__pending_dumps = set()
+        self.__dump_timer = None
 
     def commit(self, unit_of_work):
         """
@@ -48,15 +63,58 @@ class FileSystemRepository(MemoryRepository):
         """
         MemoryRepository.commit(self, unit_of_work)
         if self.is_initialized:
-            entity_classes_to_dump = set()
             for state in unit_of_work.iterator():
-                entity_classes_to_dump.add(type(state.entity))
-            for entity_cls in entity_classes_to_dump:
-                self.__dump_entities(entity_cls)
+                # Entities that were only loaded do not need to be dumped.
+                if state.status != ENTITY_STATUS.CLEAN:
+                    self.__pending_dumps.add(type(state.entity))
+            if len(self.__pending_dumps) > 0:
+                delay = float(self._config['dump_delay'])
+                if delay > 0:
+                    self.__schedule_dump(delay)
+                else:
+                    self.dump_pending()
+
+    def dump_pending(self):
+        """
+        Immediately dumps all resources with pending changes and cancels the
+        scheduled delayed dump, if any.
+
+        :returns: Dictionary mapping the dumped entity classes to the number
+          of bytes written.
+        """
+        with self.lock:
+            if not self.__dump_timer is None:
+                self.__dump_timer.cancel()
+                self.__dump_timer = None
+            entity_classes_to_dump = self.__pending_dumps
+            self.__pending_dumps = set()
+            written = dict([(entity_cls, self.__dump_entities(entity_cls))
+                            for entity_cls in entity_classes_to_dump])
+        hook = self._config['dump_hook']
+        if len(written) > 0 and not hook is None:
+            hook(written)
+        return written
 
     def _make_session_factory(self):
         return MemorySessionFactory(self)
 
+    def __schedule_dump(self, delay):
+        if self.__dump_timer is None:
+            self.__dump_timer = Timer(delay, self.__run_scheduled_dump,
+                                      args=(get_current_registry(),))
+            self.__dump_timer.start()
+
+    def __run_scheduled_dump(self, registry):
+        # The timer thread does not inherit the thread local registry of the
+        # thread that scheduled the dump.
+        manager.push(dict(registry=registry, request=None))
+        try:
+            self.dump_pending()
+        finally:
+            # Discard the session state created in this thread by the dump.
+            transaction.abort()
+            manager.pop()
+
     def __load_entities(self, entity_class):
         coll_cls = get_collection_class(entity_class)
         fn = get_read_collection_path(coll_cls, self._config['content_type'],
@@ -87,3 +145,4 @@ class FileSystemRepository(MemoryRepository):
         with stream:
             dump_resource(coll, stream,
                           content_type=self._config['content_type'])
+        return os.path.getsize(fn)
@@ -8,6 +8,7 @@ Created on Jan 25, 2013.
 """
 from everest.repositories.constants import REPOSITORY_DOMAINS
 from everest.repositories.interfaces import IRepository
+from everest.resources.classmap import ResourceClassMap
 from everest.utils import id_generator
 from pyramid.compat import itervalues_
 from pyramid.threadlocal import get_current_registry
@@ -119,9 +120,11 @@ class RepositoryManager(object):
             if not repo.is_initialized:
                 repo.initialize()
 
-    def on_app_created(self, event): # pylint: disable=W0613
+    def on_app_created(self, event):
         """
         Callback set up by the registry configurator to initialize all
-        registered repositories.
+        registered repositories. This also builds the resource class map
+        for the application registry.
         """
         self.initialize_all()
+        ResourceClassMap.for_registry(event.app.registry)
@@ -6,15 +6,27 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 Created on Feb 26, 2013.
 """
-from collections import defaultdict
+from collections import MutableSequence
+from collections import OrderedDict
+from everest.constants import RESOURCE_ATTRIBUTE_KINDS
+from everest.entities.attributes import get_domain_class_attribute_iterator
+from everest.entities.utils import get_entity_class
 from everest.repositories.memory.querying import MemoryQuery
+from everest.repositories.memory.querying import StateProxy
 from everest.repositories.state import EntityState
+from everest.utils import get_nested_attribute
+from pyramid.compat import itervalues_
+from functools import partial
 from itertools import islice
+from threading import RLock
 from weakref import WeakValueDictionary
 
 __docformat__ = 'reStructuredText en'
-__all__ = ['EntityCache',
+__all__ = ['ColumnarEntityCache',
+           'ColumnarEntityCacheMap',
+           'EntityCache',
            'EntityCacheMap',
+           'OrderedEntityCache',
            ]
 
 
@@ -22,6 +34,9 @@ class EntityCache(object):
     """
     Cache for entities.
 
+    Holds the entities in a list and indexes them through weak references.
+    :class:`OrderedEntityCache` is faster and used by default.
+
     Supports add and remove operations as well as lookup by ID and
     by slug.
     """
@@ -175,50 +190,588 @@ class EntityCache(object):
         return do_append
 
 
+class OrderedEntityCache(object):
+    """
+    Cache for entities using strong references.
+
+    Holds the entities in an insertion-ordered dictionary keyed by object
+    identity and indexes them through plain dictionaries, which makes
+    lookups cheaper and removal O(1) compared to :class:`EntityCache`.
+
+    Supports add and remove operations as well as lookup by ID and
+    by slug.
+    """
+    def __init__(self, entities=None, allow_none_id=True):
+        """
+        :param entities: Optional sequence of entities to add.
+        :param bool allow_none_id: Flag specifying if calling :meth:`add`
+            with an entity that does not have an ID is allowed.
+        """
+        self.__allow_none_id = allow_none_id
+        # Ordered dictionary mapping object identities to entities.
+        self.__entities = OrderedDict()
+        # Dictionary mapping entity IDs to entities for fast lookup by ID.
+        self.__id_map = {}
+        # Dictionary mapping entity slugs to entities for fast lookup by slug.
+        self.__slug_map = {}
+        if not entities is None:
+            for ent in entities:
+                self.add(ent)
+
+    def get_by_id(self, entity_id):
+        """
+        Performs a lookup of an entity by its ID.
+
+        :param int entity_id: entity ID.
+        :return: entity found or ``None``.
+        """
+        return self.__id_map.get(entity_id)
+
+    def has_id(self, entity_id):
+        """
+        Checks if this entity cache holds an entity with the given ID.
+
+        :return: Boolean result of the check.
+        """
+        return entity_id in self.__id_map
+
+    def get_by_slug(self, entity_slug):
+        """
+        Performs a lookup of an entity by its slug.
+
+        :param str entity_id: entity slug.
+        :return: entity found or ``None``.
+        """
+        return self.__slug_map.get(entity_slug)
+
+    def has_slug(self, entity_slug):
+        return entity_slug in self.__slug_map
+
+    def add(self, entity):
+        """
+        Adds the given entity to this cache.
+
+        :param entity: Entity to add.
+        :type entity: Object implementing :class:`everest.interfaces.IEntity`.
+        :raises ValueError: If the ID of the entity to add is ``None``.
+        """
+        self.__check_new(entity)
+        self.__entities[id(entity)] = entity
+
+    def remove(self, entity):
+        """
+        Removes the given entity from this cache.
+
+        :param entity: Entity to remove.
+        :type entity: Object implementing :class:`everest.interfaces.IEntity`.
+        :raises KeyError: If the given entity is not in this cache.
+        """
+        # Like the list based cache, we remove the cached entity with the
+        # same ID if there is one.
+        cached_entity = None
+        if not entity.id is None:
+            cached_entity = self.__id_map.pop(entity.id, None)
+        if cached_entity is None:
+            cached_entity = entity
+        self.__slug_map.pop(entity.slug, None)
+        del self.__entities[id(cached_entity)]
+
+    def update(self, source_data, target_entity):
+        """
+        Updates the state of the target entity with the given source data.
+
+        :param target_entity: Entity to update.
+        :type target_entity: Object implementing
+          :class:`everest.interfaces.IEntity`.
+        """
+        EntityState.set_state_data(target_entity, source_data)
+
+    def get_all(self):
+        """
+        Returns a list of all entities in this cache in the order they
+        were added.
+        """
+        return list(self.__entities.values())
+
+    def retrieve(self, filter_expression=None,
+                 order_expression=None, slice_key=None):
+        """
+        Retrieve entities from this cache, possibly after filtering, ordering
+        and slicing.
+        """
+        ents = itervalues_(self.__entities)
+        if not filter_expression is None:
+            ents = filter_expression(ents)
+        if not order_expression is None:
+            ents = iter(order_expression(ents))
+        if not slice_key is None:
+            ents = islice(ents, slice_key.start, slice_key.stop)
+        return ents
+
+    def rebuild(self, entities):
+        """
+        Rebuilds the ID and slug maps of this cache.
+
+        This can be necessary when entities obtain their IDs only after
+        they have been flushed to the backend.
+        """
+        for ent in entities:
+            self.__check_new(ent)
+
+    def __contains__(self, entity):
+        if not entity.id is None:
+            is_contained = entity.id in self.__id_map
+        else:
+            is_contained = id(entity) in self.__entities
+        return is_contained
+
+    def __check_new(self, entity):
+        if not entity.id is None:
+            cached_entity = self.__id_map.setdefault(entity.id, entity)
+            if not cached_entity is entity:
+                raise ValueError('Duplicate entity ID "%s". %s'
+                                 % (entity.id, entity))
+        elif not self.__allow_none_id:
+            raise ValueError('Entity ID must not be None.')
+        # The slug may not be available yet (see EntityCache).
+        if hasattr(entity, 'slug') and not entity.slug is None:
+            cached_entity = self.__slug_map.setdefault(entity.slug, entity)
+            if not cached_entity is entity:
+                raise ValueError('Duplicate entity slug "%s".'
+                                 % entity.slug)
+
+
+class ColumnarEntityCache(object):
+    """
+    Entity cache storing the state of its entities column-wise.
+
+    Instead of holding on to the entity instances, the cache keeps one
+    list of attribute values ("column") per entity attribute; references
+    to other entities are stored as IDs which are resolved through the
+    other caches in the cache map. Entities are materialized on demand;
+    each lookup returns new instances, so changes to cached entities
+    need to go through :meth:`update`.
+
+    Materialized entities are created with :func:`object.__new__` (the
+    entity class' `__init__` is not called) and only receive the values
+    of the declared resource attributes; any other instance state of the
+    added entities is dropped.
+
+    Supports the same operations as :class:`EntityCache`. Entities added
+    to this cache must have an ID. Changes to the cache need to be made
+    while holding the lock passed to the constructor; retrieving entities
+    acquires it.
+    """
+    #: Minimum number of rows before removed rows are compacted.
+    COMPACTION_THRESHOLD = 64
+
+    def __init__(self, entity_class, cache_map, reference_filter=None,
+                 lock=None):
+        """
+        :param entity_class: Class of the entities to store.
+        :param cache_map: Map holding the caches for referenced entities.
+        :type cache_map: :class:`EntityCacheMap`
+        :param reference_filter: Optional callable which is passed the
+          type of a relationship attribute and returns a flag indicating if
+          the referenced entities are kept in the cache map. References to
+          other entities are stored as they are.
+        :param lock: Reentrant lock serializing changes to the caches in
+          the cache map. Defaults to a new lock.
+        """
+        self.__entity_class = entity_class
+        self.__cache_map = cache_map
+        self.__reference_filter = reference_filter
+        if lock is None:
+            lock = RLock()
+        self.__lock = lock
+        # The entity IDs and slugs of all rows; removed rows have None IDs.
+        self.__ids = []
+        self.__slugs = []
+        # Lists of (attribute, column, referenced entity class) triples.
+        self.__columns = None
+        # Maps collection attributes to collection value types.
+        self.__collection_types = {}
+        self.__id_map = {}
+        self.__slug_map = {}
+        # Weak references to the entities added to this cache.
+        self.__added = WeakValueDictionary()
+        self.__num_removed = 0
+
+    def get_by_id(self, entity_id):
+        """
+        Performs a lookup of an entity by its ID.
+
+        :param int entity_id: entity ID.
+        :return: entity found or ``None``.
+        """
+        row = self.__id_map.get(entity_id)
+        return None if row is None else self.__materialize(row, {})
+
+    def has_id(self, entity_id):
+        """
+        Checks if this entity cache holds an entity with the given ID.
+
+        :return: Boolean result of the check.
+        """
+        return entity_id in self.__id_map
+
+    def get_by_slug(self, entity_slug):
+        """
+        Performs a lookup of an entity by its slug.
+
+        :param str entity_id: entity slug.
+        :return: entity found or ``None``.
+        """
+        row = self.__slug_map.get(entity_slug)
+        return None if row is None else self.__materialize(row, {})
+
+    def has_slug(self, entity_slug):
+        return entity_slug in self.__slug_map
+
+    def add(self, entity):
+        """
+        Adds the state of the given entity to this cache.
+
+        :param entity: Entity to add.
+        :type entity: Object implementing :class:`everest.interfaces.IEntity`.
+        :raises ValueError: If the ID of the entity to add is ``None`` or if
+          another entity with the same ID or slug is already in this cache.
+        """
+        if entity.id is None:
+            raise ValueError('Entity ID must not be None.')
+        row = self.__id_map.get(entity.id)
+        if not row is None:
+            if not self.__added.get(entity.id) is entity:
+                raise ValueError('Duplicate entity ID "%s". %s'
+                                 % (entity.id, entity))
+            # Adding the same entity again stores its current state.
+            del self.__id_map[entity.id]
+            self.__slug_map.pop(self.__slugs[row], None)
+        else:
+            slug = entity.slug
+            if not slug is None and slug in self.__slug_map:
+                raise ValueError('Duplicate entity slug "%s".' % slug)
+            row = len(self.__ids)
+            self.__ids.append(None)
+            self.__slugs.append(None)
+            for _, column, _ in self.__get_columns():
+                column.append(None)
+        self.__store(row, entity)
+        self.__added[entity.id] = entity
+
+    def remove(self, entity):
+        """
+        Removes the state of the given entity from this cache.
+
+        :param entity: Entity to remove.
+        :type entity: Object implementing :class:`everest.interfaces.IEntity`.
+        :raises KeyError: If the given entity is not in this cache.
+        """
+        row = self.__id_map.pop(entity.id)
+        self.__slug_map.pop(self.__slugs[row], None)
+        self.__added.pop(entity.id, None)
+        self.__ids[row] = None
+        self.__slugs[row] = None
+        for _, column, _ in self.__get_columns():
+            column[row] = None
+        self.__num_removed += 1
+        if self.__num_removed > self.COMPACTION_THRESHOLD \
+           and 2 * self.__num_removed > len(self.__ids):
+            self.__compact()
+
+    def update(self, source_data, target_entity):
+        """
+        Updates the state of the target entity with the given source data
+        and stores it in this cache.
+
+        :param target_entity: Entity to update.
+        :type target_entity: Object implementing
+          :class:`everest.interfaces.IEntity`.
+        """
+        row = self.__id_map.pop(target_entity.id)
+        self.__slug_map.pop(self.__slugs[row], None)
+        EntityState.set_state_data(target_entity, source_data)
+        self.__store(row, target_entity)
+
+    def get_all(self):
+        """
+        Returns a list of all entities in this cache in the order they
+        were added.
+        """
+        return list(self.__iter_entities())
+
+    def retrieve(self, filter_expression=None,
+                 order_expression=None, slice_key=None):
+        """
+        Retrieve entities from this cache, possibly after filtering, ordering
+        and slicing.
+
+        The rows are copied while holding the lock. The filter and order
+        expressions are evaluated on proxies reading the copied columns
+        (see :class:`everest.repositories.memory.querying.StateProxy`), so
+        only the retrieved entities are materialized.
+        """
+        with self.__lock:
+            rows = self.__copy_rows()
+        ids = rows[0]
+        row_idxs = (row for (row, ent_id) in enumerate(ids)
+                    if not ent_id is None)
+        memo = {}
+        use_proxies = not (filter_expression is None
+                           and order_expression is None)
+        if use_proxies:
+            get_value = partial(self.__get_row_value, rows, memo)
+            row_idxs = (StateProxy(row, get_value) for row in row_idxs)
+        if not filter_expression is None:
+            row_idxs = filter_expression(row_idxs)
+        if not order_expression is None:
+            row_idxs = iter(order_expression(row_idxs))
+        if not slice_key is None:
+            row_idxs = islice(row_idxs, slice_key.start, slice_key.stop)
+        if use_proxies:
+            row_idxs = (proxy.get_row() for proxy in row_idxs)
+        return (self.__materialize(row, memo, rows=rows)
+                for row in row_idxs)
+
+    def rebuild(self, entities):
+        """
+        Adds all of the given entities that are not in this cache yet.
+        """
+        for ent in entities:
+            if not ent in self:
+                self.add(ent)
+
+    def __contains__(self, entity):
+        return not entity.id is None and entity.id in self.__id_map
+
+    def __len__(self):
+        return len(self.__id_map)
+
+    def __get_columns(self):
+        if self.__columns is None:
+            columns = []
+            for attr in get_domain_class_attribute_iterator(
+                                                    self.__entity_class):
+                # Nested attributes are stored with the entity they
+                # belong to.
+                if attr.entity_attr is None or attr.entity_attr == 'id' \
+                   or '.' in attr.entity_attr:
+                    continue
+                if attr.kind == RESOURCE_ATTRIBUTE_KINDS.TERMINAL \
+                   or not (self.__reference_filter is None
+                           or self.__reference_filter(attr.attr_type)):
+                    ref_ent_cls = None
+                else:
+                    ref_ent_cls = get_entity_class(attr.attr_type)
+                columns.append((attr, [None] * len(self.__ids), ref_ent_cls))
+            self.__columns = columns
+        return self.__columns
+
+    def __store(self, row, entity):
+        ent_id = entity.id
+        self.__ids[row] = ent_id
+        self.__id_map[ent_id] = row
+        slug = entity.slug
+        self.__slugs[row] = slug
+        if not slug is None:
+            self.__slug_map[slug] = row
+        for attr, column, ref_ent_cls in self.__get_columns():
+            value = get_nested_attribute(entity, attr.entity_attr)
+            if not (ref_ent_cls is None or value is None):
+                if attr.kind == RESOURCE_ATTRIBUTE_KINDS.MEMBER:
+                    value = self.__make_reference(value, ref_ent_cls)
+                else:
+                    self.__collection_types.setdefault(attr, type(value))
+                    value = tuple([self.__make_reference(item, ref_ent_cls)
+                                   for item in value])
+            column[row] = value
+
+    def __copy_rows(self):
+        # Returns a tuple holding copies of the IDs, the slugs and the
+        # columns of this cache along with a map of (non-reference)
+        # column values by entity attribute name.
+        columns = [(attr, list(column), ref_ent_cls)
+                   for (attr, column, ref_ent_cls) in self.__get_columns()]
+        value_columns = dict([(attr.entity_attr, column)
+                              for (attr, column, ref_ent_cls) in columns
+                              if ref_ent_cls is None])
+        return (list(self.__ids), list(self.__slugs), columns, value_columns)
+
+    def __get_row_value(self, rows, memo, row, attribute_name):
+        # Returns the value of the given attribute for the given row of
+        # the given copied rows. References and attributes which are not
+        # stored in the columns are read from the materialized entity.
+        ids, slugs, _, value_columns = rows
+        if attribute_name == 'id':
+            value = ids[row]
+        elif attribute_name == 'slug':
+            value = slugs[row]
+        else:
+            column = value_columns.get(attribute_name)
+            if not column is None:
+                value = column[row]
+            else:
+                value = getattr(self.__materialize(row, memo, rows=rows),
+                                attribute_name)
+        return value
+
+    def __make_reference(self, entity, ref_ent_cls):
+        # Entities without an ID are kept as they are.
+        return entity if entity.id is None \
+                         or not isinstance(entity, ref_ent_cls) else entity.id
+
+    def __resolve_reference(self, value, ref_ent_cls, memo):
+        if isinstance(value, ref_ent_cls):
+            ent = value
+        else:
+            with self.__lock:
+                cache = self.__cache_map[ref_ent_cls]
+                row = cache.__id_map.get(value)
+                ent = None if row is None else cache.__materialize(row, memo)
+        return ent
+
+    def __materialize(self, row, memo, rows=None):
+        # The entity is created without calling __init__ and only gets the
+        # state stored in the columns (see the class docstring).
+        # The memo maps (entity class, ID) tuples to the entities
+        # materialized so far; this preserves the identity of entities
+        # referenced several times as well as circular references. If
+        # given, the state is read from the given copied rows.
+        if rows is None:
+            ids, columns = self.__ids, self.__get_columns()
+        else:
+            ids, _, columns, _ = rows
+        ent_id = ids[row]
+        key = (self.__entity_class, ent_id)
+        ent = memo.get(key)
+        if ent is None:
+            ent = object.__new__(self.__entity_class)
+            ent.id = ent_id
+            memo[key] = ent
+            state = {}
+            for attr, column, ref_ent_cls in columns:
+                value = column[row]
+                if not (ref_ent_cls is None or value is None):
+                    if attr.kind == RESOURCE_ATTRIBUTE_KINDS.MEMBER:
+                        value = self.__resolve_reference(value, ref_ent_cls,
+                                                         memo)
+                    else:
+                        value_type = self.__collection_types[attr]
+                        items = value
+                        value = value_type.__new__(value_type)
+                        if issubclass(value_type, MutableSequence):
+                            add_op = value.append
+                        else:
+                            add_op = value.add
+                        for item in items:
+                            item_ent = self.__resolve_reference(item,
+                                                                ref_ent_cls,
+                                                                memo)
+                            if not item_ent is None:
+                                add_op(item_ent)
+                state[attr] = value
+            EntityState.set_state_data(ent, state)
+        return ent
+
+    def __iter_entities(self):
+        memo = {}
+        for row, ent_id in enumerate(self.__ids):
+            if not ent_id is None:
+                yield self.__materialize(row, memo)
+
+    def __compact(self):
+        rows = [row for row, ent_id in enumerate(self.__ids)
+                if not ent_id is None]
+        self.__ids = [self.__ids[row] for row in rows]
+        self.__slugs = [self.__slugs[row] for row in rows]
+        for _, column, _ in self.__get_columns():
+            column[:] = [column[row] for row in rows]
+        self.__id_map = dict((ent_id, row)
+                             for (row, ent_id) in enumerate(self.__ids))
+        self.__slug_map = dict((slug, row)
+                               for (row, slug) in enumerate(self.__slugs)
+                               if not slug is None)
+        self.__num_removed = 0
+
+
 class EntityCacheMap(object):
     """
     Map for entity caches.
     """
-    def __init__(self):
-        self.__cache_map = defaultdict(EntityCache)
+    def __init__(self, cache_class=None):
+        """
+        :param cache_class: Entity cache class to use. Defaults to
+          :class:`OrderedEntityCache`.
+        """
+        if cache_class is None:
+            cache_class = OrderedEntityCache
+        self.__cache_class = cache_class
+        self.__cache_map = {}
 
     def __getitem__(self, entity_class):
-        return self.__cache_map[entity_class]
+        cache = self.__cache_map.get(entity_class)
+        if cache is None:
+            cache = self.__cache_map[entity_class] = \
+                                            self._make_cache(entity_class)
+        return cache
 
     def has_key(self, entity_class):
-        return self.__cache_map.has_key(entity_class)
+        return entity_class in self.__cache_map
 
     def get_by_id(self, entity_class, entity_id):
-        cache = self.__cache_map[entity_class]
-        return cache.get_by_id(entity_id)
+        return self[entity_class].get_by_id(entity_id)
 
     def get_by_slug(self, entity_class, slug):
-        cache = self.__cache_map[entity_class]
-        return cache.get_by_slug(slug)
+        return self[entity_class].get_by_slug(slug)
 
     def add(self, entity_class, entity):
-        cache = self.__cache_map[entity_class]
-        cache.add(entity)
+        self[entity_class].add(entity)
 
     def remove(self, entity_class, entity):
-        cache = self.__cache_map[entity_class]
-        cache.remove(entity)
+        self[entity_class].remove(entity)
 
     def update(self, entity_class, source_data, target_entity):
-        cache = self.__cache_map[entity_class]
-        cache.update(source_data, target_entity)
+        self[entity_class].update(source_data, target_entity)
 
     def query(self, entity_class):
-        return MemoryQuery(entity_class,
-                           self.__cache_map[entity_class].get_all())
+        return MemoryQuery(entity_class, self[entity_class].get_all())
 
     def __contains__(self, entity_or_entity_class):
         if isinstance(entity_or_entity_class, type):
             result = entity_or_entity_class in self.__cache_map
         else:
-            cache = self.__cache_map[type(entity_or_entity_class)]
+            cache = self[type(entity_or_entity_class)]
             result = entity_or_entity_class in cache
         return result
 
     def keys(self):
         return self.__cache_map.keys()
+
+    def _make_cache(self, entity_class): # pylint: disable=W0613
+        """
+        Creates a new cache for the given entity class.
+        """
+        return self.__cache_class()
+
+
+class ColumnarEntityCacheMap(EntityCacheMap):
+    """
+    Map for columnar entity caches.
+    """
+    def __init__(self, reference_filter=None, lock=None):
+        """
+        :param reference_filter: Passed on to the columnar entity caches
+          (see :class:`ColumnarEntityCache`).
+        :param lock: Passed on to the columnar entity caches. Defaults to a
+          new lock shared by all caches in this map.
+        """
+        EntityCacheMap.__init__(self)
+        self.__reference_filter = reference_filter
+        if lock is None:
+            lock = RLock()
+        self.__lock = lock
+
+    def _make_cache(self, entity_class):
+        return ColumnarEntityCache(entity_class, self,
+                                   reference_filter=self.__reference_filter,
+                                   lock=self.__lock)
@@ -21,10 +21,13 @@ import functools
 __docformat__ = 'reStructuredText en'
 __all__ = ['EvalFilterExpression',
            'EvalOrderExpression',
+           'EvalSeekExpression',
+           'KeyValueProxy',
            'MemoryQuery',
            'MemoryRepositoryQuery',
            'ObjectFilterSpecificationVisitor',
            'ObjectOrderSpecificationVisitor',
+           'StateProxy',
            ]
 
 
@@ -65,6 +68,81 @@ class EvalOrderExpression(object):
     def __and__(self, other):
         return EvalOrderExpression(self.__spec & other.__spec) # pylint: disable=W0212
 
+    def seek(self, key):
+        """
+        Returns an evaluation seek expression for this order expression
+        and the given key object.
+        """
+        return EvalSeekExpression(self.__spec, key)
+
+
+class EvalSeekExpression(object):
+    """
+    Evaluation seek expression.
+
+    Sorts the given entities and returns all entities following the given
+    key object in sort order. The seek position is located by bisection.
+    """
+    def __init__(self, spec, key):
+        self.__spec = spec
+        self.__key = key
+
+    def __call__(self, entities):
+        ents = sorted(entities, key=functools.cmp_to_key(self.__spec.cmp))
+        lo, hi = 0, len(ents)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.__spec.cmp(ents[mid], self.__key) <= 0:
+                lo = mid + 1
+            else:
+                hi = mid
+        return ents[lo:]
+
+
+class KeyValueProxy(object):
+    """
+    Proxy exposing a map of (possibly dotted) attribute names to values
+    as (possibly nested) object attributes.
+    """
+    def __init__(self, value_map, prefix=''):
+        self.__value_map = value_map
+        self.__prefix = prefix
+
+    def __getattr__(self, name):
+        attr_name = self.__prefix + name
+        if attr_name in self.__value_map:
+            value = self.__value_map[attr_name]
+        else:
+            value = KeyValueProxy(self.__value_map, attr_name + '.')
+        return value
+
+
+class StateProxy(object):
+    """
+    Proxy exposing the state of a stored entity as object attributes.
+
+    Filter and order expressions are evaluated on such proxies to read a
+    consistent version of the entity state instead of the current state
+    of the entity.
+    """
+    def __init__(self, row, get_value):
+        """
+        :param row: stored entity (or row) to read the state for.
+        :param get_value: callable returning the value of the given
+          attribute name for the given row.
+        """
+        self.__row = row
+        self.__get_value = get_value
+
+    def __getattr__(self, name):
+        return self.__get_value(self.__row, name)
+
+    def get_row(self):
+        """
+        Returns the row this proxy reads the state for.
+        """
+        return self.__row
+
 
 class EvalExpressionBuilderMixin(ExpressionBuilderMixin):
     """
@@ -104,8 +182,22 @@ class MemoryQuery(EvalExpressionBuilderMixin, Query):
 class MemoryRepositoryQuery(EvalExpressionBuilderMixin, RepositoryQuery):
     """
     Query operating on objects kept in a memory repository.
+
+    The entities are retrieved and loaded from one snapshot of the
+    repository.
     """
-    pass
+    def __iter__(self):
+        snapshot = self._repository.snapshot
+        repo_ents = self._repository.retrieve(
+                                        self._entity_class,
+                                        filter_expression=self._filter_expr,
+                                        order_expression=self._order_expr,
+                                        slice_key=self._slice_key,
+                                        snapshot=snapshot
+                                        )
+        for repo_ent in repo_ents:
+            yield self._session.load(self._entity_class, repo_ent,
+                                     snapshot=snapshot)
 
 
 @implementer(IFilterSpecificationVisitor)
@@ -153,6 +245,9 @@ class ObjectFilterSpecificationVisitor(RepositoryFilterSpecificationVisitor):
     def _in_range_op(self, spec):
         return EvalFilterExpression(spec)
 
+    def _in_set_op(self, spec):
+        return EvalFilterExpression(spec)
+
 
 @implementer(IOrderSpecificationVisitor)
 class ObjectOrderSpecificationVisitor(RepositoryOrderSpecificationVisitor):
@@ -160,14 +255,23 @@ class ObjectOrderSpecificationVisitor(RepositoryOrderSpecificationVisitor):
     Order specification visitor building an evaluator for in-memory
     ordering.
     """
+    def __init__(self, entity_class):
+        RepositoryOrderSpecificationVisitor.__init__(self, entity_class)
+        self.__attr_names = []
+
+    def visit_nullary(self, spec):
+        RepositoryOrderSpecificationVisitor.visit_nullary(self, spec)
+        self.__attr_names.append(spec.attr_name)
+
+    def seek_query(self, query, key_values):
+        key = KeyValueProxy(dict(zip(self.__attr_names, key_values)))
+        return query.order(self.expression.seek(key))
+
     def _conjunction_op(self, spec, *expressions):
-        return lambda entities: sorted(entities,
-                                       key=functools.cmp_to_key(spec.cmp))
+        return EvalOrderExpression(spec)
 
     def _asc_op(self, spec):
-        return lambda entities: sorted(entities,
-                                       key=functools.cmp_to_key(spec.cmp))
+        return EvalOrderExpression(spec)
 
     def _desc_op(self, spec):
-        return lambda entities: sorted(entities,
-                                       key=functools.cmp_to_key(spec.cmp))
+        return EvalOrderExpression(spec)
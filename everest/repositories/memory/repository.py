@@ -10,24 +10,47 @@ from everest.entities.utils import get_entity_class
 from everest.entities.utils import new_entity_id
 from everest.repositories.base import Repository
 from everest.repositories.memory.aggregate import MemoryAggregate
+from everest.repositories.memory.cache import ColumnarEntityCacheMap
 from everest.repositories.memory.cache import EntityCacheMap
+from everest.repositories.memory.cache import OrderedEntityCache
+from everest.repositories.memory.querying import StateProxy
 from everest.repositories.memory.session import MemorySessionFactory
 from everest.repositories.state import ENTITY_STATUS
+from everest.repositories.state import EntityState
+from itertools import islice
+from pyramid.compat import iteritems_
 from threading import RLock
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['MemoryRepository',
+           'RepositorySnapshot',
            ]
 
 
 class MemoryRepository(Repository):
     """
     A repository that caches entities in memory.
+
+    If the `columnar_store` option is set, the entity state is kept in
+    compact columnar entity caches (see
+    :class:`everest.repositories.memory.cache.ColumnarEntityCache`).
+    Otherwise, the entities are held in caches of the class given with
+    the `entity_cache_class` option, which is also used for the session
+    caches.
+
+    Changes are applied while holding the (per repository) :attr:`lock`.
+    Each flush and rollback publishes a new :attr:`snapshot`; readers
+    retrieve entities and read their state as of a snapshot (see
+    :class:`RepositorySnapshot`), so they do not see partially applied
+    changes. This includes the state filter and order criteria are
+    evaluated on; only the attributes of related entities are read from
+    their current state. With the `columnar_store` option, readers copy
+    the columns of the caches while holding the lock and retrieve private
+    copies of the matching entities only (see
+    :meth:`everest.repositories.memory.cache.ColumnarEntityCache.retrieve`).
     """
     _configurables = Repository._configurables \
-                     + ['cache_loader']
-
-    lock = RLock()
+                     + ['cache_loader', 'columnar_store', 'entity_cache_class']
 
     def __init__(self, name, aggregate_class=None,
                  join_transaction=False, autocommit=False):
@@ -37,40 +60,104 @@ class MemoryRepository(Repository):
                             join_transaction=join_transaction,
                             autocommit=autocommit)
         self.__cache_map = EntityCacheMap()
-        # By default, we do not use a cache loader.
-        self.configure(cache_loader=None)
+        #: Lock serializing changes to the caches of this repository.
+        self.lock = RLock()
+        self.__snapshot = RepositorySnapshot()
+        # By default, we do not use a cache loader and store entities as
+        # they are.
+        self.configure(cache_loader=None, columnar_store=False,
+                       entity_cache_class=OrderedEntityCache)
+
+    @property
+    def snapshot(self):
+        """
+        The most recently published :class:`RepositorySnapshot`.
+        """
+        return self.__snapshot
 
     def retrieve(self, entity_class, filter_expression=None,
-                 order_expression=None, slice_key=None):
-        cache = self.__get_cache(entity_class)
-        return cache.retrieve(filter_expression=filter_expression,
-                              order_expression=order_expression,
-                              slice_key=slice_key)
+                 order_expression=None, slice_key=None, snapshot=None):
+        """
+        Retrieves the entities of the given class, possibly after filtering,
+        ordering and slicing.
+
+        :param snapshot: :class:`RepositorySnapshot` to retrieve the
+          entities from. Defaults to the current snapshot.
+        """
+        if isinstance(self.__cache_map, ColumnarEntityCacheMap):
+            # Columnar caches do not record snapshots; they evaluate the
+            # criteria on copies of their columns instead.
+            with self.lock:
+                cache = self.__get_cache(entity_class)
+            return cache.retrieve(filter_expression=filter_expression,
+                                  order_expression=order_expression,
+                                  slice_key=slice_key)
+        if snapshot is None:
+            snapshot = self.__snapshot
+        ents = iter(self.__get_entities(entity_class, snapshot))
+        use_proxies = not (filter_expression is None
+                           and order_expression is None)
+        if use_proxies:
+            # Evaluate the criteria on the entity state as of the snapshot.
+            ents = (StateProxy(ent, snapshot.get_state_value)
+                    for ent in ents)
+        if not filter_expression is None:
+            ents = filter_expression(ents)
+        if not order_expression is None:
+            ents = iter(order_expression(ents))
+        if not slice_key is None:
+            ents = islice(ents, slice_key.start, slice_key.stop)
+        if use_proxies:
+            ents = (proxy.get_row() for proxy in ents)
+        return ents
 
     def flush(self, unit_of_work):
-        for state in unit_of_work.iterator():
-            if state.is_persisted:
-                continue
-            else:
-                self.__persist(state)
-                unit_of_work.mark_persisted(state.entity)
+        with self.lock:
+            # Autogenerate new IDs up front so that references between new
+            # entities can be stored by ID.
+            for state in unit_of_work.iterator():
+                if not state.is_persisted \
+                   and state.status == ENTITY_STATUS.NEW \
+                   and state.entity.id is None:
+                    state.entity.id = new_entity_id()
+            has_changes = False
+            try:
+                for state in unit_of_work.iterator():
+                    if state.is_persisted:
+                        continue
+                    else:
+                        has_changes = True
+                        self.__persist(state)
+                        unit_of_work.mark_persisted(state.entity)
+            finally:
+                if has_changes:
+                    self.__publish_snapshot()
 
     def commit(self, unit_of_work):
         self.flush(unit_of_work)
 
     def rollback(self, unit_of_work):
-        for state in unit_of_work.iterator():
-            if state.is_persisted:
-                self.__rollback(state)
+        with self.lock:
+            has_changes = False
+            try:
+                for state in unit_of_work.iterator():
+                    if state.is_persisted:
+                        has_changes = True
+                        self.__rollback(state)
+            finally:
+                if has_changes:
+                    self.__publish_snapshot()
 
     def __persist(self, state):
         source_entity = state.entity
-        cache = self.__get_cache(type(source_entity))
+        entity_class = type(source_entity)
+        cache = self.__get_cache(entity_class)
         status = state.status
         if status == ENTITY_STATUS.NEW:
             # Autogenerate new ID.
             if source_entity.id is None:
                 source_entity.id = new_entity_id()
+            self.__record_entities(entity_class)
             cache.add(source_entity)
         else:
             target_entity = cache.get_by_id(source_entity.id)
@@ -79,28 +166,73 @@ class MemoryRepository(Repository):
                                  'found (ID used for lookup: %s).'
                                  % source_entity.id)
             if status == ENTITY_STATUS.DELETED:
+                self.__record_entities(entity_class)
                 cache.remove(target_entity)
             elif status == ENTITY_STATUS.DIRTY:
+                self.__record_state(target_entity)
                 cache.update(state.data, target_entity)
 
     def __rollback(self, state):
         source_entity = state.entity
-        cache = self.__get_cache(type(source_entity))
+        entity_class = type(source_entity)
+        cache = self.__get_cache(entity_class)
         if state.status == ENTITY_STATUS.DELETED:
+            self.__record_entities(entity_class)
             cache.add(source_entity)
         else:
             if state.status == ENTITY_STATUS.NEW:
+                self.__record_entities(entity_class)
                 cache.remove(source_entity)
             elif state.status == ENTITY_STATUS.DIRTY:
                 target_entity = cache.get_by_id(source_entity.id)
+                self.__record_state(target_entity)
                 cache.update(state.clean_data, target_entity)
 
     def _initialize(self):
-        pass
+        if self.configuration['columnar_store']:
+            self.__cache_map = ColumnarEntityCacheMap(
+                                reference_filter=self.is_registered_resource,
+                                lock=self.lock)
+        else:
+            self.__cache_map = EntityCacheMap(
+                        cache_class=self.configuration['entity_cache_class'])
 
     def _make_session_factory(self):
         return MemorySessionFactory(self)
 
+    def __get_entities(self, entity_class, snapshot):
+        ents = snapshot.get_entities(entity_class)
+        if ents is None:
+            with self.lock:
+                ents = snapshot.get_entities(entity_class)
+                if ents is None:
+                    # The entities of this class have not changed since
+                    # the snapshot was published.
+                    ents = tuple(self.__get_cache(entity_class).get_all())
+                    snapshot.record_entities(entity_class, ents)
+                    self.__snapshot.record_entities(entity_class, ents)
+        return ents
+
+    def __record_entities(self, entity_class):
+        # Records the entities of the given class in the current snapshot
+        # before they are changed.
+        if not isinstance(self.__cache_map, ColumnarEntityCacheMap) \
+           and not self.__snapshot.has_entities(entity_class):
+            self.__snapshot.record_entities(
+                        entity_class,
+                        tuple(self.__get_cache(entity_class).get_all()))
+
+    def __record_state(self, entity):
+        # Records the state of the given entity in the current snapshot
+        # before it is changed.
+        if not isinstance(self.__cache_map, ColumnarEntityCacheMap):
+            self.__snapshot.record_state(entity)
+
+    def __publish_snapshot(self):
+        snapshot = RepositorySnapshot()
+        self.__snapshot.next = snapshot
+        self.__snapshot = snapshot
+
     def __get_cache(self, entity_class):
         run_loader = not entity_class in self.__cache_map
         if run_loader:
@@ -124,3 +256,103 @@ class MemoryRepository(Repository):
                     reg_ent_cls = get_entity_class(reg_rc)
                     if not reg_ent_cls in self.__cache_map:
                         self.__load_entities(reg_ent_cls, False)
+
+
+class RepositorySnapshot(object):
+    """
+    Published version of the entities held by a memory repository.
+
+    Before a flush (or rollback) changes the state of an entity or the set
+    of entities of an entity class, it records the old state or set in the
+    current snapshot; after the changes were applied, it publishes a new
+    snapshot. The snapshots thus form a chain in which the state of an
+    entity as of a given snapshot is the first state recorded for it from
+    that snapshot on or, if there is none, the current state of the
+    entity. The same holds for the sets of entities of an entity class.
+
+    Only the state of changed entities is copied, and readers do not need
+    to hold the repository lock to read entity state.
+    """
+    def __init__(self):
+        # Maps entity object IDs to (entity, state data, state values by
+        # entity attribute name) tuples. Holding on to the entity makes
+        # sure its object ID is not reused.
+        self.__states = {}
+        # Maps entity classes to tuples of entities.
+        self.__entities = {}
+        #: The snapshot published after this one or `None`.
+        self.next = None
+
+    def get_state_data(self, entity):
+        """
+        Returns (a copy of) the state data of the given entity as of this
+        snapshot.
+        """
+        # We read the current state first: A flush records the state of
+        # an entity before it changes it, so if we do not find a recorded
+        # state *after* reading, the entity was not changed while we were
+        # reading its state.
+        state = EntityState.get_state_data(entity)
+        snapshot = self
+        while not snapshot is None:
+            record = snapshot.__states.get(id(entity))
+            if not record is None:
+                state = dict(record[1])
+                break
+            snapshot = snapshot.next
+        return state
+
+    def get_state_value(self, entity, attribute_name):
+        """
+        Returns the value of the given (non-dotted) entity attribute of the
+        given entity as of this snapshot. Attributes which are not part of
+        the entity state are read from the entity.
+        """
+        # As in get_state_data, the current value is read first.
+        value = getattr(entity, attribute_name)
+        snapshot = self
+        while not snapshot is None:
+            record = snapshot.__states.get(id(entity))
+            if not record is None:
+                value = record[2].get(attribute_name, value)
+                break
+            snapshot = snapshot.next
+        return value
+
+    def get_entities(self, entity_class):
+        """
+        Returns the tuple of entities of the given class as of this
+        snapshot or `None` if the entities have not been recorded.
+        """
+        ents = None
+        snapshot = self
+        while not snapshot is None:
+            ents = snapshot.__entities.get(entity_class)
+            if not ents is None:
+                break
+            snapshot = snapshot.next
+        return ents
+
+    def has_entities(self, entity_class):
+        """
+        Checks if this snapshot holds the entities of the given class.
+        """
+        return entity_class in self.__entities
+
+    def record_state(self, entity):
+        """
+        Records the current state of the given entity, unless a state was
+        recorded for it before.
+        """
+        if not id(entity) in self.__states:
+            state = EntityState.get_state_data(entity)
+            values = dict([(attr.entity_attr, value)
+                           for (attr, value) in iteritems_(state)])
+            self.__states[id(entity)] = (entity, state, values)
+
+    def record_entities(self, entity_class, entities):
+        """
+        Records the given tuple of entities of the given class, unless
+        entities were recorded for it before.
+        """
+        self.__entities.setdefault(entity_class, entities)
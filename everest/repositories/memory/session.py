@@ -15,7 +15,7 @@ from everest.entities.utils import get_entity_class
 from everest.repositories.base import AutocommittingSessionMixin
 from everest.repositories.base import Session
 from everest.repositories.base import SessionFactory
-from everest.repositories.memory.cache import EntityCache
+from everest.repositories.memory.cache import OrderedEntityCache
 from everest.repositories.memory.querying import MemoryRepositoryQuery
 from everest.repositories.state import EntityState
 from everest.repositories.uow import UnitOfWork
@@ -50,6 +50,8 @@ class MemorySession(Session):
         self.__repository = repository
         self.__unit_of_work = UnitOfWork()
         self.__cache_map = {}
+        self.__cache_class = repository.configuration.get(
+                                    'entity_cache_class', OrderedEntityCache)
         if query_class is None:
             query_class = MemoryRepositoryQuery
         self.__query_class = query_class
@@ -63,6 +65,17 @@ class MemorySession(Session):
         cache = self.__get_cache(entity_class)
         return cache.get_by_id(entity_id)
 
+    def get_by_ids(self, entity_class, id_keys):
+        if self.__needs_flushing:
+            self.flush()
+        cache = self.__get_cache(entity_class)
+        ents = []
+        for id_key in id_keys:
+            ent = cache.get_by_id(id_key)
+            if not ent is None:
+                ents.append(ent)
+        return ents
+
     def get_by_slug(self, entity_class, entity_slug):
         # When the entity is not found in the cache, it may have been added
         # with an undefined slug; we therefore attempt to look it up in the
@@ -121,7 +134,7 @@ class MemorySession(Session):
         self.__unit_of_work.reset()
         self.__cache_map.clear()
 
-    def load(self, entity_class, entity):
+    def load(self, entity_class, entity, snapshot=None):
         """
         Load the given repository entity into the session and return a
         clone. If it was already loaded before, look up the loaded entity
@@ -130,6 +143,10 @@ class MemorySession(Session):
         All entities referenced by the loaded entity will also be loaded
         (and cloned) recursively.
 
+        :param snapshot: repository snapshot to read the state of the
+          cloned entities from. Defaults to the current snapshot of the
+          repository.
+
         :raises ValueError: When an attempt is made to load an entity that
           has no ID
         """
@@ -141,7 +158,9 @@ class MemorySession(Session):
         sess_ent = cache.get_by_id(entity.id)
         if sess_ent is None:
             if self.__clone_on_load:
-                sess_ent = self.__clone(entity, cache)
+                if snapshot is None:
+                    snapshot = self.__repository.snapshot
+                sess_ent = self.__clone(entity, cache, snapshot)
             else: # Only needed by the nosql backend pragma: no cover
                 cache.add(entity)
                 sess_ent = entity
@@ -225,16 +244,16 @@ class MemorySession(Session):
     def __get_cache(self, entity_class):
         cache = self.__cache_map.get(entity_class)
         if cache is None:
-            cache = self.__cache_map[entity_class] = EntityCache()
+            cache = self.__cache_map[entity_class] = self.__cache_class()
         return cache
 
-    def __clone(self, entity, cache):
+    def __clone(self, entity, cache, snapshot):
         clone = object.__new__(entity.__class__)
         # We add the clone with its ID set to the cache *before* we load it
         # so that circular references will work.
         clone.id = entity.id
         cache.add(clone)
-        state = EntityState.get_state_data(entity)
+        state = snapshot.get_state_data(entity)
         id_attr = None
         for attr, value in iteritems_(state):
             if attr.entity_attr == 'id':
@@ -250,7 +269,7 @@ class MemorySession(Session):
             elif attr.kind == RESOURCE_ATTRIBUTE_KINDS.MEMBER \
                and not value is None:
                 ent_cls = get_entity_class(attr_type)
-                new_value = self.load(ent_cls, value)
+                new_value = self.load(ent_cls, value, snapshot=snapshot)
                 state[attr] = new_value
             elif attr.kind == RESOURCE_ATTRIBUTE_KINDS.COLLECTION \
                  and len(value) > 0:
@@ -266,7 +285,8 @@ class MemorySession(Session):
                                      % (type(new_value), attr))
                 ent_cls = get_entity_class(attr_type)
                 for child in value:
-                    child_clone = self.load(ent_cls, child)
+                    child_clone = self.load(ent_cls, child,
+                                            snapshot=snapshot)
                     add_op(child_clone)
                 state[attr] = new_value
         # We set the ID already above.
@@ -19,13 +19,80 @@ class RdbAggregate(RootAggregate):
     Root aggregate implementation for the RDB repository.
     """
     _expression_kind = EXPRESSION_KINDS.SQL
+    #: Unsliced queries and queries for slices larger than this size are
+    #: streamed in batches of this size rather than loaded all at once.
+    #: Set this to `None` to disable streaming.
+    stream_batch_size = 1000
 
     def query(self):
         # Need to perform a flush here so that filter expressions are always
         # generated correctly. Also, we pass the counting query class to the
         # base class method to optimize paged queries if the backend supports
-        # it.
+        # it. Aggregate queries are only run on a read replica within a
+        # read only context (see :func:`everest.repositories.utils.read_only`)
+        # where the session routes all SELECT statements to a replica;
+        # lookups preceding writes always go to the primary database.
         self._session.flush()
         return RootAggregate.query(
                     self,
                     query_class=self._session_factory.counting_query_class)
+
+    def _get_ordered_query(self, key):
+        query = RootAggregate._get_ordered_query(self, key)
+        batch_size = self.stream_batch_size
+        if not batch_size is None:
+            slice_key = self._slice_key
+            if slice_key is None or slice_key.stop is None \
+               or slice_key.stop - (slice_key.start or 0) > batch_size:
+                query = query.stream(batch_size)
+        stmt_key = self.__get_statement_key(query)
+        if not stmt_key is None:
+            query = query.cache_statement(
+                                self._session_factory.expression_cache,
+                                stmt_key)
+        return query
+
+    def _apply_filter(self, query, filter_spec):
+        # Reuse the filter expressions cached by the session factory for
+        # filter specifications of the same shape.
+        cache = self._session_factory.expression_cache
+        return cache.filter_query(query, filter_spec,
+                                  self._filter_visitor_factory(),
+                                  key=(type(self), self.entity_class))
+
+    def _get_order_visitor(self, order_spec):
+        # Reuse the order visitors cached by the session factory for
+        # order specifications with the same order keys.
+        cache = self._session_factory.expression_cache
+        return cache.get_order_visitor(order_spec,
+                                       self._order_visitor_factory,
+                                       key=(type(self), self.entity_class))
+
+    def __get_statement_key(self, query):
+        # Returns a key for the SQL statement of the given query or None if
+        # the statement contains literal values (from a filter that can
+        # not be parameterized or from keyset values) or eager loading
+        # options.
+        filter_key = query._filter_key # pylint: disable=W0212
+        if (not self.filter is None and filter_key is None) \
+           or (not self._keyset is None
+               and not self._keyset.values is None) \
+           or self._load_attributes:
+            stmt_key = None
+        else:
+            if not self._keyset is None:
+                order_spec = self._keyset.get_order(self._order_spec)
+            else:
+                order_spec = self._order_spec
+            if not order_spec is None:
+                cache = self._session_factory.expression_cache
+                order_key = cache.get_order_key(order_spec)
+            else:
+                order_key = None
+            if not self._slice_key is None:
+                slice_key = (self._slice_key.start, self._slice_key.stop)
+            else:
+                slice_key = None
+            stmt_key = (type(self), self.entity_class, type(query),
+                        filter_key, order_key, slice_key)
+        return stmt_key
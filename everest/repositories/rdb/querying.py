@@ -11,32 +11,55 @@ from everest.entities.base import Entity
 from everest.exceptions import MultipleResultsException
 from everest.exceptions import NoResultsException
 from everest.querying.base import EXPRESSION_KINDS
+from everest.querying.base import SpecificationVisitor
 from everest.querying.filtering import RepositoryFilterSpecificationVisitor
 from everest.querying.interfaces import IFilterSpecificationVisitor
 from everest.querying.interfaces import IOrderSpecificationVisitor
+from everest.querying.operators import CONTAINED
+from everest.querying.operators import EQUAL_TO
+from everest.querying.operators import IN_RANGE
+from everest.querying.operators import IN_SET
+from everest.querying.ordering import KeysetOrderSpecificationVisitor
 from everest.querying.ordering import OrderSpecificationVisitor
 from everest.querying.ordering import RepositoryOrderSpecificationVisitor
+from everest.querying.specifications import ValueContainedFilterSpecification
 from everest.querying.specifications import order
 from everest.repositories.rdb.utils import OrmAttributeInspector
 from everest.resources.interfaces import ICollectionResource
 from everest.resources.interfaces import IResource
 from everest.utils import get_order_specification_visitor
+from copy import copy
+from decimal import Decimal
 from functools import reduce as func_reduce
+from pyramid.compat import integer_types
+from pyramid.compat import string_types
 from sqlalchemy import and_ as sqlalchemy_and
 from sqlalchemy import not_ as sqlalchemy_not
 from sqlalchemy import or_ as sqlalchemy_or
 from sqlalchemy.orm.exc import MultipleResultsFound
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import subqueryload
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm.query import Query as SaQuery
+from sqlalchemy.orm.strategies import DeferredOption
+from sqlalchemy.orm.strategies import EagerLazyOption
 from sqlalchemy.sql.expression import ClauseList
+from sqlalchemy.sql.expression import bindparam
 from sqlalchemy.sql.expression import func
+from sqlalchemy.sql.expression import literal_column
 from sqlalchemy.sql.expression import over
+from sqlalchemy.sql.expression import tuple_
+from sqlalchemy.util import LRUCache
 from zope.interface import implementer # pylint: disable=E0611,F0401
+import datetime
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['OptimizedCountingQuery',
            'OrderClauseList',
            'SimpleCountingQuery',
+           'SqlExpressionCache',
+           'SqlFilterSpecificationParameterizer',
            'SqlFilterSpecificationVisitor',
            'SqlOrderSpecificationVisitor',
            ]
@@ -61,10 +84,25 @@ class SqlFilterSpecificationVisitor(RepositoryFilterSpecificationVisitor):
             custom_clause_factories = {}
         self.__custom_clause_factories = custom_clause_factories
 
+    @property
+    def custom_clause_keys(self):
+        """
+        Returns the (attribute name, operator name) keys for which a custom
+        clause factory was configured.
+        """
+        return self.__custom_clause_factories.keys()
+
     def visit_nullary(self, spec):
         key = (spec.attr_name, spec.operator.name)
+        eq_key = (spec.attr_name, EQUAL_TO.name)
         if key in self.__custom_clause_factories:
             self._push(self.__custom_clause_factories[key](spec.attr_value))
+        elif spec.operator is IN_SET \
+             and eq_key in self.__custom_clause_factories:
+            # Fall back to a disjunction of custom equal to clauses.
+            factory = self.__custom_clause_factories[eq_key]
+            self._push(sqlalchemy_or(*[factory(val)
+                                       for val in spec.attr_value]))
         else:
             RepositoryFilterSpecificationVisitor.visit_nullary(self, spec)
 
@@ -105,6 +143,9 @@ class SqlFilterSpecificationVisitor(RepositoryFilterSpecificationVisitor):
         from_value, to_value = spec.attr_value
         return self.__build(spec.attr_name, 'between', from_value, to_value)
 
+    def _in_set_op(self, spec):
+        return self.__build(spec.attr_name, 'in_', list(spec.attr_value))
+
     def _conjunction_op(self, spec, *expressions):
         return sqlalchemy_and(*expressions)
 
@@ -165,6 +206,8 @@ class SqlOrderSpecificationVisitor(RepositoryOrderSpecificationVisitor):
             custom_join_clauses = {}
         self.__custom_join_clauses = custom_join_clauses
         self.__joins = set()
+        # List of (column, ascending flag) tuples for keyset pagination.
+        self.__seek_keys = []
 
     def visit_nullary(self, spec):
         OrderSpecificationVisitor.visit_nullary(self, spec)
@@ -177,6 +220,31 @@ class SqlOrderSpecificationVisitor(RepositoryOrderSpecificationVisitor):
             query = query.outerjoin(join_expr)
         return query.order(self.expression)
 
+    def seek_query(self, query, key_values):
+        query = self.order_query(query)
+        columns = [col for (col, _) in self.__seek_keys]
+        directions = set([is_asc for (_, is_asc) in self.__seek_keys])
+        if len(directions) == 1:
+            # Uniform sort direction - use a row value comparison.
+            if len(columns) == 1:
+                lhs, rhs = columns[0], key_values[0]
+            else:
+                lhs, rhs = tuple_(*columns), tuple_(*key_values)
+            crit = lhs > rhs if directions.pop() else lhs < rhs
+        else:
+            # Mixed sort directions - expand the row value comparison to
+            # (k1 > v1) OR (k1 = v1 AND k2 < v2) OR ...
+            clauses = []
+            for idx, (col, is_asc) in enumerate(self.__seek_keys):
+                eq_clauses = [prev_col == prev_val
+                              for (prev_col, prev_val)
+                              in zip(columns[:idx], key_values[:idx])]
+                val = key_values[idx]
+                cmp_clause = col > val if is_asc else col < val
+                clauses.append(sqlalchemy_and(*(eq_clauses + [cmp_clause])))
+            crit = sqlalchemy_or(*clauses)
+        return query.filter(crit)
+
     def _conjunction_op(self, spec, *expressions):
         clauses = []
         for expr in expressions:
@@ -201,12 +269,238 @@ class SqlOrderSpecificationVisitor(RepositoryOrderSpecificationVisitor):
             kind, entity_attr = info
             if idx == count - 1:
                 expr = getattr(entity_attr, sql_op)()
+                self.__seek_keys.append((entity_attr, sql_op == 'asc'))
             elif kind != RESOURCE_ATTRIBUTE_KINDS.TERMINAL:
                 # FIXME: Avoid adding multiple attrs with the same target here.
                 self.__joins.add(entity_attr)
         return expr
 
 
+class SqlFilterSpecificationParameterizer(SpecificationVisitor):
+    """
+    Filter specification visitor replacing the literal criterion values of
+    a filter specification with SQL bind parameters.
+
+    The expression built by this visitor is a (shape key, template
+    specification) tuple; the shape key captures the structure of the
+    specification (operators, attribute names and, for `contained` and
+    `in_set` criteria, the number of values) and the template
+    specification has the same structure as the visited specification with
+    all values replaced by bind parameters. The replaced values are
+    collected in the :attr:`params` map. Specifications with values that
+    can not be passed as bind parameters (entities, resources, `None`) as
+    well as criteria with a custom clause factory are flagged as not
+    parameterizable.
+    """
+    #: Value types that can be passed as bind parameters.
+    parameter_types = string_types + integer_types \
+                      + (bool, float, Decimal, datetime.date, datetime.time,
+                         datetime.timedelta)
+
+    def __init__(self, custom_clause_keys=None):
+        SpecificationVisitor.__init__(self)
+        if custom_clause_keys is None:
+            custom_clause_keys = ()
+        self.__custom_clause_keys = custom_clause_keys
+        #: Map of bind parameter names to criterion values.
+        self.params = {}
+        #: Flag indicating if all criterion values could be replaced.
+        self.is_parameterizable = True
+
+    def visit_nullary(self, spec):
+        op_name = spec.operator.name
+        if op_name in (CONTAINED.name, IN_RANGE.name, IN_SET.name) \
+           and isinstance(spec.attr_value, (list, tuple, frozenset)):
+            values = list(spec.attr_value)
+            num_values = len(values)
+        else:
+            values = [spec.attr_value]
+            num_values = None
+        if op_name == IN_SET.name:
+            # In-set criteria fall back to custom equal to clauses; their
+            # template is a contained criterion (see below).
+            clause_op_names = (op_name, EQUAL_TO.name, CONTAINED.name)
+        else:
+            clause_op_names = (op_name,)
+        if any([(spec.attr_name, name) in self.__custom_clause_keys
+                for name in clause_op_names]) \
+           or not all([isinstance(val, self.parameter_types)
+                       for val in values]):
+            self.is_parameterizable = False
+        params = [self.__make_param(val) for val in values]
+        if num_values is None:
+            tmpl_value = params[0]
+        elif op_name == IN_RANGE.name:
+            tmpl_value = tuple(params)
+        else:
+            tmpl_value = params
+        if op_name == IN_SET.name:
+            # Bind parameters can not be kept in a set; the contained
+            # criterion builds the same SQL expression.
+            tmpl_spec = ValueContainedFilterSpecification(spec.attr_name,
+                                                          tmpl_value)
+        else:
+            tmpl_spec = spec.__class__(spec.attr_name, tmpl_value)
+        self._push(((op_name, spec.attr_name, num_values), tmpl_spec))
+
+    def visit_unary(self, spec):
+        key, tmpl_spec = self._pop()
+        self._push(((spec.operator.name, key), spec.__class__(tmpl_spec)))
+
+    def visit_binary(self, spec):
+        right_key, right_tmpl_spec = self._pop()
+        left_key, left_tmpl_spec = self._pop()
+        self._push(((spec.operator.name, left_key, right_key),
+                    spec.__class__(left_tmpl_spec, right_tmpl_spec)))
+
+    def __make_param(self, value):
+        name = 'everest_%d' % len(self.params)
+        self.params[name] = value
+        return bindparam(name)
+
+
+class SqlExpressionCache(object):
+    """
+    Cache for SQL expressions generated from filter and order
+    specifications.
+
+    Building SQLAlchemy expressions from specifications is costly and
+    typically only a handful of distinct query shapes are used by an
+    application. This cache reuses filter expressions built from
+    parameterized template specifications (see
+    :class:`SqlFilterSpecificationParameterizer`) keyed by the structure of
+    the specification, binding only the literal values to the query. Order
+    expressions contain no values and are cached as visited order
+    visitors keyed by the order keys. Finally, the SQL statements of
+    queries built from cached expressions can be cached together with
+    their compiled form (see :meth:`Query.cache_statement`).
+
+    The cache is cleared when it grows beyond its maximum size.
+    """
+    def __init__(self, max_size=500):
+        self.__max_size = max_size
+        self.__cache = {}
+        self.__statements = {}
+        self.__compiled_cache = LRUCache(max_size)
+
+    def filter_query(self, query, filter_spec, visitor, key=None):
+        """
+        Applies the given filter specification to the given query, reusing
+        a cached filter expression with the same shape, if available.
+
+        :param visitor: new filter specification visitor to build the
+          filter expression with on a cache miss.
+        :param key: additional cache key (e.g., the entity class).
+        """
+        custom_clause_keys = getattr(visitor, 'custom_clause_keys', None)
+        param_vst = SqlFilterSpecificationParameterizer(
+                                    custom_clause_keys=custom_clause_keys)
+        filter_spec.accept(param_vst)
+        if not param_vst.is_parameterizable:
+            filter_spec.accept(visitor)
+            query = visitor.filter_query(query)
+        else:
+            shape_key, tmpl_spec = param_vst.expression
+            cache_key = (type(visitor), key, shape_key)
+            expr = self.__cache.get(cache_key)
+            if expr is None:
+                tmpl_spec.accept(visitor)
+                expr = visitor.expression
+                self.__set(self.__cache, cache_key, expr)
+            query = query.filter(expr).params(**param_vst.params)
+            query._filter_key = cache_key # pylint: disable=W0212
+        return query
+
+    def get_order_visitor(self, order_spec, visitor_factory, key=None):
+        """
+        Returns an order specification visitor that has visited the given
+        order specification, reusing a cached visitor for the same order
+        keys, if available.
+
+        :param visitor_factory: callable returning a new (unused) order
+          specification visitor.
+        :param key: additional cache key (e.g., the entity class).
+        """
+        cache_key = ('order', key, self.get_order_key(order_spec))
+        vst = self.__cache.get(cache_key)
+        if vst is None:
+            vst = visitor_factory()
+            order_spec.accept(vst)
+            self.__set(self.__cache, cache_key, vst)
+        return vst
+
+    def get_order_key(self, order_spec):
+        """
+        Returns a tuple of (attribute name, ascending flag) tuples for the
+        keys of the given order specification.
+        """
+        key_vst = KeysetOrderSpecificationVisitor()
+        order_spec.accept(key_vst)
+        return tuple(key_vst.expression)
+
+    def get_statement_context(self, key):
+        """
+        Returns the query context holding the SQL statement cached for the
+        given statement key or `None`, if no statement was cached.
+        """
+        return self.__statements.get(key)
+
+    def set_statement_context(self, key, context):
+        """
+        Caches the given query context holding a SQL statement for the
+        given statement key.
+        """
+        self.__set(self.__statements, key, context)
+
+    @property
+    def compiled_cache(self):
+        """
+        Cache for the compiled forms of the cached SQL statements (passed
+        to SQLAlchemy as "compiled_cache" execution option).
+        """
+        return self.__compiled_cache
+
+    def clear(self):
+        """
+        Clears all cached expressions and statements.
+        """
+        self.__cache.clear()
+        self.__statements.clear()
+        self.__compiled_cache.clear()
+
+    def __len__(self):
+        return len(self.__cache)
+
+    def __set(self, cache, key, value):
+        if len(cache) >= self.__max_size:
+            cache.clear()
+        cache[key] = value
+
+
+#: Values of the relationship "lazy" setting which load eagerly.
+EAGER_LAZY_SETTINGS = ('joined', 'subquery', False)
+
+def has_eager_collections(mapper):
+    """
+    Checks if loading instances of the given mapper loads collections
+    eagerly through the "lazy" settings of the mapped relationships. This
+    follows eagerly loaded scalar relationships to the related mappers.
+    """
+    mappers = [mapper]
+    seen = set()
+    while len(mappers) > 0:
+        cur_mapper = mappers.pop()
+        if cur_mapper in seen:
+            continue
+        seen.add(cur_mapper)
+        for prop in cur_mapper.relationships:
+            if prop.lazy in EAGER_LAZY_SETTINGS:
+                if prop.uselist:
+                    return True
+                mappers.append(prop.mapper)
+    return False
+
+
 class Query(SaQuery):
     def __init__(self, entities, session, **kw):
         SaQuery.__init__(self, entities, session, **kw)
@@ -215,6 +509,40 @@ class Query(SaQuery):
             self._entity_class = ent_cls
         else:
             self._entity_class = None
+        #: Flag indicating if this query eagerly loads collections.
+        self._has_collection_loads = False
+        #: Eager loading options added through :meth:`load`.
+        self._load_options = ()
+        #: Cache key of the parameterized filter expression of this query
+        #: (see :meth:`SqlExpressionCache.filter_query`).
+        self._filter_key = None
+        #: Key of the cached SQL statement of this query and the expression
+        #: cache holding it (see :meth:`cache_statement`).
+        self._statement_key = None
+        self._statement_cache = None
+
+    def cache_statement(self, cache, key):
+        """
+        Returns a copy of this query which reuses the SQL statement and its
+        compiled form cached under the given key in the given expression
+        cache. Queries with options are returned unchanged.
+
+        :param cache: expression cache to hold the statement.
+        :type cache: :class:`SqlExpressionCache`
+        :param key: hashable key which captures everything that determines
+          the SQL statement of this query except for the values of its bind
+          parameters.
+        """
+        if len(self._with_options) > 0:
+            query = self
+        else:
+            query = self.execution_options(
+                                    compiled_cache=cache.compiled_cache)
+            # pylint: disable=W0212
+            query._statement_key = key
+            query._statement_cache = cache
+            # pylint: enable=W0212
+        return query
 
     def order(self, order_expression):
         return SaQuery.order_by(self, order_expression)
@@ -226,6 +554,112 @@ class Query(SaQuery):
         spec.accept(vst)
         return vst.order_query(self)
 
+    def load(self, *attribute_names):
+        """
+        Adds eager loading options for the given (possibly dotted) related
+        entity attribute names. Related entities are loaded with a join;
+        related entity collections are loaded with one extra query each.
+        Names that do not map to a relationship are ignored.
+        """
+        if self._entity_class is None:
+            return self
+        paths = set()
+        for attr_name in attribute_names:
+            tokens = attr_name.split('.')
+            for idx in range(1, len(tokens) + 1):
+                paths.add(tuple(tokens[:idx]))
+        opts = []
+        has_collection_loads = False
+        for path in sorted(paths, key=len):
+            load_info = self.__make_load_option(path)
+            if not load_info is None:
+                opt, is_collection = load_info
+                opts.append(opt)
+                has_collection_loads |= is_collection
+        if len(opts) > 0:
+            query = self.options(*opts)
+            query._has_collection_loads |= has_collection_loads # pylint: disable=W0212
+            query._load_options += tuple(opts) # pylint: disable=W0212
+        else:
+            query = self
+        return query
+
+    def stream(self, batch_size):
+        """
+        Returns a copy of this query which fetches results in batches of the
+        given size (through a server side cursor on backends that support
+        it) instead of loading all results at once.
+
+        Since eager loading of collections does not work with batched
+        fetching, this returns the query unchanged if collections are
+        eagerly loaded (see :meth:`load`), if the mapper configuration
+        loads collections eagerly or if the query has options other than
+        the ones added by :meth:`load` which may load eagerly.
+        """
+        if self._has_collection_loads \
+           or self.__has_eager_options() \
+           or (not self._entity_class is None
+               and has_eager_collections(class_mapper(self._entity_class))):
+            query = self
+        else:
+            query = self.yield_per(batch_size)
+        return query
+
+    def _clone(self):
+        clone = SaQuery._clone(self)
+        # A cached statement does not apply to modified copies.
+        clone._statement_key = None # pylint: disable=W0212
+        return clone
+
+    def _compile_context(self, labels=True):
+        if self._statement_key is None:
+            context = SaQuery._compile_context(self, labels=labels)
+        else:
+            key = (self._statement_key, labels)
+            cached_context = self._statement_cache.get_statement_context(key)
+            if cached_context is None:
+                context = SaQuery._compile_context(self, labels=labels)
+                cached_context = copy(context)
+                # Do not hold on to the session of this query.
+                cached_context.query = None
+                cached_context.session = None
+                self._statement_cache.set_statement_context(key,
+                                                            cached_context)
+            else:
+                context = copy(cached_context)
+                context.query = self
+                context.session = self.session
+            # The attributes are modified while loading the results.
+            context.attributes = context._attributes = \
+                                        dict(cached_context.attributes)
+        return context
+
+    def __has_eager_options(self):
+        # Any option which is not a (non eager) loader or deferred column
+        # option is assumed to load eagerly.
+        for opt in self._with_options:
+            if opt in self._load_options:
+                continue
+            if not isinstance(opt, (EagerLazyOption, DeferredOption)) \
+               or getattr(opt, 'lazy', None) in EAGER_LAZY_SETTINGS:
+                return True
+        return False
+
+    def __make_load_option(self, path):
+        mapper = class_mapper(self._entity_class)
+        attrs = []
+        for token in path:
+            prop = mapper.relationships.get(token)
+            if prop is None:
+                return None
+            attrs.append(getattr(mapper.class_, token))
+            mapper = prop.mapper
+        if prop.uselist:
+            opt = subqueryload(*attrs)
+        else:
+            opt = joinedload(*attrs)
+        return opt, prop.uselist
+
 
 class CountingQuery(Query):
     def __init__(self, entities, session, **kw):
@@ -234,13 +668,22 @@ class CountingQuery(Query):
         self.__data = None
 
     def __iter__(self):
-        if self.__data is None:
-            self.__count, self.__data = self._load()
-        return iter(self.__data)
+        if not self._yield_per is None:
+            # Streaming mode - results are not held in memory.
+            result = Query.__iter__(self)
+        else:
+            if self.__data is None:
+                self.__count, self.__data = self._load()
+            result = iter(self.__data)
+        return result
 
     def count(self):
         if self.__count is None:
-            self.__count, self.__data = self._load()
+            if not self._yield_per is None:
+                # Streaming mode - count with a separate query.
+                self.__count = self._count()
+            else:
+                self.__count, self.__data = self._load()
         return self.__count
 
     def one(self):
@@ -257,6 +700,22 @@ class CountingQuery(Query):
     def _load(self):
         raise NotImplementedError('Abstract method.')
 
+    def _count(self):
+        # Counts all results ignoring any slice.
+        count_query = self.limit(None).offset(None)
+        # Avoid circular calls to _load by "downcasting" the new query.
+        count_query.__class__ = Query
+        if self._statement_key is None:
+            count = count_query.count()
+        else:
+            # Reuse the cached count statement (see Query.count).
+            count_query = \
+                count_query.from_self(func.count(literal_column('*')))
+            count = count_query.cache_statement(self._statement_cache,
+                                                ('count', self._statement_key)
+                                                ).scalar()
+        return count
+
     def _clone(self):
         clone = Query._clone(self)
         # pylint: disable=W0212
@@ -271,11 +730,7 @@ class SimpleCountingQuery(CountingQuery):
     Non-optimized counting query.
     """
     def _load(self):
-        count_query = self.limit(None).offset(None)
-        # Avoid circular calls to _load by "downcasting" the new query.
-        count_query.__class__ = Query
-        count = count_query.count()
-        return count, list(Query.__iter__(self))
+        return self._count(), list(Query.__iter__(self))
 
 
 class OptimizedCountingQuery(CountingQuery): # pragma: no cover
@@ -13,13 +13,20 @@ from everest.repositories.rdb.querying import SimpleCountingQuery
 from everest.repositories.rdb.session import RdbSessionFactory
 from everest.repositories.rdb.utils import empty_metadata
 from everest.repositories.rdb.utils import get_metadata
+from everest.repositories.rdb.utils import PoolStatistics
 from everest.repositories.rdb.utils import is_metadata_initialized
+from everest.repositories.rdb.utils import make_instrumented_pool_class
 from everest.repositories.rdb.utils import map_system_entities
+from everest.repositories.rdb.utils import ping_connection
 from everest.repositories.rdb.utils import set_metadata
 from everest.repositories.utils import get_engine
 from everest.repositories.utils import is_engine_initialized
 from everest.repositories.utils import set_engine
+from pyramid.compat import string_types
+from pyramid.settings import asbool
+from sqlalchemy import event
 from sqlalchemy.engine import create_engine
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.pool import StaticPool
 
@@ -31,9 +38,23 @@ __all__ = ['RdbRepository',
 class RdbRepository(Repository):
     """
     Repository connected to a relational database backend (through an ORM).
+
+    The connection pool of the engine can be configured with the
+    "pool_class", "pool_size", "pool_max_overflow", "pool_timeout" and
+    "pool_recycle" options (passed on to the engine). If the
+    "pool_pre_ping" option is set, connections are tested for liveness on
+    checkout. If the "pool_statistics" option is set, the pool records
+    connection usage in the :attr:`pool_statistics` object.
+
+    Read only queries can be routed to read replicas of the database by
+    setting the "replica_db_strings" option to a sequence of connection
+    strings (see :class:`everest.repositories.rdb.session.RdbSession`).
     """
     _configurables = Repository._configurables \
-                     + ['db_string', 'metadata_factory']
+                     + ['db_string', 'metadata_factory',
+                        'pool_class', 'pool_size', 'pool_max_overflow',
+                        'pool_timeout', 'pool_recycle', 'pool_pre_ping',
+                        'pool_statistics', 'replica_db_strings']
 
     def __init__(self, name, aggregate_class=None,
                  autoflush=True, join_transaction=True, autocommit=False):
@@ -50,15 +71,25 @@ class RdbRepository(Repository):
         self.autoflush = autoflush
         # Default to an in-memory sqlite DB.
         self.configure(db_string='sqlite://',
-                       metadata_factory=empty_metadata)
+                       metadata_factory=empty_metadata,
+                       pool_class=None, pool_size=None,
+                       pool_max_overflow=None, pool_timeout=None,
+                       pool_recycle=None, pool_pre_ping=False,
+                       pool_statistics=False, replica_db_strings=())
 
     def _initialize(self):
         # Manages a RDB engine and a metadata instance for this repository.
         # Both are global objects that should only be created once per process
         # (for each RDB repository), hence we use a global object manager.
         if not is_engine_initialized(self.name):
-            engine = self.__make_engine()
+            with_stats = asbool(self._config['pool_statistics'])
+            engine = self.__make_engine(self._config['db_string'],
+                                        with_stats)
             set_engine(self.name, engine)
+            for idx, replica_db_string in \
+                        enumerate(self.__get_replica_db_strings()):
+                set_engine(self.__get_replica_engine_name(idx),
+                           self.__make_engine(replica_db_string, False))
             # Bind the engine to the session factory and the metadata.
             self.session_factory.configure(bind=engine)
         else:
@@ -82,21 +113,73 @@ class RdbRepository(Repository):
             metadata = get_metadata(self.name)
         metadata.bind = engine
 
+    @property
+    def pool_statistics(self):
+        """
+        Returns the :class:`everest.repositories.rdb.utils.PoolStatistics`
+        for the connection pool of this repository's engine or `None`, if
+        the "pool_statistics" option was not set.
+        """
+        return getattr(get_engine(self.name).pool, 'statistics', None)
+
+    @property
+    def replica_engines(self):
+        """
+        Returns the list of read replica engines for this repository.
+        """
+        return [get_engine(self.__get_replica_engine_name(idx))
+                for idx in range(len(self.__get_replica_db_strings()))]
+
     def _make_session_factory(self):
         engine = get_engine(self.name)
         query_class = self.__check_query_class(engine)
         return RdbSessionFactory(self, query_class)
 
-    def __make_engine(self):
-        db_string = self._config['db_string']
+    def __get_replica_db_strings(self):
+        replica_db_strings = self._config['replica_db_strings']
+        if isinstance(replica_db_strings, string_types):
+            # From a settings file.
+            replica_db_strings = replica_db_strings.split()
+        return replica_db_strings
+
+    def __get_replica_engine_name(self, index):
+        return '%s-replica%d' % (self.name, index)
+
+    def __make_engine(self, db_string, with_statistics):
+        pool_class = self._config['pool_class']
         if db_string.startswith('sqlite://'):
             # Enable connection sharing across threads for pysqlite.
-            kw = {'poolclass':StaticPool,
-                  'connect_args':{'check_same_thread':False}
-                  }
+            kw = {'connect_args':{'check_same_thread':False}}
+            # Only an in-memory database needs to share its one connection;
+            # pysqlite connections must not be used by several threads
+            # at the same time.
+            if pool_class is None \
+               and make_url(db_string).database in (None, '', ':memory:'):
+                pool_class = StaticPool
         else:
             kw = {} # pragma: no cover
-        return create_engine(db_string, **kw)
+        for name, option in (('pool_size', 'pool_size'),
+                             ('max_overflow', 'pool_max_overflow'),
+                             ('pool_timeout', 'pool_timeout'),
+                             ('pool_recycle', 'pool_recycle')):
+            value = self._config[option]
+            if not value is None:
+                kw[name] = int(value)
+        stats = None
+        if with_statistics:
+            if pool_class is None:
+                url = make_url(db_string)
+                pool_class = url.get_dialect().get_pool_class(url)
+            stats = PoolStatistics()
+            pool_class = make_instrumented_pool_class(pool_class, stats)
+        if not pool_class is None:
+            kw['poolclass'] = pool_class
+        engine = create_engine(db_string, **kw)
+        if asbool(self._config['pool_pre_ping']):
+            event.listen(engine, 'checkout', ping_connection)
+        if not stats is None:
+            stats.install(engine)
+        return engine
 
     def __check_query_class(self, engine):
         # We check if the backend supports windowing for optimized counting.
@@ -107,4 +190,7 @@ class RdbRepository(Repository):
             query_class = SimpleCountingQuery
         else:
             query_class = OptimizedCountingQuery # pragma: no cover
+        finally:
+            # Return the connection to the pool.
+            conn.close()
         return query_class
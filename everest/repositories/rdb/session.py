@@ -6,20 +6,28 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 Created on Jan 8, 2013.
 """
+from sqlalchemy.orm import class_mapper
 from sqlalchemy.orm import scoped_session
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.query import Query
 from sqlalchemy.orm.session import Session as SaSession
+from sqlalchemy.sql.expression import Select
 
 from everest.constants import RELATION_OPERATIONS
 from everest.entities.interfaces import IEntity
 from everest.entities.traversal import AruVisitor
+from everest.exceptions import MultipleResultsException
+from everest.exceptions import NoResultsException
 from everest.repositories.base import AutocommittingSessionMixin
 from everest.repositories.base import Session
 from everest.repositories.base import SessionFactory
+from everest.repositories.rdb.querying import SqlExpressionCache
+from everest.repositories.rdb.utils import slug_lookup_query
 from everest.repositories.state import EntityState
+from everest.repositories.utils import is_read_only
 from everest.traversal import SourceTargetDataTreeTraverser
 from zope.sqlalchemy import ZopeTransactionExtension # pylint: disable=E0611,F0401
+import random
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['RdbAutocommittingSession',
@@ -32,39 +40,141 @@ __all__ = ['RdbAutocommittingSession',
 class RdbSession(Session, SaSession):
     """
     Special session class adapting the SQLAlchemy session for everest.
+
+    If read replica engines are passed with the "replica_binds" option,
+    read only queries are routed to one of the replicas as long as the
+    session has not written to the primary database. Once changes were
+    flushed, the session stays "sticky" to the primary until it is closed.
+
+    Access by slug loads the entity with a single cached SQL statement on
+    the slug expression of the entity class; entities that are already
+    loaded are taken from the identity map.
     """
     IS_MANAGING_BACKREFERENCES = False
+    #: Maximum number of IDs to pass in a single IN clause when loading
+    #: entities in batches.
+    MAX_IN_CLAUSE_SIZE = 500
 
     def __init__(self, *args, **options):
         self.__repository = options.pop('repository')
+        self.__replica_binds = options.pop('replica_binds', None) or []
+        self.__replica_bind = None
+        self.__is_sticky = False
         SaSession.__init__(self, *args, **options)
 
+    def get_bind(self, mapper=None, clause=None):
+        # Route SELECT statements issued in a read only context to a replica.
+        bind = None
+        if is_read_only() and isinstance(clause, Select):
+            bind = self.get_replica_bind()
+        if bind is None:
+            bind = SaSession.get_bind(self, mapper=mapper, clause=clause)
+        return bind
+
+    def get_replica_bind(self):
+        """
+        Returns the read replica engine to run read only queries on or
+        `None`, if no replicas were configured or if the session has
+        pending changes or has written to the primary database before.
+        """
+        # Building the "dirty" set checks every instance in the identity
+        # map, so we use the (cheap) check for a clean session instead.
+        if not self.__replica_binds or self.__is_sticky \
+           or not self._is_clean():
+            bind = None
+        else:
+            if self.__replica_bind is None:
+                # Each session sticks to one randomly chosen replica.
+                self.__replica_bind = random.choice(self.__replica_binds)
+            bind = self.__replica_bind
+        return bind
+
+    def flush(self, objects=None):
+        if not self._is_clean():
+            self.__is_sticky = True
+        SaSession.flush(self, objects=objects)
+
+    def close(self):
+        self.__is_sticky = False
+        self.__replica_bind = None
+        SaSession.close(self)
+
     def get_by_id(self, entity_class, id_key):
         return self.query(entity_class).get(id_key)
 
+    def get_by_ids(self, entity_class, id_keys):
+        # Entities in the identity map are used as they are; the remaining
+        # ones are loaded with IN queries on the ID attribute.
+        mpr = class_mapper(entity_class)
+        ent_map = {}
+        missing_ids = []
+        seen_ids = set()
+        for id_key in id_keys:
+            if id_key in seen_ids:
+                continue
+            seen_ids.add(id_key)
+            ident = mpr.identity_key_from_primary_key((id_key,))
+            ent = self.identity_map.get(ident)
+            if not ent is None and not ent in self.deleted \
+               and isinstance(ent, entity_class):
+                ent_map[id_key] = ent
+            else:
+                missing_ids.append(id_key)
+        for idx in range(0, len(missing_ids), self.MAX_IN_CLAUSE_SIZE):
+            chunk = missing_ids[idx:idx + self.MAX_IN_CLAUSE_SIZE]
+            query = self.query(entity_class) \
+                        .filter(entity_class.id.in_(chunk))
+            for ent in query:
+                ent_map[ent.id] = ent
+        ents = []
+        for id_key in id_keys:
+            ent = ent_map.get(id_key)
+            if not ent is None:
+                ents.append(ent)
+        return ents
+
     def get_by_slug(self, entity_class, slug):
-        # We don't have an optimization for access by slug here; returning
-        # `None` indicates that a query should be run.
-        return None
+        # The query autoflushes pending changes and returns instances that
+        # are already in the identity map. Its result is authoritative, so
+        # misses are reported as exceptions rather than with `None` (which
+        # would make the aggregate run another query).
+        ents = slug_lookup_query(self, entity_class).params(slug=slug).all()
+        if len(ents) == 0:
+            raise NoResultsException('No entity found for slug "%s".'
+                                     % slug)
+        elif len(ents) > 1:
+            raise MultipleResultsException('More than one entity found for '
+                                           'slug "%s".' % slug)
+        return ents[0]
 
     def add(self, entity_class, data):
         if not IEntity.providedBy(data): # pylint: disable=E1101
-            self.__run_traversal(entity_class, data, None,
-                                 RELATION_OPERATIONS.ADD)
+            trv = self.__make_traverser(entity_class, data, None,
+                                        RELATION_OPERATIONS.ADD)
+            # Flat data of new entities are added without running the
+            # traversal.
+            entities = trv.get_flat_add_entities()
+            if entities is None:
+                self.__run_traversal(entity_class, trv)
+            else:
+                for entity in entities:
+                    SaSession.add(self, entity)
         else:
             SaSession.add(self, data)
 
     def remove(self, entity_class, data):
         if not IEntity.providedBy(data): # pylint: disable=E1101
-            self.__run_traversal(entity_class, None, data,
-                                 RELATION_OPERATIONS.REMOVE)
+            trv = self.__make_traverser(entity_class, None, data,
+                                        RELATION_OPERATIONS.REMOVE)
+            self.__run_traversal(entity_class, trv)
         else:
             SaSession.delete(self, data)
 
     def update(self, entity_class, data, target=None):
         if not IEntity.providedBy(data): # pylint: disable=E1101
-            upd_ent = self.__run_traversal(entity_class, data, target,
-                                           RELATION_OPERATIONS.UPDATE)
+            trv = self.__make_traverser(entity_class, data, target,
+                                        RELATION_OPERATIONS.UPDATE)
+            upd_ent = self.__run_traversal(entity_class, trv)
         else:
             upd_ent = SaSession.merge(self, data)
         return upd_ent
@@ -76,12 +186,15 @@ class RdbSession(Session, SaSession):
         query_cls = options.pop('query_class', Query)
         return query_cls(entities, self, **options)
 
-    def __run_traversal(self, entity_class, source_data, target_data, rel_op):
+    def __make_traverser(self, entity_class, source_data, target_data,
+                         rel_op):
         agg = self.__repository.get_aggregate(entity_class)
-        trv = SourceTargetDataTreeTraverser.make_traverser(
+        return SourceTargetDataTreeTraverser.make_traverser(
                                     source_data, target_data, rel_op,
                                     accessor=agg,
                                     manage_back_references=False)
+
+    def __run_traversal(self, entity_class, trv):
         vst = AruVisitor(entity_class,
                          add_callback=self.__add,
                          remove_callback=self.__remove,
@@ -129,6 +242,9 @@ class RdbSessionFactory(SessionFactory):
         #: This is the (optimized, if the engine supports it) counting query
         #: class used for paged queries.
         self.counting_query_class = counting_query_class
+        #: Cache for the SQL expressions generated from filter and order
+        #: specifications.
+        self.expression_cache = SqlExpressionCache()
 
     def configure(self, **kw):
         self.__fac.configure(**kw)
@@ -137,7 +253,8 @@ class RdbSessionFactory(SessionFactory):
         if not self.__fac.registry.has():
             self.__fac.configure(
                             autoflush=self._repository.autoflush,
-                            repository=self._repository)
+                            repository=self._repository,
+                            replica_binds=self._repository.replica_engines)
             if not self._repository.autocommit \
                and self._repository.join_transaction:
                 # Enable the Zope transaction extension.
@@ -12,32 +12,45 @@ from everest.repositories.utils import GlobalObjectManager
 from inspect import isdatadescriptor
 from sqlalchemy import Column
 from sqlalchemy import DateTime
+from sqlalchemy import Index
 from sqlalchemy import MetaData
 from sqlalchemy import String
 from sqlalchemy import Table
+from sqlalchemy import event
 from sqlalchemy import func as sa_func
+from sqlalchemy.exc import DisconnectionError
+from sqlalchemy.exc import TimeoutError as SaTimeoutError
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import class_mapper
 from sqlalchemy.orm import clear_mappers as sa_clear_mappers
 from sqlalchemy.orm import mapper as sa_mapper
 from sqlalchemy.orm.interfaces import MANYTOMANY
 from sqlalchemy.orm.interfaces import MANYTOONE
 from sqlalchemy.orm.interfaces import ONETOMANY
 from sqlalchemy.orm.mapper import _mapper_registry
+from sqlalchemy.orm.query import Query as SaQuery
+from sqlalchemy.sql.expression import bindparam
 from sqlalchemy.sql.expression import cast
 from threading import Lock
+import time
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['OrmAttributeInspector',
+           'PoolStatistics',
            'as_slug_expression',
            'clear_mappers',
            'empty_metadata',
            'get_metadata',
            'hybrid_descriptor',
            'is_metadata_initialized',
+           'make_instrumented_pool_class',
+           'make_slug_index',
            'map_system_entities',
            'mapper',
+           'ping_connection',
            'reset_metadata',
            'set_metadata',
+           'slug_lookup_query',
            'synonym',
            ]
 
@@ -84,6 +97,8 @@ def clear_mappers():
                             setattr(mpr.class_, attr_name, attr.descriptor)
                 except AttributeError:
                     pass
+    _slug_lookup_statements.clear()
+    _slug_lookup_compiled_cache.clear()
     sa_clear_mappers()
 
 
@@ -132,7 +147,11 @@ def mapper(class_, local_table=None, id_attribute='id', slug_expression=None,
       ID column (will be aliased to a new "id" attribute in the mapped class)
     :param slug_expression: function to generate a slug SQL expression given
       the mapped class as argument.
+    :param bool slug_index: if this keyword parameter is set, a functional
+      index on the slug expression is added to the mapped table (see
+      :func:`make_slug_index`).
     """
+    slug_index = kwargs.pop('slug_index', False)
     mpr = sa_mapper(class_, local_table=local_table, *args, **kwargs)
     # Set up the ID attribute as a hybrid property, if necessary.
     if id_attribute != 'id':
@@ -170,9 +189,53 @@ def mapper(class_, local_table=None, id_attribute='id', slug_expression=None,
             cls_expr = slug_expression
         hyb_descr = hybrid_descriptor(slug_descr, expr=cls_expr)
     class_.slug = hyb_descr
+    if slug_index:
+        make_slug_index(class_)
     return mpr
 
 
+def make_slug_index(class_, name=None):
+    """
+    Creates a functional index on the slug SQL expression of the given
+    mapped class.
+
+    Access by slug uses the slug expression in a WHERE clause; with a custom
+    slug expression, the database can only use an index for this lookup if
+    it was created on the very same expression. The index is added to the
+    mapped table and is created along with the other schema elements of the
+    table's metadata.
+
+    :param str name: name of the index. Defaults to "ix_<table name>_slug".
+    """
+    tbl = class_mapper(class_).local_table
+    if name is None:
+        name = 'ix_%s_slug' % tbl.name
+    return Index(name, class_.slug)
+
+
+#: Cache for the slug lookup statements.
+_slug_lookup_statements = {}
+
+#: Cache for the compiled forms of the slug lookup statements.
+_slug_lookup_compiled_cache = {}
+
+
+def slug_lookup_query(session, class_):
+    """
+    Returns a query which loads the instance of the given mapped class with
+    the slug passed as "slug" parameter in a single SELECT statement on the
+    class' slug SQL expression. Both the statement and its compiled form are
+    cached.
+    """
+    stmt = _slug_lookup_statements.get(class_)
+    if stmt is None:
+        stmt = SaQuery(class_).filter(class_.slug == bindparam('slug')) \
+                              .statement
+        _slug_lookup_statements[class_] = stmt
+    return session.query(class_).from_statement(stmt) \
+            .execution_options(compiled_cache=_slug_lookup_compiled_cache)
+
+
 def synonym(name):
     """
     Utility function mimicking the behavior of the old SA synonym function
@@ -209,6 +272,120 @@ def empty_metadata(engine):
     return metadata
 
 
+def ping_connection(dbapi_connection, connection_record, connection_proxy): # unused pylint: disable=W0613
+    """
+    Pool checkout event listener testing the liveness of the checked out
+    DBAPI connection with a lightweight query. Stale connections are
+    reported as disconnected to the pool which then retries the checkout
+    with a fresh connection.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('SELECT 1')
+    except Exception: # catch all pylint: disable=W0703
+        raise DisconnectionError()
+    finally:
+        cursor.close()
+
+
+class PoolStatistics(object):
+    """
+    Usage statistics for a connection pool.
+
+    Keeps track of connection checkouts and checkins, of newly opened DBAPI
+    connections, and of the time spent waiting for a pooled connection.
+    This information can be used to size the pool for the number of
+    worker threads.
+    """
+    def __init__(self):
+        self.__lock = Lock()
+        #: Number of connection checkouts.
+        self.checkouts = 0
+        #: Number of connection checkins.
+        self.checkins = 0
+        #: Number of DBAPI connections opened by the pool.
+        self.connects = 0
+        #: Number of checkouts that timed out.
+        self.timeouts = 0
+        #: Maximum number of connections checked out at the same time.
+        self.max_checked_out = 0
+        #: Total time (in seconds) spent waiting for a connection.
+        self.total_wait_time = 0.0
+        #: Maximum time (in seconds) spent waiting for a connection.
+        self.max_wait_time = 0.0
+
+    def install(self, engine):
+        """
+        Registers pool event listeners recording statistics for the pool of
+        the given engine.
+        """
+        event.listen(engine, 'connect', self.__on_connect)
+        event.listen(engine, 'checkout', self.__on_checkout)
+        event.listen(engine, 'checkin', self.__on_checkin)
+
+    def record_wait(self, wait_time, timed_out=False):
+        """
+        Records the time spent waiting for a connection.
+        """
+        with self.__lock:
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+            if timed_out:
+                self.timeouts += 1
+
+    @property
+    def checked_out(self):
+        """
+        Number of connections currently checked out.
+        """
+        return self.checkouts - self.checkins
+
+    @property
+    def mean_wait_time(self):
+        """
+        Mean time (in seconds) spent waiting for a connection.
+        """
+        num_waits = self.checkouts + self.timeouts
+        return num_waits and self.total_wait_time / num_waits or 0.0
+
+    def __on_connect(self, dbapi_connection, connection_record): # unused pylint: disable=W0613
+        with self.__lock:
+            self.connects += 1
+
+    def __on_checkout(self, dbapi_connection, connection_record, # unused pylint: disable=W0613
+                      connection_proxy):
+        with self.__lock:
+            self.checkouts += 1
+            self.max_checked_out = max(self.max_checked_out,
+                                       self.checked_out)
+
+    def __on_checkin(self, dbapi_connection, connection_record): # unused pylint: disable=W0613
+        with self.__lock:
+            self.checkins += 1
+
+
+def make_instrumented_pool_class(pool_class, statistics):
+    """
+    Creates a subclass of the given pool class that records the time spent
+    waiting for connections in the given pool statistics. The statistics
+    are available through the `statistics` attribute of the pool class.
+
+    :param pool_class: SQLAlchemy pool class to instrument.
+    :param statistics: :class:`PoolStatistics` instance.
+    """
+    def connect(self):
+        start = time.time()
+        try:
+            conn = pool_class.connect(self)
+        except SaTimeoutError:
+            statistics.record_wait(time.time() - start, timed_out=True)
+            raise
+        statistics.record_wait(time.time() - start)
+        return conn
+    return type('Instrumented%s' % pool_class.__name__, (pool_class,),
+                dict(connect=connect, statistics=statistics))
+
+
 class OrmAttributeInspector(object):
     """
     Helper class inspecting class attributes mapped by the ORM.
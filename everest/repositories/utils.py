@@ -7,8 +7,10 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 Created on Jan 17, 2013.
 """
 from everest.repositories.interfaces import IRepository
+from contextlib import contextmanager
 from pyramid.threadlocal import get_current_registry
 from threading import Lock
+from threading import local
 from zope.interface import providedBy as provided_by # pylint: disable=E0611,F0401
 from zope.interface.interfaces import IInterface # pylint: disable=E0611,F0401
 
@@ -17,6 +19,8 @@ __all__ = ['GlobalObjectManager',
            'commit_veto',
            'get_engine',
            'is_engine_initialized',
+           'is_read_only',
+           'read_only',
            'reset_engines',
            'set_engine',
            ]
@@ -105,3 +109,31 @@ def commit_veto(request, response): # unused request arg pylint: disable=W0613
         result = not response.status.startswith('2') \
                  and not tm_header == 'commit'
     return result
+
+
+class _ReadOnlyState(local):
+    # Thread local state for the :func:`read_only` context manager.
+    depth = 0
+
+_read_only_state = _ReadOnlyState()
+
+
+@contextmanager
+def read_only():
+    """
+    Context manager flagging all repository access from the current thread
+    within the context as read only. Repositories may use this to route
+    queries to read replicas.
+    """
+    _read_only_state.depth += 1
+    try:
+        yield
+    finally:
+        _read_only_state.depth -= 1
+
+
+def is_read_only():
+    """
+    Checks if the current thread is within a :func:`read_only` context.
+    """
+    return _read_only_state.depth > 0
@@ -78,7 +78,7 @@ class JsonDataTreeTraverser(ResourceDataTreeTraverser):
                 traverse_fn = self._traverse_member
             elif attr.kind == RESOURCE_ATTRIBUTE_KINDS.COLLECTION:
                 traverse_fn = self._traverse_collection
-        traverse_fn(attr_key, attr, node, parent_data, visitor)
+        return traverse_fn(attr_key, attr, node, parent_data, visitor)
 
     def _get_node_type(self, node):
         relation = node.get('__jsonclass__')
@@ -13,6 +13,8 @@ from everest.constants import RESOURCE_ATTRIBUTE_KINDS
 from everest.constants import RESOURCE_KINDS
 from everest.entities.utils import get_entity_class
 from everest.interfaces import IDataTraversalProxyFactory
+from everest.querying.base import EXPRESSION_KINDS
+from everest.querying.utils import get_filter_specification_factory
 from everest.representers.attributes import MappedAttributeKey
 from everest.representers.config import IGNORE_OPTION
 from everest.representers.config import WRITE_AS_LINK_OPTION
@@ -22,11 +24,14 @@ from everest.representers.interfaces import ILinkedDataElement
 from everest.representers.interfaces import IMemberDataElement
 from everest.resources.interfaces import ICollectionResource
 from everest.resources.interfaces import IMemberResource
+from everest.resources.utils import as_member
 from everest.resources.utils import get_collection_class
 from everest.resources.utils import get_member_class
 from everest.traversal import ConvertingDataTraversalProxyMixin
 from everest.traversal import DataTraversalProxy
 from everest.traversal import DataTraversalProxyAdapter
+from everest.traversal import run_traversal
+from everest.utils import get_nested_attribute
 from everest.utils import set_nested_attribute
 from pyramid.compat import iteritems_
 from pyramid.threadlocal import get_current_registry
@@ -217,16 +222,26 @@ class DataElementBuilderResourceTreeVisitor(
 class DataTreeTraverser(object):
     """
     Abstract base class for data tree traversers.
+
+    The traversal methods return traversal generators which yield the
+    traversal generators for the child nodes before visiting their own
+    node (see :func:`everest.traversal.run_traversal`).
     """
-    def __init__(self, root):
+    def __init__(self, root, iterative=True):
+        """
+        :param bool iterative: Flag indicating if the traversal should be
+          run with an explicit stack rather than recursively.
+        """
         self.__root = root
+        self.__iterative = iterative
 
     def run(self, visitor):
         """
         Runs this traverser.
         """
-        self._dispatch(MappedAttributeKey(()), None, self.__root, None,
-                       visitor)
+        run_traversal(self._dispatch(MappedAttributeKey(()), None,
+                                     self.__root, None, visitor),
+                      iterative=self.__iterative)
 
     def _traverse_collection(self, attr_key, attr, collection_node,
                              parent_data, visitor):
@@ -238,8 +253,9 @@ class DataTreeTraverser(object):
         if not is_link_node:
             all_mb_nodes = self._get_node_members(collection_node)
             for idx, mb_node in enumerate(all_mb_nodes):
-                self._traverse_member(attr_key, attr, mb_node, collection_data,
-                                      visitor, index=idx)
+                yield self._traverse_member(attr_key, attr, mb_node,
+                                            collection_data, visitor,
+                                            index=idx)
         visitor.visit_collection(attr_key, attr, collection_node,
                                  collection_data, is_link_node, parent_data)
 
@@ -254,6 +270,9 @@ class DataTreeTraverser(object):
         raise NotImplementedError('Abstract method.')
 
     def _dispatch(self, attr_key, attr, node, parent_data, visitor):
+        """
+        Returns the traversal generator for the given node.
+        """
         raise NotImplementedError('Abstract method.')
 
 
@@ -261,8 +280,9 @@ class ResourceDataTreeTraverser(DataTreeTraverser):
     """
     Abstract base class for resource data tree traversers.
     """
-    def __init__(self, root, mapping, ignore_none_values=True):
-        DataTreeTraverser.__init__(self, root)
+    def __init__(self, root, mapping, ignore_none_values=True,
+                 iterative=True):
+        DataTreeTraverser.__init__(self, root, iterative=iterative)
         self._mapping = mapping
         self.__ignore_none_values = ignore_none_values
 
@@ -307,8 +327,8 @@ class ResourceDataTreeTraverser(DataTreeTraverser):
                         # the defaults for ignoring attributes of the
                         # nested attribute can be retrieved correctly.
                         nested_attr_key.offset = len(nested_attr_key)
-                    self._dispatch(nested_attr_key, mb_attr, nested_node,
-                                   member_data, visitor)
+                    yield self._dispatch(nested_attr_key, mb_attr,
+                                         nested_node, member_data, visitor)
         visitor.visit_member(attr_key, attr, member_node, member_data,
                              is_link_node, parent_data, index=index)
 
@@ -333,10 +353,11 @@ class DataElementTreeTraverser(ResourceDataTreeTraverser):
     a data element tree.
     """
     def __init__(self, root, mapping,
-                 ignore_none_values=True):
+                 ignore_none_values=True, iterative=True):
         ResourceDataTreeTraverser.__init__(
                                     self, root, mapping,
-                                    ignore_none_values=ignore_none_values)
+                                    ignore_none_values=ignore_none_values,
+                                    iterative=iterative)
 
     def _dispatch(self, attr_key, attr, node, parent_data, visitor):
         ifcs = provided_by(node)
@@ -353,7 +374,7 @@ class DataElementTreeTraverser(ResourceDataTreeTraverser):
         else:
             raise ValueError('Need MEMBER or COLLECTION data element; found '
                              '"%s".' % node)
-        traverse_fn(attr_key, attr, node, parent_data, visitor)
+        return traverse_fn(attr_key, attr, node, parent_data, visitor)
 
     def _is_link_node(self, node, attr): # pylint: disable=W0613
         return ILinkedDataElement in provided_by(node)
@@ -375,22 +396,32 @@ class ResourceTreeTraverser(ResourceDataTreeTraverser):
     """
     Mapping traverser for resource trees.
     """
-    def __init__(self, root, mapping, ignore_none_values=True):
+    def __init__(self, root, mapping, ignore_none_values=True,
+                 iterative=True):
         ResourceDataTreeTraverser.__init__(
                                     self, root, mapping,
-                                    ignore_none_values=ignore_none_values)
+                                    ignore_none_values=ignore_none_values,
+                                    iterative=iterative)
+        # Maps collection node IDs to the names of the related entity
+        # attributes to load eagerly when the members are traversed.
+        self.__load_attributes = {}
+        # Names of the keys of nested collections which are read from the
+        # eagerly loaded related entity collections.
+        self.__loaded_keys = set()
 
     def _dispatch(self, attr_key, attr, node, parent_data, visitor):
         ifcs = provided_by(node)
         if IMemberResource in ifcs:
-            self._traverse_member(attr_key, attr, node, parent_data, visitor)
+            trv = self._traverse_member(attr_key, attr, node, parent_data,
+                                        visitor)
         elif ICollectionResource in ifcs:
-            self._traverse_collection(attr_key, attr, node, parent_data,
-                                      visitor)
+            trv = self._traverse_collection(attr_key, attr, node,
+                                            parent_data, visitor)
         else:
             raise ValueError('Can only traverse objects that provide'
                              'IMemberResource or ICollectionResource '
                              '(key: %s).' % str(attr_key))
+        return trv
 
     def _get_node_type(self, node):
         return type(node)
@@ -402,12 +433,119 @@ class ResourceTreeTraverser(ResourceDataTreeTraverser):
         return getattr(node, attr.name)
 
     def _get_node_members(self, node):
-        return iter(node)
+        load_attrs = self.__load_attributes.pop(id(node), None)
+        page = node.get_page()
+        if load_attrs is None:
+            mb_nodes = iter(node)
+        elif not page is None:
+            # Reuse the entities which were fetched for the page already;
+            # only their related entities are loaded.
+            self.__load_related(node, page, load_attrs)
+            mb_nodes = iter(node)
+        else:
+            # Set the load options on a clone so the aggregate of the
+            # traversed collection is left untouched.
+            agg = node.get_aggregate().clone()
+            agg.load_attributes = load_attrs
+            mb_nodes = (as_member(ent, parent=node) for ent in agg.iterator())
+        return mb_nodes
 
     def _is_link_node(self, node, attr):
         return not attr is None and \
                not attr.options.get(WRITE_AS_LINK_OPTION) is False
 
+    def _traverse_collection(self, attr_key, attr, collection_node,
+                             parent_data, visitor):
+        is_link_node = \
+            self._is_link_node(collection_node, attr) \
+            or (not attr is None and
+                attr.options.get(WRITE_MEMBERS_AS_LINK_OPTION) is True)
+        if attr_key.names in self.__loaded_keys:
+            # The members of this nested collection were loaded along with
+            # the entities of the parent collection.
+            ents = get_nested_attribute(
+                                collection_node.__parent__.get_entity(),
+                                attr.entity_attr)
+            collection_node.set_page(ents)
+        elif not is_link_node:
+            # Collect the related entities which will be accessed when the
+            # members are traversed so they can be loaded eagerly (instead
+            # of with one query per member).
+            if not attr is None:
+                mb_cls = get_member_class(attr.value_type)
+            else:
+                mb_cls = get_member_class(collection_node)
+            load_attrs = \
+                list(OrderedDict.fromkeys(
+                        self.__get_load_attributes(mb_cls, attr_key, '')))
+            if len(load_attrs) > 0:
+                self.__load_attributes[id(collection_node)] = load_attrs
+        return ResourceDataTreeTraverser._traverse_collection(
+                                                    self, attr_key, attr,
+                                                    collection_node,
+                                                    parent_data, visitor)
+
+    def __get_load_attributes(self, member_class, attr_key, prefix):
+        # Collects the names of all related entity attributes that are
+        # accessed when traversing members of the given class at the
+        # given attribute key. The keys of nested collections with
+        # traversed members are recorded so their members can be read from
+        # the loaded related entity collections.
+        load_attrs = []
+        for mb_attr in self._mapping.attribute_iterator(member_class,
+                                                        attr_key):
+            if mb_attr.entity_attr is None \
+               or mb_attr.should_ignore(attr_key):
+                continue
+            entity_attr = prefix + mb_attr.entity_attr
+            if mb_attr.kind == RESOURCE_ATTRIBUTE_KINDS.TERMINAL:
+                # Dotted terminal attributes are read from related entities.
+                if '.' in mb_attr.entity_attr:
+                    load_attrs.append(entity_attr.rsplit('.', 1)[0])
+            elif mb_attr.kind == RESOURCE_ATTRIBUTE_KINDS.MEMBER:
+                load_attrs.append(entity_attr)
+                if mb_attr.options.get(WRITE_AS_LINK_OPTION) is False:
+                    load_attrs.extend(
+                        self.__get_load_attributes(
+                                    get_member_class(mb_attr.value_type),
+                                    attr_key + (mb_attr,),
+                                    entity_attr + '.'))
+            else:
+                mbs_as_link = \
+                    mb_attr.options.get(WRITE_MEMBERS_AS_LINK_OPTION) is True
+                if mb_attr.options.get(WRITE_AS_LINK_OPTION) is False \
+                   or mbs_as_link:
+                    nested_attr_key = attr_key + (mb_attr,)
+                    load_attrs.append(entity_attr)
+                    self.__loaded_keys.add(nested_attr_key.names)
+                    if not mbs_as_link:
+                        load_attrs.extend(
+                            self.__get_load_attributes(
+                                    get_member_class(mb_attr.value_type),
+                                    nested_attr_key,
+                                    entity_attr + '.'))
+                elif mb_attr.entity_backref is None:
+                    # Links to collections without a back reference are
+                    # built from the related entity collection.
+                    load_attrs.append(entity_attr)
+        return load_attrs
+
+    def __load_related(self, node, entities, load_attributes):
+        # Loads the given related entity attributes for the given entities
+        # of the given collection node with a single query. Aggregates
+        # which evaluate expressions hold fully loaded entities.
+        agg = node.get_aggregate()
+        if len(entities) > 0 \
+           and agg.expression_kind != EXPRESSION_KINDS.EVAL:
+            agg = agg.clone()
+            spec_fac = get_filter_specification_factory()
+            agg.filter = spec_fac.create_contained(
+                                        'id', [ent.id for ent in entities])
+            agg.order = None
+            agg.slice = None
+            agg.keyset = None
+            agg.load_attributes = load_attributes
+            list(agg.iterator())
 
 class DataElementDataTraversalProxy(ConvertingDataTraversalProxyMixin,
                                     DataTraversalProxy):
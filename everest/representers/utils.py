@@ -10,6 +10,7 @@ from everest.representers.interfaces import ICollectionDataElement
 from everest.representers.interfaces import ILinkedDataElement
 from everest.representers.interfaces import IRepresenterRegistry
 from everest.representers.interfaces import IResourceDataElement
+from everest.resources.classmap import ResourceClassMap
 from pyramid.compat import NativeIO
 from pyramid.compat import iteritems_
 from pyramid.threadlocal import get_current_registry
@@ -33,7 +34,11 @@ def as_representer(resource, content_type):
     :param str content_type: content (MIME) type to obtain a representer for.
     """
     reg = get_current_registry()
-    rpr_reg = reg.queryUtility(IRepresenterRegistry)
+    cls_map = ResourceClassMap.for_registry(reg)
+    if not cls_map is None:
+        rpr_reg = cls_map.representer_registry
+    else:
+        rpr_reg = reg.queryUtility(IRepresenterRegistry)
     return rpr_reg.create(type(resource), content_type)
 
 
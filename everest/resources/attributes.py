@@ -96,7 +96,7 @@ class MetaResourceAttributeCollector(type):
 # PY3 compatible way of using the metaclass (__metaclass__ does not work).
 ResourceAttributeControllerMixin = MetaResourceAttributeCollector(
                                         'ResourceAttributeControllerMixin',
-                                        (object,), {})
+                                        (object,), {'__slots__' : ()})
 # This is populated by the meta class.
 ResourceAttributeControllerMixin.__everest_attributes__ = None
 
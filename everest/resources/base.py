@@ -44,7 +44,12 @@ __all__ = ['Collection',
 class Resource(object):
     """
     Abstract base class for all resources.
+
+    Resources use slots for their state so that instances of (member)
+    resource classes which do not declare instance attributes of their
+    own never allocate an instance dictionary.
     """
+    __slots__ = ('__parent__', '_relationship', 'is_nested', '__links')
 
     #: Authentication specifier. Override as needed.
     __acl__ = [
@@ -53,8 +58,6 @@ class Resource(object):
         (Allow, Authenticated, 'update'),
         (Allow, Authenticated, 'delete'),
         ]
-    #: The parent of this resource. This is `None` for the service resource.
-    __parent__ = None
     #: The name of the resource. This has to be unique within the parent.
     __name__ = None
     #: The relation identifier to show in links to this resource. Needs to
@@ -74,12 +77,15 @@ class Resource(object):
         if self.__class__.relation is None:
             raise ValueError('Resource classes must have a relation '
                              'attribute.')
+        #: The parent of this resource. This is `None` for the service
+        #: resource.
+        self.__parent__ = None
         #: A relationship to some other resource. Makes this resource a
         #: "nested" resource.
         self._relationship = relationship
         self.is_nested = not relationship is None
-        #: A set of links to other resources.
-        self.links = set()
+        # The set of links to other resources is created on demand.
+        self.__links = None
 
     def add_link(self, link):
         """
@@ -90,6 +96,23 @@ class Resource(object):
         """
         self.links.add(link)
 
+    @property
+    def links(self):
+        """
+        The set of links to other resources. This is created on first
+        access.
+        """
+        if self.__links is None:
+            self.__links = self._make_links()
+        return self.__links
+
+    def _make_links(self):
+        """
+        Returns the initial set of links for this resource. This default
+        implementation returns an empty set.
+        """
+        return set()
+
     @property
     def path(self):
         """
@@ -117,6 +140,7 @@ class Member(ResourceAttributeControllerMixin, Resource):
     """
     Base class for all member resources.
     """
+    __slots__ = ('__entity', '__name')
 
     id = terminal_attribute(int, 'id')
 
@@ -138,8 +162,6 @@ class Member(ResourceAttributeControllerMixin, Resource):
         super(Member, self).__init__(relationship=relationship)
         self.__entity = entity
         self.__name = name
-        # Add the rel="self" link.
-        self.add_link(Link(self, "self"))
 
     def _get__name__(self):
         # The name of a member resource defaults to the slug of the underlying
@@ -151,6 +173,10 @@ class Member(ResourceAttributeControllerMixin, Resource):
 
     __name__ = property(_get__name__, _set__name__)
 
+    def _make_links(self):
+        # Members always have a rel="self" link.
+        return set([Link(self, "self")])
+
     @classmethod
     def create_from_entity(cls, entity):
         """
@@ -246,6 +272,11 @@ class Collection(Resource):
     #: this is set in derived classes, no limit is enforced (i.e., the
     #: default maximum limit is None).
     max_limit = None
+    #: Flag indicating if this collection should be paged using keyset
+    #: (seek) pagination by default. Keyset paging avoids costly offset
+    #: queries for deep pages, but only offers first, previous, next, and
+    #: last navigation links.
+    keyset_paging = False
 
     def __init__(self, aggregate, name=None, relationship=None):
         """
@@ -273,6 +304,8 @@ class Collection(Resource):
         self._order_spec = None
         # The underlying aggregate.
         self.__aggregate = aggregate
+        # Entities of the current page, if these were fetched already.
+        self.__page = None
 
     @classmethod
     def create_from_aggregate(cls, aggregate, relationship=None):
@@ -338,7 +371,11 @@ class Collection(Resource):
         Returns an iterator over the (possibly filtered and ordered)
         collection.
         """
-        for obj in self.__aggregate.iterator():
+        if not self.__page is None:
+            ents = iter(self.__page)
+        else:
+            ents = self.__aggregate.iterator()
+        for obj in ents:
             rc = as_member(obj, parent=self)
             yield rc
 
@@ -404,6 +441,26 @@ class Collection(Resource):
             rc = default
         return rc
 
+    def set_page(self, entities):
+        """
+        Sets the entities on the current page of this collection.
+
+        Iterating over the collection yields members for the given entities
+        instead of querying the aggregate again until the filter, order,
+        slice or keyset of the collection are changed.
+
+        :param entities: Sequence of entities as retrieved from the
+          aggregate.
+        """
+        self.__page = list(entities)
+
+    def get_page(self):
+        """
+        Returns the entities on the current page of this collection or
+        `None`, if these have not been set (see :meth:`set_page`).
+        """
+        return self.__page
+
     def update(self, data, target=None):
         """
         Updates this collection from the given data.
@@ -441,6 +498,7 @@ class Collection(Resource):
         else:
             self.__aggregate.filter = None
         self._filter_spec = filter_spec
+        self.__page = None
 
     filter = property(_get_filter, _set_filter)
 
@@ -458,6 +516,7 @@ class Collection(Resource):
         else:
             self.__aggregate.order = None
         self._order_spec = order_spec
+        self.__page = None
 
     order = property(_get_order, _set_order)
 
@@ -466,9 +525,19 @@ class Collection(Resource):
 
     def _set_slice(self, slice_key):
         self.__aggregate.slice = slice_key
+        self.__page = None
 
     slice = property(_get_slice, _set_slice)
 
+    def _get_keyset(self):
+        return self.__aggregate.keyset
+
+    def _set_keyset(self, keyset):
+        self.__aggregate.keyset = keyset
+        self.__page = None
+
+    keyset = property(_get_keyset, _set_keyset)
+
     def clone(self):
         """
         Returns a clone of this collection.
@@ -0,0 +1,153 @@
+"""
+Frozen map of registered resource classes.
+
+This file is part of the everest project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+from everest.representers.interfaces import IRepresenterRegistry
+from pyramid.compat import iteritems_
+from pyramid.threadlocal import get_current_registry
+from zope.interface.interface import InterfaceClass # pylint: disable=E0611,F0401
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['RESOURCE_CLASS_NAMES',
+           'ResourceClassMap',
+           'lookup_resource_class',
+           ]
+
+
+#: Names of the utilities under which the resource classes for a resource
+#: interface are registered.
+RESOURCE_CLASS_NAMES = frozenset(['member-class',
+                                  'collection-class',
+                                  'entity-class'])
+
+
+class ResourceClassMap(object):
+    """
+    Frozen, dictionary based map of the resource classes registered with a
+    component registry.
+
+    For each registered resource interface, the map holds the member,
+    collection and entity classes under the interface and under each of
+    these classes, so lookups for resource interfaces, classes and
+    instances can be done without going through the (much slower) zope
+    component lookup machinery. Classes that are registered for more than
+    one resource interface are left out of the map; for these (and for
+    everything else that is not in the map), the registry has to be
+    consulted as usual.
+
+    The map also holds the representer registry utility.
+
+    A map is only valid as long as no further components are registered;
+    :meth:`for_registry` checks this and rebuilds the map as needed.
+    """
+    #: Name of the registry attribute holding the map.
+    __registry_attribute = '_everest_resource_class_map'
+
+    def __init__(self, registry):
+        self.__generation = self.__get_generation(registry)
+        self.__classes = self.__build(registry)
+        self.__representer_registry = \
+                registry.queryUtility(IRepresenterRegistry)
+
+    @classmethod
+    def for_registry(cls, registry):
+        """
+        Returns the resource class map for the given registry, building a
+        new map if the registry has changed since the last call.
+
+        :returns: :class:`ResourceClassMap` instance or `None` if the
+          registry does not support change tracking.
+        """
+        generation = cls.__get_generation(registry)
+        if generation is None:
+            cls_map = None
+        else:
+            cls_map = getattr(registry, cls.__registry_attribute, None)
+            if cls_map is None or cls_map.generation != generation:
+                cls_map = cls(registry)
+                setattr(registry, cls.__registry_attribute, cls_map)
+        return cls_map
+
+    @property
+    def generation(self):
+        """
+        The registry generation this map was built for.
+        """
+        return self.__generation
+
+    @property
+    def representer_registry(self):
+        """
+        The representer registry utility or `None`, if none was registered.
+        """
+        return self.__representer_registry
+
+    def get(self, key, name):
+        """
+        Returns the resource class registered under the given name for the
+        given resource interface or class.
+
+        :param key: resource interface or class.
+        :param str name: one of the names in :const:`RESOURCE_CLASS_NAMES`.
+        :returns: resource class or `None`, if the map does not have an
+          entry for the given key and name.
+        """
+        return self.__classes.get((key, name))
+
+    @staticmethod
+    def __get_generation(registry):
+        # The zope adapter registries count their changes; the tuple of
+        # both counters identifies the state of the registry.
+        try:
+            return (registry.adapters._generation, # pylint: disable=W0212
+                    registry.utilities._generation) # pylint: disable=W0212
+        except AttributeError:
+            return None
+
+    @staticmethod
+    def __build(registry):
+        ifc_classes = {}
+        for util in registry.registeredUtilities():
+            if util.name in RESOURCE_CLASS_NAMES:
+                ifc_classes.setdefault(util.provided, {})[util.name] = \
+                                                            util.component
+        owners = {}
+        ambiguous = set()
+        for ifc, rc_classes in iteritems_(ifc_classes):
+            for key in [ifc] + list(rc_classes.values()):
+                if owners.setdefault(key, ifc) is not ifc:
+                    ambiguous.add(key)
+        classes = {}
+        for key, ifc in iteritems_(owners):
+            if not key in ambiguous:
+                for name, rc_class in iteritems_(ifc_classes[ifc]):
+                    classes[(key, name)] = rc_class
+        return classes
+
+
+def lookup_resource_class(resource, name):
+    """
+    Looks up the resource class registered under the given name for the
+    given resource in the resource class map of the current registry.
+
+    :param resource: registered resource
+    :type resource: resource interface or class implementing or instance
+        providing a registered resource interface.
+    :param str name: one of the names in :const:`RESOURCE_CLASS_NAMES`.
+    :returns: resource class or `None`, if the class can not be looked up
+      in the map.
+    """
+    cls_map = ResourceClassMap.for_registry(get_current_registry())
+    if cls_map is None:
+        rc_class = None
+    else:
+        if isinstance(resource, (type, InterfaceClass)):
+            key = resource
+        else:
+            key = type(resource)
+        rc_class = cls_map.get(key, name)
+    return rc_class
@@ -23,6 +23,8 @@ class Link(object):
     :note: The URL for the linked resource is created lazily; at
       instantiation time, we may not have a request to generate the URL.
     """
+    __slots__ = ('__linked_resource', 'rel', 'type', 'title', 'length')
+
     def __init__(self, linked_resource, rel,
                  type=None, title=None, length=None): # pylint: disable=W0622
         self.__linked_resource = linked_resource
@@ -10,6 +10,7 @@ from everest.repositories.utils import as_repository
 from everest.resources.base import Resource
 from everest.resources.interfaces import IService
 from pyramid.compat import iterkeys_
+from threading import Lock
 from zope.interface import implementer # pylint: disable=E0611,F0401
 
 __docformat__ = 'reStructuredText en'
@@ -36,6 +37,7 @@ class Service(Resource):
         # Maps collection names to resource interfaces.
         self.__collections = {}
         self.__started = False
+        self.__start_lock = Lock()
 
     def register(self, irc):
         """
@@ -51,12 +53,15 @@ class Service(Resource):
         Starts the service.
 
         This adds all registered resource interfaces to the service. Multiple
-        calls to this method will only perform the startup once.
+        calls to this method will only perform the startup once; concurrent
+        calls return when the startup has completed.
         """
         if not self.__started:
-            self.__started = True
-            for irc in self.__registered_interfaces:
-                self.add(irc)
+            with self.__start_lock:
+                if not self.__started:
+                    for irc in self.__registered_interfaces:
+                        self.add(irc)
+                    self.__started = True
 
     def __getitem__(self, key):
         """
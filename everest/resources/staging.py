@@ -40,6 +40,14 @@ class StagingAggregate(Aggregate):
         self.__visitor = AruVisitor(entity_class, self.__add,
                                     self.__remove, self.__update)
 
+    def clone(self):
+        clone = Aggregate.clone(self)
+        clone.entity_class = self.entity_class
+        clone.__cache_map = self.__cache_map
+        clone.__visitor = AruVisitor(self.entity_class, clone.__add,
+                                     clone.__remove, clone.__update)
+        return clone
+
     def get_by_id(self, id_key):
         return self.__cache_map.get_by_id(self.entity_class, id_key)
 
@@ -52,7 +60,15 @@ class StagingAggregate(Aggregate):
                                                 None,
                                                 RELATION_OPERATIONS.ADD,
                                                 accessor=self)
-        trv.run(self.__visitor)
+        # Flat data of new entities (e.g., from a representation of a
+        # collection without nested data) are added without running the
+        # traversal.
+        entities = trv.get_flat_add_entities()
+        if entities is None:
+            trv.run(self.__visitor)
+        else:
+            for ent in entities:
+                self.__cache_map.add(self.entity_class, ent)
 
     def remove(self, entity):
         trv = SourceTargetDataTreeTraverser.make_traverser(
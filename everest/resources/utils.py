@@ -14,6 +14,7 @@ from pyramid.traversal import model_path
 
 from everest.interfaces import IResourceUrlConverter
 from everest.repositories.utils import as_repository
+from everest.resources.classmap import lookup_resource_class
 from everest.resources.interfaces import ICollectionResource
 from everest.resources.interfaces import IMemberResource
 from everest.resources.interfaces import IRelation
@@ -62,12 +63,14 @@ def get_member_class(resource):
     :type resource: class implementing or instance providing or subclass of
         a registered resource interface.
     """
-    reg = get_current_registry()
-    if IInterface in provided_by(resource):
-        member_class = reg.getUtility(resource, name='member-class')
-    else:
-        member_class = reg.getAdapter(resource, IMemberResource,
-                                      name='member-class')
+    member_class = lookup_resource_class(resource, 'member-class')
+    if member_class is None:
+        reg = get_current_registry()
+        if IInterface in provided_by(resource):
+            member_class = reg.getUtility(resource, name='member-class')
+        else:
+            member_class = reg.getAdapter(resource, IMemberResource,
+                                          name='member-class')
     return member_class
 
 
@@ -80,12 +83,14 @@ def get_collection_class(resource):
     :type rc: class implementing or instance providing or subclass of
         a registered resource interface.
     """
-    reg = get_current_registry()
-    if IInterface in provided_by(resource):
-        coll_class = reg.getUtility(resource, name='collection-class')
-    else:
-        coll_class = reg.getAdapter(resource, ICollectionResource,
-                                    name='collection-class')
+    coll_class = lookup_resource_class(resource, 'collection-class')
+    if coll_class is None:
+        reg = get_current_registry()
+        if IInterface in provided_by(resource):
+            coll_class = reg.getUtility(resource, name='collection-class')
+        else:
+            coll_class = reg.getAdapter(resource, ICollectionResource,
+                                        name='collection-class')
     return coll_class
 
 
@@ -115,8 +120,12 @@ def as_member(entity, parent=None):
     :returns: an object implementing
         :class:`everest.resources.interfaces.IMemberResource`
     """
-    reg = get_current_registry()
-    rc = reg.getAdapter(entity, IMemberResource)
+    member_class = lookup_resource_class(entity, 'member-class')
+    if not member_class is None:
+        rc = member_class.create_from_entity(entity)
+    else:
+        reg = get_current_registry()
+        rc = reg.getAdapter(entity, IMemberResource)
     if not parent is None:
         rc.__parent__ = parent # interface method pylint: disable=E1121
     return rc
@@ -22,8 +22,10 @@ class RootFactory(object):
 
     def __call__(self, request):
         if self.__root is None:
-            # Start the service.
-            self.__root = get_service()
-            self.__root.start()
+            # Start the service. Other threads must not get to see the
+            # service before it is started.
+            root = get_service()
+            root.start()
+            self.__root = root
         return self.__root
 
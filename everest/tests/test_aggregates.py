@@ -7,13 +7,21 @@ Created on May 31, 2012.
 from everest.constants import DEFAULT_CASCADE
 from everest.constants import RELATION_OPERATIONS
 from everest.entities.attributes import get_domain_class_attribute
+from everest.entities.base import RootAggregate
 from everest.entities.utils import get_root_aggregate
+from everest.exceptions import NoResultsException
+from everest.querying.ordering import Keyset
 from everest.querying.specifications import AscendingOrderSpecification
 from everest.querying.specifications import asc
+from everest.querying.specifications import cntd
+from everest.querying.specifications import desc
 from everest.querying.specifications import eq
 from everest.querying.specifications import gt
+from everest.querying.specifications import in_set
+from everest.querying.specifications import starts
 from everest.repositories.memory.aggregate import MemoryAggregate
 from everest.repositories.rdb.aggregate import RdbAggregate
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
 from everest.repositories.rdb.testing import RdbTestCaseMixin
 from everest.testing import EntityTestCase
 from everest.tests.complete_app.entities import MyEntity
@@ -25,6 +33,11 @@ from everest.tests.complete_app.interfaces import IMyEntityParent
 from everest.tests.complete_app.testing import create_entity
 from everest.utils import classproperty
 from mock import patch
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.engine import Compiled
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm import lazyload
+from sqlalchemy.orm import subqueryload
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['MemoryRootAggregateTestCase',
@@ -98,6 +111,21 @@ class RootAggregateTestCaseBase(EntityTestCase):
         exp_msg = 'Invalid data type for traversal'
         self.assert_true(cm.exception.args[0].startswith(exp_msg))
 
+    def test_get_by_ids(self):
+        agg = self._aggregate
+        for idx in range(3):
+            agg.add(create_entity(entity_id=idx))
+        agg.sync_with_repository()
+        self.assert_equal([ent.id for ent in agg.get_by_ids([2, -1, 0])],
+                          [2, 0])
+        agg.filter = eq(id=0)
+        self.assert_equal([ent.id for ent in agg.get_by_ids([2, 0])], [0])
+        agg.filter = in_set(id=[0, 2])
+        self.assert_equal([ent.id for ent in agg.get_by_ids([2, 1, 0])],
+                          [2, 0])
+        agg.filter = ~in_set(id=[0, 2])
+        self.assert_equal([ent.id for ent in agg.iterator()], [1])
+
     def test_nested_attribute(self):
         agg = self._aggregate
         ent0 = create_entity(entity_id=0)
@@ -123,6 +151,38 @@ class RootAggregateTestCaseBase(EntityTestCase):
         agg.slice = slice(1, 2)
         self.assert_true(next(agg.iterator()) is ent0)
 
+    def test_keyset(self):
+        agg = self._aggregate
+        texts = ['b', 'a', 'b', 'a']
+        for idx, text in enumerate(texts):
+            agg.add(create_entity(entity_id=idx, entity_text=text))
+        agg.order = desc('text')
+        agg.slice = slice(0, 2)
+        # First page.
+        agg.keyset = Keyset()
+        self.assert_equal([ent.id for ent in agg.iterator()], [0, 2])
+        # Next page, seeking from the last entity of the first page.
+        agg.keyset = Keyset(['b', 2], is_forward=True)
+        self.assert_equal([ent.id for ent in agg.iterator()], [1, 3])
+        # Previous page, seeking backwards from the first entity of the
+        # second page.
+        agg.keyset = Keyset(['a', 1], is_forward=False)
+        self.assert_equal([ent.id for ent in agg.iterator()], [0, 2])
+        # Last page.
+        agg.keyset = Keyset(is_forward=False)
+        self.assert_equal([ent.id for ent in agg.iterator()], [1, 3])
+        # Seeking works with uniform sort directions as well.
+        agg.order = asc('text')
+        agg.keyset = Keyset(['a', 1], is_forward=True)
+        self.assert_equal([ent.id for ent in agg.iterator()], [3, 0])
+        agg.order = asc('id')
+        agg.keyset = Keyset([1], is_forward=True)
+        self.assert_equal([ent.id for ent in agg.iterator()], [2, 3])
+        self.assert_equal(Keyset.get_values(agg.order, agg.get_by_id(2)),
+                          [2])
+        # Count ignores keyset.
+        self.assert_equal(agg.count(), 4)
+
     def test_add_remove(self):
         agg = self._aggregate
         ent = self._entity
@@ -136,10 +196,183 @@ class MemoryRootAggregateTestCase(RootAggregateTestCaseBase):
     config_file_name = 'configure_no_rdb.zcml'
     agg_class = MemoryAggregate
 
+    def test_update_sequence_batched_lookups(self):
+        agg = self._aggregate
+        for idx in range(2):
+            agg.add(create_entity(entity_id=idx))
+        agg.sync_with_repository()
+        # Swap the parents of the two entities.
+        upd_ents = []
+        for idx in range(2):
+            upd_ent = MyEntity(id=idx)
+            upd_ent.parent = MyEntityParent(id=1 - idx)
+            upd_ents.append(upd_ent)
+        with patch.object(RootAggregate, 'get_by_id', autospec=True,
+                          side_effect=RootAggregate.get_by_id) as get_mock:
+            agg.update(upd_ents)
+            self.assert_equal(get_mock.call_count, 0)
+        agg.sync_with_repository()
+        self.assert_equal([agg.get_by_id(idx).parent.id for idx in range(2)],
+                          [1, 0])
+
 
 class RdbRootAggregateTestCase(RdbTestCaseMixin, RootAggregateTestCaseBase):
     agg_class = RdbAggregate
 
+    def test_load_attributes(self):
+        agg = self._aggregate
+        for idx in range(2):
+            agg.add(create_entity(entity_id=idx))
+        agg.sync_with_repository()
+        Session.expunge_all()
+        # Names that do not refer to a relationship are ignored.
+        agg.load_attributes = ['parent', 'children.children', 'text']
+        ents = list(agg.iterator())
+        self.assert_equal(len(ents), 2)
+        for ent in ents:
+            unloaded = sa_inspect(ent).unloaded
+            self.assert_false('parent' in unloaded)
+            self.assert_false('children' in unloaded)
+            self.assert_false(
+                    'children' in sa_inspect(ent.children[0]).unloaded)
+        self.assert_true(agg.clone().load_attributes is agg.load_attributes)
+
+    def test_stream(self):
+        agg = self._aggregate
+        for idx in range(5):
+            agg.add(create_entity(entity_id=idx))
+        agg.sync_with_repository()
+        agg.stream_batch_size = 2
+        agg.order = asc('id')
+        # Unsliced queries are streamed.
+        query = agg._get_ordered_query(None) # pylint: disable=W0212
+        self.assert_equal(query._yield_per, 2) # pylint: disable=W0212
+        self.assert_equal([ent.id for ent in agg.iterator()], range(5))
+        self.assert_equal(query.count(), 5)
+        self.assert_equal(agg.count(), 5)
+        # Large slices are streamed, small ones are not.
+        agg.slice = slice(1, 4)
+        self.assert_equal([ent.id for ent in agg.iterator()], [1, 2, 3])
+        query = agg._get_ordered_query(None) # pylint: disable=W0212
+        self.assert_equal(query._yield_per, 2) # pylint: disable=W0212
+        agg.slice = slice(1, 3)
+        query = agg._get_ordered_query(None) # pylint: disable=W0212
+        self.assert_is_none(query._yield_per) # pylint: disable=W0212
+        # No streaming with eager loading of collections.
+        agg.slice = None
+        agg.load_attributes = ['parent']
+        query = agg._get_ordered_query(None) # pylint: disable=W0212
+        self.assert_equal(query._yield_per, 2) # pylint: disable=W0212
+        agg.load_attributes = ['children']
+        query = agg._get_ordered_query(None) # pylint: disable=W0212
+        self.assert_is_none(query._yield_per) # pylint: disable=W0212
+        self.assert_equal(len(list(agg.iterator())), 5)
+        # No streaming with eager loading options added to the query or
+        # configured on the mapper.
+        agg.load_attributes = None
+        query = agg.query().options(subqueryload(MyEntity.children))
+        self.assert_is_none(query.stream(2)._yield_per) # pylint: disable=W0212
+        query = agg.query().options(lazyload(MyEntity.children))
+        self.assert_equal(query.stream(2)._yield_per, 2) # pylint: disable=W0212
+        children_prop = class_mapper(MyEntity).relationships['children']
+        with patch.object(children_prop, 'lazy', 'subquery'):
+            query = agg._get_ordered_query(None) # pylint: disable=W0212
+            self.assert_is_none(query._yield_per) # pylint: disable=W0212
+        parent_prop = class_mapper(MyEntity).relationships['parent']
+        with patch.object(parent_prop, 'lazy', 'joined'):
+            query = agg._get_ordered_query(None) # pylint: disable=W0212
+            self.assert_equal(query._yield_per, 2) # pylint: disable=W0212
+
+    def test_get_by_ids_batches(self):
+        agg = self._aggregate
+        for idx in range(3):
+            agg.add(create_entity(entity_id=idx))
+        agg.sync_with_repository()
+        Session.expunge_all()
+        ent1 = agg.get_by_id(1)
+        sess = agg._session # pylint: disable=W0212
+        # Entities in the identity map are reused; the others are loaded
+        # in chunks.
+        sess.MAX_IN_CLAUSE_SIZE = 1
+        ents = agg.get_by_ids([2, 1, 0, 2])
+        self.assert_equal([ent.id for ent in ents], [2, 1, 0, 2])
+        self.assert_true(ents[1] is ent1)
+
+    def test_get_by_slug_lookup(self):
+        agg = self._aggregate
+        for idx in range(2):
+            agg.add(create_entity(entity_id=idx))
+        agg.sync_with_repository()
+        sess = agg._session # pylint: disable=W0212
+        sess.expunge_all()
+        dialect = sess.connection().dialect
+        with patch.object(dialect, 'do_execute',
+                          wraps=dialect.do_execute) as exec_mock:
+            ent = sess.get_by_slug(MyEntity, '1')
+            self.assert_equal(ent.id, 1)
+            # The entity is loaded with a single statement.
+            self.assert_equal(exec_mock.call_count, 1)
+            self.assert_raises(NoResultsException,
+                               sess.get_by_slug, MyEntity, '2')
+            # Loaded entities come from the identity map; the compiled
+            # statement is reused.
+            with patch.object(Compiled, '__init__') as compile_mock:
+                self.assert_true(sess.get_by_slug(MyEntity, '1') is ent)
+                self.assert_false(compile_mock.called)
+            self.assert_equal(len(set([call[0][1] for call
+                                       in exec_mock.call_args_list])), 1)
+        # A miss costs a single statement.
+        with patch.object(dialect, 'do_execute',
+                          wraps=dialect.do_execute) as exec_mock:
+            self.assert_is_none(agg.get_by_slug('2'))
+            self.assert_equal(exec_mock.call_count, 1)
+        # Removed entities are not found.
+        agg.remove(ent)
+        agg.sync_with_repository()
+        self.assert_raises(NoResultsException,
+                           sess.get_by_slug, MyEntity, '1')
+        self.assert_is_none(agg.get_by_slug('1'))
+
+    def test_expression_cache(self):
+        agg = self._aggregate
+        for idx in range(3):
+            agg.add(create_entity(entity_id=idx, entity_text=str(idx)))
+        agg.sync_with_repository()
+        cache = agg._session_factory.expression_cache # pylint: disable=W0212
+        cache.clear()
+        agg.filter = eq(id=0) & starts(text='0')
+        self.assert_equal([ent.id for ent in agg.iterator()], [0])
+        self.assert_equal(len(cache), 1)
+        # Same shape, different values - reuses the cached expression.
+        agg.filter = eq(id=1) & starts(text='1')
+        self.assert_equal([ent.id for ent in agg.iterator()], [1])
+        self.assert_equal(agg.count(), 1)
+        self.assert_equal(len(cache), 1)
+        # The SQL statements of the query and of its count query are not
+        # compiled again for the same shape.
+        agg.filter = eq(id=2) & starts(text='2')
+        with patch.object(Compiled, '__init__') as compile_mock:
+            self.assert_equal([ent.id for ent in agg.iterator()], [2])
+            self.assert_false(compile_mock.called)
+        # The number of values in a CONTAINED criterion is part of the shape.
+        agg.filter = cntd(id=[0, 2])
+        agg.order = asc('id')
+        self.assert_equal([ent.id for ent in agg.iterator()], [0, 2])
+        agg.filter = cntd(id=[1, 2])
+        self.assert_equal([ent.id for ent in agg.iterator()], [1, 2])
+        self.assert_equal(len(cache), 3)
+        # The same holds for IN_SET criteria.
+        agg.filter = in_set(id=[0, 2])
+        self.assert_equal([ent.id for ent in agg.iterator()], [0, 2])
+        agg.filter = in_set(id=[1, 2])
+        self.assert_equal([ent.id for ent in agg.iterator()], [1, 2])
+        self.assert_equal(len(cache), 4)
+        # Values that can not be bound as parameters are not cached.
+        agg.filter = None
+        agg.filter = eq(parent=agg.get_by_id(0).parent)
+        self.assert_equal([ent.id for ent in agg.iterator()], [0])
+        self.assert_equal(len(cache), 4)
+
 
 class _RelationshipAggregateTestCase(EntityTestCase):
     package_name = 'everest.tests.complete_app'
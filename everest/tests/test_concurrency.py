@@ -0,0 +1,294 @@
+"""
+Thread scaling benchmarks and stress tests for sessions and repositories.
+
+The stress tests run with the test suite. To run the thread scaling
+benchmark, execute this module::
+
+    python -m everest.tests.test_concurrency
+
+This file is part of the everest project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+from csv import DictReader
+from everest.constants import RequestMethods
+from everest.mime import CsvMime
+from everest.repositories.constants import REPOSITORY_TYPES
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
+from everest.repositories.rdb.testing import RdbTestCaseMixin
+from everest.repositories.rdb.utils import get_metadata
+from everest.repositories.utils import get_engine
+from everest.repositories.utils import is_engine_initialized
+from everest.resources.utils import get_root_collection
+from everest.testing import EverestTestApp
+from everest.testing import FunctionalTestCase
+from everest.tests.complete_app.entities import MyEntityParent
+from everest.tests.complete_app.interfaces import IMyEntityParent
+from everest.tests.complete_app.rdb import create_metadata
+from everest.utils import classproperty
+from everest.utils import get_repository_manager
+from pkg_resources import resource_filename # pylint: disable=E0611
+from pyramid.compat import bytes_
+from pyramid.compat import native_
+from threading import Thread
+from timeit import default_timer
+import logging
+import nose
+import os
+import tempfile
+import transaction
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['MemoryConcurrencyTestCase',
+           'RdbConcurrencyTestCase',
+           'WorkloadResult',
+           'run_workload',
+           ]
+
+
+class WorkloadResult(object):
+    """
+    Throughput, latencies and consistency errors recorded for a run of
+    :func:`run_workload`.
+    """
+    #: Request kinds issued by the workload.
+    KINDS = ('GET', 'PATCH', 'POST')
+
+    def __init__(self, num_threads, elapsed, latencies, errors):
+        #: Number of worker threads.
+        self.num_threads = num_threads
+        #: Wall clock time for the run (in seconds).
+        self.elapsed = elapsed
+        #: Maps request kinds to lists of request latencies (in seconds).
+        self.latencies = latencies
+        #: List of error messages reported by the workers.
+        self.errors = errors
+
+    @property
+    def num_requests(self):
+        return sum([len(lats) for lats in self.latencies.values()])
+
+    @property
+    def throughput(self):
+        """
+        Number of requests per second.
+        """
+        return self.num_requests / self.elapsed
+
+    def get_percentile(self, kind, percentile):
+        """
+        Returns the given latency percentile (in seconds) for the given
+        request kind.
+        """
+        lats = sorted(self.latencies[kind])
+        idx = min(len(lats) - 1, int(round(percentile / 100. * len(lats))))
+        return lats[idx]
+
+    def __str__(self):
+        lines = ['%d threads: %d requests, %.1f requests/s'
+                 % (self.num_threads, self.num_requests, self.throughput)]
+        for kind in self.KINDS:
+            lines.append('  %-5s p50 %.2f ms, p90 %.2f ms, p99 %.2f ms'
+                         % ((kind,) + tuple([1000 *
+                                             self.get_percentile(kind, pct)
+                                             for pct in (50, 90, 99)])))
+        return os.linesep.join(lines)
+
+
+def run_workload(wsgiapp, path, num_threads, num_requests, first_id):
+    """
+    Drives the given number of threads issuing a mix of GET, PATCH and POST
+    requests against the given collection path of the given WSGI
+    application.
+
+    Worker thread `idx` owns the member with ID `idx` which it PATCHes with
+    matching "text" and "text_rc" values; it also POSTs new members, using
+    IDs starting from `first_id`. Every GET of the collection checks that
+    the "text" and "text_rc" values of all members match.
+
+    Each request is followed by a commit (or an abort, if the request
+    failed), like it would be done by a transaction manager.
+
+    :returns: :class:`WorkloadResult` instance.
+    """
+    latencies = dict([(kind, []) for kind in WorkloadResult.KINDS])
+    errors = []
+
+    def work(idx):
+        app = EverestTestApp(wsgiapp)
+        counter = 0
+        for req_idx in range(num_requests):
+            kind = WorkloadResult.KINDS[req_idx % 3]
+            start = default_timer()
+            try:
+                if kind == 'GET':
+                    res = app.get(path, params=dict(size=10000), status=200)
+                    for row in DictReader(native_(res.body).splitlines()):
+                        if row['text'] != row['text_rc']:
+                            errors.append('Torn read of member %s: %s != %s'
+                                          % (row['id'], row['text'],
+                                             row['text_rc']))
+                elif kind == 'PATCH':
+                    counter += 1
+                    app.patch('%s%d/' % (path, idx),
+                              params=bytes_('"text","text_rc"\n"%d","%d"\n'
+                                            % (counter, counter)),
+                              content_type=CsvMime.mime_type_string,
+                              status=200)
+                else:
+                    new_id = first_id + idx * num_requests + req_idx
+                    app.post(path,
+                             params=bytes_('"id","text","text_rc"\n'
+                                           '%d,"0","0"\n' % new_id),
+                             content_type=CsvMime.mime_type_string,
+                             status=201)
+                transaction.commit()
+            except Exception as exc: # pylint: disable=W0703
+                transaction.abort()
+                errors.append('%s request failed: %s' % (kind, exc))
+            latencies[kind].append(default_timer() - start)
+
+    threads = [Thread(target=work, args=(idx,))
+               for idx in range(num_threads)]
+    start = default_timer()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return WorkloadResult(num_threads, default_timer() - start,
+                          latencies, errors)
+
+
+class _ConcurrencyTestCaseBase(FunctionalTestCase):
+    package_name = 'everest.tests.complete_app'
+    # The benchmark may be run from a relative path (see the module
+    # docstring).
+    ini_file_path = os.path.abspath(
+                        resource_filename('everest.tests.complete_app',
+                                          'complete_app.ini'))
+    app_name = 'complete_app'
+    path = '/my-entity-parents/'
+    config_file_name = None
+    num_requests = 30
+
+    @classproperty
+    def __test__(cls):
+        return not cls is _ConcurrencyTestCaseBase
+
+    def set_up(self):
+        FunctionalTestCase.set_up(self)
+        self._load_configuration()
+        self.config.add_resource_view(IMyEntityParent,
+                                      renderer='csv',
+                                      request_method=RequestMethods.GET)
+        self.config.add_member_view(IMyEntityParent,
+                                    renderer='csv',
+                                    request_method=RequestMethods.PATCH)
+        self.config.add_collection_view(IMyEntityParent,
+                                        renderer='csv',
+                                        request_method=RequestMethods.POST)
+
+    def test_mixed_workload(self):
+        num_threads = 4
+        self.__create_members(num_threads)
+        result = self.__run(num_threads, num_threads)
+        self.assert_equal(result.errors, [])
+        # Check for lost updates: Each member has the values of the last
+        # PATCH of its worker and all POSTed members are there.
+        num_patches = len(result.latencies['PATCH']) // num_threads
+        res = self.app.get(self.path, params=dict(size=10000), status=200)
+        rows = list(DictReader(native_(res.body).splitlines()))
+        texts = dict([(int(row['id']), row['text']) for row in rows])
+        self.assert_equal(len(texts),
+                          num_threads + len(result.latencies['POST']))
+        for idx in range(num_threads):
+            self.assert_equal(texts[idx], str(num_patches))
+
+    def run_thread_scaling(self):
+        # Micro benchmark (not collected as a test, see the module
+        # docstring): Runs the workload with 1 and 4 threads and logs the
+        # throughput and latencies for both runs.
+        self.__create_members(4)
+        first_id = 4
+        for num_threads in (1, 4):
+            result = self.__run(num_threads, first_id)
+            self.assert_equal(result.errors, [])
+            self.assert_equal(result.num_requests,
+                              num_threads * self.num_requests)
+            first_id += num_threads * self.num_requests
+
+    def _load_configuration(self):
+        self.config.load_zcml(self.config_file_name)
+        # Initialize the repositories created by the configuration.
+        get_repository_manager().initialize_all()
+
+    def __create_members(self, num_members):
+        coll = get_root_collection(IMyEntityParent)
+        for idx in range(num_members):
+            coll.create_member(MyEntityParent(id=idx, text='0',
+                                              text_ent='0'))
+        transaction.commit()
+
+    def __run(self, num_threads, first_id):
+        result = run_workload(self.app.app, self.path, num_threads,
+                              self.num_requests, first_id)
+        logging.getLogger(__name__).info('%s%s%s', type(self).__name__,
+                                         os.linesep, result)
+        return result
+
+
+class MemoryConcurrencyTestCase(_ConcurrencyTestCaseBase):
+    config_file_name = 'everest.tests.complete_app:configure_rpr.zcml'
+
+
+class RdbConcurrencyTestCase(RdbTestCaseMixin, _ConcurrencyTestCaseBase):
+    config_file_name = 'everest.tests.complete_app:configure_rpr.zcml'
+    #: Name of the RDB repository used by this test case.
+    repository_name = 'CONCURRENCY'
+    __db_path = None
+
+    @classmethod
+    def setup_class(cls):
+        # The worker threads each get their own connection, so we can not
+        # use an in-memory database. Engines are global, so we create the
+        # database once for all tests.
+        db_fd, cls.__db_path = tempfile.mkstemp(suffix='.db')
+        os.close(db_fd)
+
+    @classmethod
+    def teardown_class(cls):
+        try:
+            super(RdbConcurrencyTestCase, cls).teardown_class()
+            # The scoped session is shared by all RDB repositories; bind it
+            # back to the engine of the default RDB repository.
+            if is_engine_initialized(REPOSITORY_TYPES.RDB):
+                Session.configure(bind=get_engine(REPOSITORY_TYPES.RDB))
+        finally:
+            os.unlink(cls.__db_path)
+
+    def tear_down(self):
+        get_metadata(self.repository_name).drop_all()
+        super(RdbConcurrencyTestCase, self).tear_down()
+
+    def _load_configuration(self):
+        self.config.registry.settings['db_string'] = \
+                                            'sqlite:///%s' % self.__db_path
+        self.config.add_rdb_repository(
+                        name=self.repository_name, make_default=True,
+                        configuration=dict(metadata_factory=create_metadata))
+        # Like the root RDB repository, our repository should commit with
+        # the transaction.
+        get_repository_manager().get(self.repository_name).join_transaction \
+                                                                    = True
+        _ConcurrencyTestCaseBase._load_configuration(self)
+        get_metadata(self.repository_name).create_all()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    nose.run(argv=[__file__, '--nologcapture']
+                  + ['everest.tests.test_concurrency:%s.run_thread_scaling'
+                     % cls_name
+                     for cls_name in ('MemoryConcurrencyTestCase',
+                                      'RdbConcurrencyTestCase')])
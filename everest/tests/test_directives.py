@@ -99,6 +99,8 @@ class DirectivesTestCase(Pep8CompliantTestCase):
         self.assert_is_not_none(repo_mgr.get('CUSTOM_MEMORY'))
         self.assert_is_not_none(repo_mgr.get('CUSTOM_FILESYSTEM'))
         self.assert_is_not_none(repo_mgr.get('CUSTOM_RDB'))
+        self.assert_true(
+                repo_mgr.get('CUSTOM_RDB').configuration['pool_pre_ping'])
 
     def __check(self, reg, member, ent, coll):
         for idx, obj in enumerate((member, coll, ent)):
@@ -9,16 +9,30 @@ from everest.entities.attributes import get_domain_class_attribute
 from everest.entities.base import Entity
 from everest.entities.traversal import AruVisitor
 from everest.entities.traversal import DomainDataTraversalProxy
+from everest.interfaces import IDataTraversalProxyAdapter
+from everest.interfaces import IDataTraversalProxyFactory
 from everest.repositories.memory.cache import EntityCacheMap
 from everest.resources.staging import StagingAggregate
 from everest.resources.staging import create_staging_collection
 from everest.testing import EntityTestCase
 from everest.tests.complete_app.entities import MyEntity
 from everest.tests.complete_app.entities import MyEntityChild
+from everest.tests.complete_app.entities import MyEntityGrandchild
+from everest.tests.complete_app.entities import MyEntityParent
 from everest.tests.complete_app.interfaces import IMyEntity
 from everest.tests.complete_app.testing import create_entity
+from everest.traversal import CountingTraversalHook
+from everest.traversal import LoggingTraversalHook
 from everest.traversal import SourceTargetDataTreeTraverser
+from everest.traversal import run_traversal
+from everest.traversalpath import TraversalPath
 from mock import MagicMock
+from mock import patch
+from pyramid.threadlocal import get_current_registry
+from sys import getrecursionlimit
+from threading import Thread
+from zope.interface import Interface # pylint: disable=E0611,F0401
+from zope.interface import alsoProvides # pylint: disable=E0611,F0401
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['SourceTargetDataTraverserTestCase',
@@ -54,6 +68,213 @@ class SourceTargetDataTraverserTestCase(EntityTestCase):
             self.assert_true(isinstance(prx.get_entity(), Entity))
             self.assert_is_none(meth_call[1][3])
 
+    def test_traverse_engines(self):
+        calls = []
+        for iterative in (True, False):
+            mock_vst = MagicMock()
+            ent = create_entity(entity_id=None)
+            trv = SourceTargetDataTreeTraverser.make_traverser(
+                                                    ent, None,
+                                                    RELATION_OPERATIONS.ADD,
+                                                    iterative=iterative)
+            trv.run(mock_vst)
+            calls.append([(meth_call[0], meth_call[1][1])
+                          for meth_call in mock_vst.method_calls
+                          if meth_call[0] == 'visit'])
+        self.assert_equal(len(calls[0]), 4)
+        self.assert_equal(calls[0], calls[1])
+
+    def test_run_traversal(self):
+        visited = []
+        def traverse(depth):
+            if depth > 0:
+                yield traverse(depth - 1)
+            visited.append(depth)
+        # Traversal depth is not limited by the recursion limit.
+        depth = 2 * getrecursionlimit()
+        run_traversal(traverse(depth))
+        self.assert_equal(visited, list(range(depth + 1)))
+        self.assert_raises(RuntimeError,
+                           run_traversal, traverse(depth), iterative=False)
+
+    def test_traversal_path_cycle_check_scaling(self):
+        # Updates wide payloads of about 1k and 10k nodes with back
+        # references (cycles) to their parents. The cycle checks on the
+        # traversal path use the cached node keys of the proxies, so they
+        # never look up IDs or entity types; the number of lookups per
+        # node does not grow with the size of the payload.
+        lookups_per_node = []
+        for width in (31, 100):
+            num_nodes = 2 + width + width ** 2
+            counts = self.__count_update_lookups(width)
+            self.assert_equal(counts['update'], num_nodes)
+            self.assert_true(counts['checks'] < 2 * num_nodes)
+            self.assert_equal(counts['check_lookups'], 0)
+            lookups_per_node.append(float(counts['lookups']) / num_nodes)
+        self.assert_true(lookups_per_node[1] <= 1.05 * lookups_per_node[0])
+
+    def test_proxy_caching(self):
+        reg = get_current_registry()
+        prx_fac = reg.getUtility(IDataTraversalProxyFactory)
+        prx = prx_fac.make_source_proxy(create_entity(entity_id=0))
+        self.assert_false(hasattr(prx, '__dict__'))
+        all_attrs = list(prx.get_relationship_attributes())
+        # Relationship attributes and adapters are looked up once per
+        # entity class.
+        with patch.object(DomainDataTraversalProxy,
+                          '_attribute_iterator') as iter_mock:
+            with patch.object(reg.adapters, 'lookup') as lookup_mock:
+                prx = prx_fac.make_source_proxy(create_entity(entity_id=1))
+                self.assert_false(lookup_mock.called)
+            self.assert_equal(list(prx.get_relationship_attributes()),
+                              all_attrs)
+            # Cascade settings are applied when the attributes are
+            # requested for a relation operation.
+            rem_attrs = \
+                list(prx.get_relationship_attributes(
+                                            RELATION_OPERATIONS.REMOVE))
+            self.assert_equal(rem_attrs,
+                              [attr for attr in all_attrs
+                               if attr.cascade & RELATION_OPERATIONS.REMOVE])
+            self.assert_false(iter_mock.called)
+
+    def test_adapter_lookup_per_provided_interfaces(self):
+        reg = get_current_registry()
+        prx_fac = reg.getUtility(IDataTraversalProxyFactory)
+        adp_mock = MagicMock()
+        reg.registerAdapter(lambda data: adp_mock, (IMarker,),
+                            IDataTraversalProxyAdapter)
+        data = _PlainData()
+        self.assert_raises(ValueError, prx_fac.make_source_proxy, data)
+        # Data of the same class directly providing an adapted interface
+        # are adapted.
+        marked_data = _PlainData()
+        alsoProvides(marked_data, IMarker)
+        prx = prx_fac.make_source_proxy(marked_data)
+        self.assert_true(prx is adp_mock.make_source_proxy.return_value)
+        self.assert_raises(ValueError, prx_fac.make_source_proxy, data)
+
+    def test_traversal_hooks_finish_on_error(self):
+        cnt_hook = CountingTraversalHook()
+        hook_mock = MagicMock()
+        SourceTargetDataTreeTraverser.add_hook(cnt_hook)
+        SourceTargetDataTreeTraverser.add_hook(hook_mock)
+        visitor = AruVisitor(MyEntity)
+        try:
+            trv = SourceTargetDataTreeTraverser.make_traverser(
+                                                create_entity(entity_id=None),
+                                                None,
+                                                RELATION_OPERATIONS.ADD)
+            with patch.object(visitor, 'visit',
+                              side_effect=RuntimeError('Visit failed.')):
+                self.assert_raises(RuntimeError, trv.run, visitor)
+        finally:
+            SourceTargetDataTreeTraverser.remove_hook(cnt_hook)
+            SourceTargetDataTreeTraverser.remove_hook(hook_mock)
+        self.assert_equal(hook_mock.finish_run.call_count, 1)
+        self.assert_equal(cnt_hook.run_count, 1)
+        self.assert_true(cnt_hook.total_time > 0)
+
+    def test_counting_traversal_hook_threads(self):
+        hook = CountingTraversalHook()
+        num_threads = 4
+        num_nodes = 1000
+        path = TraversalPath()
+
+        def traverse():
+            hook.start_run(None, None, None)
+            for _ in range(num_nodes):
+                hook.enter_node(path, None, None, object())
+            hook.finish_run(None, None, None)
+        thrs = [Thread(target=traverse) for _ in range(num_threads)]
+        # Runs in the main thread overlap the runs in the other threads.
+        hook.start_run(None, None, None)
+        for thr in thrs:
+            thr.start()
+        for thr in thrs:
+            thr.join()
+        hook.finish_run(None, None, None)
+        self.assert_equal(hook.run_count, num_threads + 1)
+        self.assert_equal(hook.node_count, num_threads * num_nodes)
+        self.assert_equal(hook.operation_counts[RELATION_OPERATIONS.REMOVE],
+                          num_threads * num_nodes)
+        self.assert_true(hook.total_time > 0)
+
+    def test_traversal_hooks(self):
+        cnt_hook = CountingTraversalHook()
+        log_mock = MagicMock()
+        log_mock.isEnabledFor.return_value = False
+        log_hook = LoggingTraversalHook(logger=log_mock)
+        SourceTargetDataTreeTraverser.add_hook(cnt_hook)
+        SourceTargetDataTreeTraverser.add_hook(cnt_hook)
+        SourceTargetDataTreeTraverser.add_hook(log_hook)
+        try:
+            trv = SourceTargetDataTreeTraverser.make_traverser(
+                                                create_entity(entity_id=None),
+                                                None,
+                                                RELATION_OPERATIONS.ADD)
+            trv.run(AruVisitor(MyEntity))
+        finally:
+            SourceTargetDataTreeTraverser.remove_hook(cnt_hook)
+            SourceTargetDataTreeTraverser.remove_hook(log_hook)
+        self.assert_equal(cnt_hook.run_count, 1)
+        self.assert_equal(cnt_hook.node_count, 4)
+        self.assert_equal(
+                cnt_hook.operation_counts[RELATION_OPERATIONS.ADD], 4)
+        self.assert_equal(cnt_hook.max_depth, 2)
+        self.assert_true(cnt_hook.total_time > 0)
+        # Nothing is logged unless the logger is enabled for debugging.
+        self.assert_false(log_mock.debug.called)
+        # Hooks are not called after they were removed.
+        trv = SourceTargetDataTreeTraverser.make_traverser(
+                                                create_entity(entity_id=None),
+                                                None,
+                                                RELATION_OPERATIONS.ADD)
+        trv.run(AruVisitor(MyEntity))
+        self.assert_equal(cnt_hook.run_count, 1)
+        # Debug logging.
+        log_mock.isEnabledFor.return_value = True
+        log_hook.enter_node(TraversalPath(), None,
+                            DomainDataTraversalProxy(MyEntity(id=0), None,
+                                                     None),
+                            None)
+        self.assert_equal(log_mock.debug.call_args[0][0],
+                          'ADD ROOT (MyEntity(id=0),None)')
+
+    def test_get_flat_add_entities(self):
+        def get_flat_add_entities(data):
+            trv = SourceTargetDataTreeTraverser.make_traverser(
+                                                data,
+                                                None,
+                                                RELATION_OPERATIONS.ADD)
+            return trv.get_flat_add_entities()
+        # Nested data need to be traversed.
+        ent = create_entity(entity_id=None)
+        self.assert_is_none(get_flat_add_entities(ent))
+        # Flat data are returned as is.
+        flat_ents = [MyEntity(id=idx) for idx in range(3)]
+        self.assert_equal(get_flat_add_entities(flat_ents), flat_ents)
+        # Flat data with an empty collection attribute.
+        flat_ent = MyEntityChild()
+        self.assert_equal(get_flat_add_entities(flat_ent), [flat_ent])
+        # Only available for ADD traversals.
+        trv = SourceTargetDataTreeTraverser.make_traverser(
+                                                None,
+                                                ent,
+                                                RELATION_OPERATIONS.REMOVE)
+        self.assert_raises(ValueError, trv.get_flat_add_entities)
+        # Adding flat data through a staging aggregate builds the source
+        # proxy only once.
+        agg = StagingAggregate(MyEntity)
+        prx_fac = get_current_registry().getUtility(
+                                                IDataTraversalProxyFactory)
+        with patch.object(prx_fac, 'make_source_proxy',
+                          wraps=prx_fac.make_source_proxy) as make_mock:
+            agg.add(flat_ents)
+        self.assert_equal(make_mock.call_count, 1)
+        self.assert_equal(sorted([ent.id for ent in agg.iterator()]),
+                          [0, 1, 2])
+
     def test_make_traverser_invalid_params(self):
         ent0 = create_entity(entity_id=None)
         ent1 = create_entity(entity_id=None)
@@ -107,3 +328,71 @@ class SourceTargetDataTraverserTestCase(EntityTestCase):
         vst = AruVisitor(MyEntity, remove_callback=cache.remove)
         trv.run(vst)
         self.assert_equal(len(list(iter(agg))), 0)
+
+    def __count_update_lookups(self, width):
+        # Runs an update traversal of a wide payload and counts the
+        # cycle checks on the traversal path and the ID and entity type
+        # lookups on the proxies inside and outside of these checks.
+        counts = dict(checks=0, lookups=0, check_lookups=0)
+        def count_lookups(func):
+            def wrapper(*args):
+                if counts['in_check']:
+                    counts['check_lookups'] += 1
+                else:
+                    counts['lookups'] += 1
+                return func(*args)
+            return wrapper
+        def count_checks(func):
+            def wrapper(*args):
+                counts['checks'] += 1
+                counts['in_check'] = True
+                try:
+                    return func(*args)
+                finally:
+                    counts['in_check'] = False
+            return wrapper
+        counts['in_check'] = False
+        agg = create_staging_collection(IMyEntity).get_aggregate()
+        agg.add(self.__make_wide_entity(width, 'old'))
+        hook = CountingTraversalHook()
+        SourceTargetDataTreeTraverser.add_hook(hook)
+        try:
+            trv = SourceTargetDataTreeTraverser.make_traverser(
+                                    self.__make_wide_entity(width, 'new'),
+                                    None,
+                                    RELATION_OPERATIONS.UPDATE,
+                                    accessor=agg)
+            with patch.object(DomainDataTraversalProxy, 'get_id',
+                              count_lookups(
+                                    DomainDataTraversalProxy.get_id)), \
+                 patch.object(DomainDataTraversalProxy, '_get_entity_type',
+                              count_lookups(
+                                DomainDataTraversalProxy._get_entity_type)), \
+                 patch.object(TraversalPath, '__contains__',
+                              count_checks(TraversalPath.__contains__)):
+                trv.run(AruVisitor(MyEntity))
+        finally:
+            SourceTargetDataTreeTraverser.remove_hook(hook)
+        counts['update'] = hook.operation_counts[RELATION_OPERATIONS.UPDATE]
+        return counts
+
+    def __make_wide_entity(self, width, text):
+        ent = MyEntity(id=0, text=text)
+        ent.parent = MyEntityParent(id=0)
+        for child_idx in range(width):
+            child = MyEntityChild(id=child_idx, parent=ent, text=text)
+            ent.children.append(child)
+            for grandchild_idx in range(width):
+                child.children.append(
+                        MyEntityGrandchild(id=child_idx * width
+                                              + grandchild_idx,
+                                           parent=child, text=text))
+        return ent
+
+
+class IMarker(Interface): # pylint: disable=W0232
+    pass
+
+
+class _PlainData(object):
+    pass
@@ -5,9 +5,13 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 Created on Jul 5, 2011.
 """
 from everest.repositories.rdb import SqlFilterSpecificationVisitor
+from everest.querying.operators import EQUAL_TO
 from everest.querying.specifications import ValueEqualToFilterSpecification
+from everest.querying.specifications import ValueInSetFilterSpecification
 from everest.testing import Pep8CompliantTestCase
 from everest.tests.simple_app.entities import FooEntity
+from sqlalchemy.sql.expression import column
+import sqlalchemy as sa
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['SqlFilterSpecificationVisitorTestCase',
@@ -25,3 +29,14 @@ class SqlFilterSpecificationVisitorTestCase(Pep8CompliantTestCase):
                                                                  factory_map)
         visitor.visit_nullary(spec)
         self.assert_true(visitor.expression is obj)
+
+    def test_custom_clause_in_set(self):
+        func = lambda value: column('foo') == value
+        factory_map = {('foo', EQUAL_TO.name):func}
+        visitor = SqlFilterSpecificationVisitor(FooEntity,
+                                                custom_clause_factories=
+                                                                 factory_map)
+        visitor.visit_nullary(ValueInSetFilterSpecification('foo', [1, 2]))
+        self.assert_equal(str(visitor.expression),
+                          str(sa.or_(column('foo') == 1,
+                                     column('foo') == 2)))
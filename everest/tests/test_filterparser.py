@@ -5,22 +5,32 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 Created on Feb 4, 2011.
 """
 from datetime import datetime
+from everest.querying.filterparser import CqlFilterParser
 from everest.querying.filterparser import parse_filter
+from everest.querying.filterparser import parse_filter_reference
 from everest.querying.operators import ENDS_WITH
 from everest.querying.operators import EQUAL_TO
 from everest.querying.operators import GREATER_THAN
+from everest.querying.operators import IN_SET
 from everest.querying.operators import STARTS_WITH
 from everest.querying.specifications import ConjunctionFilterSpecification
 from everest.querying.specifications import DisjunctionFilterSpecification
+from everest.querying.specifications import NegationFilterSpecification
 from everest.querying.specifications import ValueEqualToFilterSpecification
 from everest.querying.specifications import ValueGreaterThanFilterSpecification
+from everest.querying.specifications import ValueInSetFilterSpecification
 from everest.querying.specifications import ValueLessThanFilterSpecification
 from everest.querying.specifications import ValueStartsWithFilterSpecification
+from everest.configuration import Configurator
 from everest.testing import TestCaseWithConfiguration
 from pyparsing import ParseException
+from pyramid.registry import Registry
+import random
 
 __docformat__ = 'reStructuredText en'
-__all__ = ['QueryParserTestCase',
+__all__ = ['DifferentialQueryParserTestCase',
+           'QueryParserTestCase',
+           'ReferenceQueryParserTestCase',
            ]
 
 
@@ -46,21 +56,28 @@ class QueryParserTestCase(TestCaseWithConfiguration):
     def test_one_criterion_query_with_many_values(self):
         expr = 'name:equal-to:"Nikos","Oliver","Andrew"'
         result = self.parser(expr)
+        self.assert_true(isinstance(result, ValueInSetFilterSpecification))
+        self.assert_equal(result.attr_name, 'name')
+        self.assert_equal(result.operator, IN_SET)
+        self.assert_equal(result.attr_value,
+                          frozenset(['Nikos', 'Oliver', 'Andrew']))
+
+    def test_one_criterion_query_with_many_values_negated(self):
+        expr = 'name:not-equal-to:"Nikos","Oliver"'
+        result = self.parser(expr)
+        self.assert_true(isinstance(result, NegationFilterSpecification))
+        self.assert_true(isinstance(result.wrapped_spec,
+                                    ValueInSetFilterSpecification))
+        self.assert_equal(result.wrapped_spec.attr_value,
+                          frozenset(['Nikos', 'Oliver']))
+
+    def test_one_criterion_query_with_many_values_other_operator(self):
+        expr = 'name:starts-with:"Ni","Ol"'
+        result = self.parser(expr)
         self.assert_true(isinstance(result,
                                     DisjunctionFilterSpecification))
-        self.assert_true(isinstance(result.left_spec,
-                                    DisjunctionFilterSpecification))
-        self.assert_true(isinstance(result.right_spec,
-                                    ValueEqualToFilterSpecification))
-        self.assert_equal(result.left_spec.left_spec.attr_name, 'name')
-        self.assert_equal(result.left_spec.left_spec.operator, EQUAL_TO)
-        self.assert_equal(result.left_spec.left_spec.attr_value, 'Nikos')
-        self.assert_equal(result.left_spec.right_spec.attr_name, 'name')
-        self.assert_equal(result.left_spec.right_spec.operator, EQUAL_TO)
-        self.assert_equal(result.left_spec.right_spec.attr_value, 'Oliver')
-        self.assert_equal(result.right_spec.attr_name, 'name')
-        self.assert_equal(result.right_spec.operator, EQUAL_TO)
-        self.assert_equal(result.right_spec.attr_value, 'Andrew')
+        self.assert_equal(result.left_spec.attr_value, 'Ni')
+        self.assert_equal(result.right_spec.attr_value, 'Ol')
 
     def test_mixed_criteria_query(self):
         expr = 'name:starts-with:"Ni" OR name:ends-with:"kos" ' \
@@ -120,21 +137,20 @@ class QueryParserTestCase(TestCaseWithConfiguration):
                      ):
             _test(expr)
 
+    def test_multiple_junction_operands(self):
+        expr = 'a:equal-to:1 AND b:equal-to:2 AND c:equal-to:3'
+        result = self.parser(expr)
+        self.assert_true(isinstance(result.left_spec,
+                                    ConjunctionFilterSpecification))
+        self.assert_equal(result.left_spec.right_spec.attr_name, 'b')
+        self.assert_equal(result.right_spec.attr_name, 'c')
+
     def test_one_criterion_query_with_integers(self):
         expr = 'age:equal-to:34,44'
         result = self.parser(expr)
-        self.assert_true(isinstance(result,
-                                    DisjunctionFilterSpecification))
-        self.assert_true(isinstance(result.left_spec,
-                                    ValueEqualToFilterSpecification))
-        self.assert_true(isinstance(result.right_spec,
-                                    ValueEqualToFilterSpecification))
-        self.assert_equal(result.left_spec.attr_name, 'age')
-        self.assert_equal(result.left_spec.operator, EQUAL_TO)
-        self.assert_equal(result.left_spec.attr_value, 34)
-        self.assert_equal(result.right_spec.attr_name, 'age')
-        self.assert_equal(result.right_spec.operator, EQUAL_TO)
-        self.assert_equal(result.right_spec.attr_value, 44)
+        self.assert_true(isinstance(result, ValueInSetFilterSpecification))
+        self.assert_equal(result.attr_name, 'age')
+        self.assert_equal(result.attr_value, frozenset([34, 44]))
 
     def test_one_criterion_query_with_integer_scientific_format(self):
         expr = 'volume:greater-than:5e+05'
@@ -186,23 +202,23 @@ class QueryParserTestCase(TestCaseWithConfiguration):
             isinstance(result.left_spec.left_spec.left_spec.left_spec,
                        DisjunctionFilterSpecification))
         self.assert_true(isinstance(result.right_spec,
-                                    DisjunctionFilterSpecification))
+                                    ValueInSetFilterSpecification))
         spec1 = result.left_spec.left_spec.left_spec.left_spec.left_spec
         spec2 = result.left_spec.left_spec.left_spec.left_spec.right_spec
-        spec3 = result.right_spec.left_spec
-        spec4 = result.right_spec.right_spec
+        spec3 = result.left_spec.left_spec.right_spec
+        spec4 = result.right_spec
         self.assert_equal(spec1.attr_name, 'name')
         self.assert_equal(spec1.operator, STARTS_WITH)
         self.assert_equal(spec1.attr_value, 'Ni')
         self.assert_equal(spec2.attr_name, 'name')
         self.assert_equal(spec2.operator, STARTS_WITH)
         self.assert_equal(spec2.attr_value, 'Ol')
-        self.assert_equal(spec3.attr_name, 'discount')
-        self.assert_equal(spec3.operator, EQUAL_TO)
-        self.assert_equal(spec3.attr_value, -20)
+        self.assert_equal(spec3.attr_name, 'age')
+        self.assert_equal(spec3.operator, IN_SET)
+        self.assert_equal(spec3.attr_value, frozenset([34, 44, 54]))
         self.assert_equal(spec4.attr_name, 'discount')
-        self.assert_equal(spec4.operator, EQUAL_TO)
-        self.assert_equal(spec4.attr_value, -30)
+        self.assert_equal(spec4.operator, IN_SET)
+        self.assert_equal(spec4.attr_value, frozenset([-20, -30]))
 
     def test_multiple_criterion_query_with_different_value_types(self):
         expr = 'name:starts-with:"Ni","Ol","An"~' \
@@ -295,3 +311,112 @@ class QueryParserTestCase(TestCaseWithConfiguration):
         _check_expr(expr)
         expr = 'birthday:equal-to:"1966-04-21T15:61:00Z"'
         _check_expr(expr)
+
+
+class ReferenceQueryParserTestCase(QueryParserTestCase):
+    def set_up(self):
+        QueryParserTestCase.set_up(self)
+        self.parser = parse_filter_reference
+
+
+class DifferentialQueryParserTestCase(TestCaseWithConfiguration):
+    corpus = ['name:equal-to:"Nikos"',
+              'name : equal-to : "Nikos" , \'Oliver\'',
+              'name:not-equal-to:"Nikos","Nikos"',
+              'age:equal-to:34,,44,',
+              'age:equal-to:-0.5,1e3,2e-2,012',
+              'age:equal-to:1e-',
+              'age:equal-to:2E-2',
+              'age:in-range:1-5,1 - -5,1--5,1 -',
+              'birthday:equal-to:"1966-04-21T15:23:01Z",\'1966-04-21\'',
+              'birthday:equal-to:"1966-13-21T15:23:01+01:00"',
+              'flag:equal-to:true,FALSE,truex',
+              'name:equal-to:"a""b","tab\tbed"',
+              'a:equal-to:1 and b:equal-to:2 and c:equal-to:3',
+              'a:equal-to:1 or b:equal-to:2 AND c:equal-to:3 or d:less-than:4',
+              'a:equal-to:1AND b:equal-to:2',
+              'a:equal-to:1 andb:equal-to:2',
+              '((a:equal-to:1 or b:equal-to:2)) and (c:equal-to:3)',
+              '(a:equal-to:1 or b:equal-to:2',
+              'a:equal-to:1~b:equal-to:2 and c:equal-to:3~',
+              'a:equal-to:1 AND',
+              'a:equal-to:1 2',
+              'a.b-c.d:starts-with:"x"',
+              'a..b:equal-to:1',
+              'a:equal-to:',
+              'a:equal-to:"",\'\'',
+              'a:equal-to:1 or (b:foo:1~c:equal-to:2)',
+              'a:equal-to:,',
+              'a:foo:1',
+              '1:equal-to:1',
+              '',
+              '   ',
+              '(',
+              ]
+    criteria = ['a:equal-to:', 'b.c:not-contains:', 'd:in-range:']
+    values = ['1', '-2.5', '0e+2', '3 - 4', '"x"', "'y'", 'true', 'False',
+              '"1966-04-21T15:23:01Z"', '']
+    junctions = [' AND ', ' or ', '~', 'and']
+    noise = [' ', '(', ')', ',', '-', '~', ':', '"', 'or']
+
+    def test_corpus(self):
+        for expr in self.corpus:
+            self.__check(expr)
+
+    def test_random_expressions(self):
+        rand = random.Random(0)
+        for _ in range(250):
+            expr = self.__make_expression(rand, 2)
+            self.__check(expr)
+            # Also check with a random character inserted.
+            pos = rand.randint(0, len(expr))
+            self.__check(expr[:pos] + rand.choice(self.noise) + expr[pos:])
+
+    def test_parse_cache(self):
+        expr = 'name:starts-with:"Ni" AND age:greater-than:34'
+        result = parse_filter(expr)
+        self.assert_true(parse_filter(expr) is result)
+        self.assert_false(parse_filter(expr.lower()) is result)
+        # Strings which do not resolve resource URLs are cached even if they
+        # contain the URL protocol.
+        expr = 'http-status:equal-to:200'
+        self.assert_true(parse_filter(expr) is parse_filter(expr))
+
+    def test_parse_cache_per_registry(self):
+        expr = 'name:starts-with:"Ni"'
+        result = parse_filter(expr)
+        # Another registry has its own specification factory and cache.
+        other_config = Configurator(registry=Registry('other'))
+        other_config.setup_registry()
+        other_config.begin()
+        try:
+            other_result = parse_filter(expr)
+            self.assert_false(other_result is result)
+            self.assert_true(parse_filter(expr) is other_result)
+        finally:
+            other_config.end()
+        self.assert_true(parse_filter(expr) is result)
+
+    def __check(self, expr):
+        self.assert_equal(self.__parse(CqlFilterParser(expr).parse),
+                          self.__parse(lambda: parse_filter_reference(expr)))
+
+    def __make_expression(self, rand, depth):
+        if depth == 0 or rand.random() < 0.4:
+            values = [rand.choice(self.values)
+                      for _ in range(rand.randint(1, 3))]
+            expr = rand.choice(self.criteria) + ','.join(values)
+        else:
+            expr = rand.choice(self.junctions).join(
+                                    self.__make_expression(rand, depth - 1)
+                                    for _ in range(rand.randint(2, 3)))
+            if rand.random() < 0.5:
+                expr = '(%s)' % expr
+        return expr
+
+    def __parse(self, parse):
+        try:
+            result = str(parse())
+        except Exception as exc: # catch Exception pylint: disable=W0703
+            result = type(exc)
+        return result
@@ -11,22 +11,32 @@ from everest.querying.specifications import FilterSpecificationFactory
 from everest.querying.specifications import OrderSpecificationFactory
 from everest.querying.specifications import asc
 from everest.querying.specifications import eq
+from everest.repositories.memory.cache import ColumnarEntityCache
+from everest.repositories.memory.cache import ColumnarEntityCacheMap
 from everest.repositories.memory.cache import EntityCache
 from everest.repositories.memory.cache import EntityCacheMap
+from everest.repositories.memory.cache import OrderedEntityCache
 from everest.repositories.memory.querying import EvalFilterExpression
 from everest.repositories.memory.querying import EvalOrderExpression
 from everest.repositories.state import EntityState
 from everest.resources.descriptors import terminal_attribute
 from everest.testing import Pep8CompliantTestCase
+from mock import patch
 from pyramid.threadlocal import get_current_registry
+from threading import RLock
+from threading import Thread
+import gc
+import sys
 
 __docformat__ = 'reStructuredText en'
-__all__ = ['EntityCacheTestCase',
+__all__ = ['ColumnarEntityCacheTestCase',
+           'EntityCacheTestCase',
            'EntityCacheMapTestCase',
+           'OrderedEntityCacheTestCase',
            ]
 
 
-class EntityCacheTestCase(Pep8CompliantTestCase):
+class _CacheTestCaseBase(Pep8CompliantTestCase):
     def set_up(self):
         Pep8CompliantTestCase.set_up(self)
         # Some tests require the filter and order specification factories.
@@ -36,9 +46,13 @@ class EntityCacheTestCase(Pep8CompliantTestCase):
         reg.registerUtility(flt_spec_fac, IFilterSpecificationFactory)
         reg.registerUtility(ord_spec_fac, IOrderSpecificationFactory)
 
+
+class EntityCacheTestCase(_CacheTestCaseBase):
+    cache_class = EntityCache
+
     def test_basics(self):
         ent = MyEntity(id=0)
-        cache = EntityCache(entities=[])
+        cache = self.cache_class(entities=[])
         cache.add(ent)
         self.assert_true(cache.get_by_id(ent.id) is ent)
         self.assert_true(cache.has_id(ent.id))
@@ -65,7 +79,7 @@ class EntityCacheTestCase(Pep8CompliantTestCase):
         ent0 = MyEntity(id=0)
         ent1 = MyEntity(id=1)
         ent2 = MyEntity(id=2)
-        cache = EntityCache(entities=[])
+        cache = self.cache_class(entities=[])
         cache.add(ent0)
         cache.add(ent1)
         cache.add(ent2)
@@ -79,10 +93,152 @@ class EntityCacheTestCase(Pep8CompliantTestCase):
 
     def test_allow_none_id_false(self):
         ent = MyEntity()
-        cache = EntityCache(entities=[], allow_none_id=False)
+        cache = self.cache_class(entities=[], allow_none_id=False)
         self.assert_raises(ValueError, cache.add, ent)
 
 
+class OrderedEntityCacheTestCase(EntityCacheTestCase):
+    cache_class = OrderedEntityCache
+
+    def test_remove(self):
+        ents = [MyEntity(id=ent_id) for ent_id in range(4)]
+        ent = MyEntity()
+        cache = OrderedEntityCache(entities=ents + [ent])
+        self.assert_true(ent in cache)
+        cache.remove(ent)
+        self.assert_false(ent in cache)
+        # Removing an entity with the ID of a cached entity removes the
+        # cached entity.
+        cache.remove(MyEntity(id=1))
+        self.assert_equal(cache.get_all(), [ents[0], ents[2], ents[3]])
+        self.assert_false(cache.has_id(1))
+        self.assert_false(cache.has_slug('1'))
+        self.assert_raises(KeyError, cache.remove, ent)
+
+    def test_rebuild(self):
+        ent = MyEntity()
+        cache = OrderedEntityCache()
+        cache.add(ent)
+        ent.id = 0
+        self.assert_false(cache.has_id(0))
+        cache.rebuild([ent])
+        self.assert_true(cache.get_by_id(0) is ent)
+        self.assert_true(cache.get_by_slug('0') is ent)
+        self.assert_raises(ValueError, cache.add, MyEntity(id=0))
+
+
+class ColumnarEntityCacheTestCase(_CacheTestCaseBase):
+    def test_basics(self):
+        ent = _make_entity(0, 'FOO')
+        cache = ColumnarEntityCacheMap()[MyEntity]
+        cache.add(ent)
+        cached_ent = cache.get_by_id(ent.id)
+        # The cache returns new instances holding the cached state.
+        self.assert_false(cached_ent is ent)
+        self.assert_equal(cached_ent.id, ent.id)
+        self.assert_equal(cached_ent.text, ent.text)
+        self.assert_true(cache.has_id(ent.id))
+        self.assert_equal(cache.get_by_slug(ent.slug).id, ent.id)
+        self.assert_true(cache.has_slug(ent.slug))
+        self.assert_true(ent in cache)
+        # Adding the same entity twice should only update the cached state.
+        ent.text = 'BAR'
+        cache.add(ent)
+        self.assert_equal(cache.get_by_id(ent.id).text, 'BAR')
+        self.assert_equal(len(cache.get_all()), 1)
+        self.assert_raises(ValueError, cache.add, MyEntity(id=0))
+        #
+        ent1 = MyEntity(id=0)
+        txt = 'FROBNIC'
+        ent1.text = txt
+        cache.update(EntityState.get_state_data(ent1), cached_ent)
+        self.assert_equal(cache.get_by_id(ent.id).text, txt)
+        self.assert_equal([e.text for e in cache.retrieve()], [txt])
+        cache.remove(ent)
+        self.assert_is_none(cache.get_by_id(ent.id))
+        self.assert_is_none(cache.get_by_slug(ent.slug))
+        self.assert_false(ent in cache)
+
+    def test_filter_order_slice(self):
+        cache = ColumnarEntityCacheMap()[MyEntity]
+        for ent_id in range(3):
+            cache.add(MyEntity(id=ent_id))
+        filter_expr = EvalFilterExpression(~eq(id=0))
+        order_expr = EvalOrderExpression(asc('id'))
+        slice_key = slice(1, 2)
+        self.assert_equal([ent.id
+                           for ent in cache.retrieve(
+                                            filter_expression=filter_expr,
+                                            order_expression=order_expr,
+                                            slice_key=slice_key)],
+                          [2])
+
+    def test_retrieve_materializes_matches_only(self):
+        lock = RLock()
+        cache = ColumnarEntityCacheMap(lock=lock)[MyEntity]
+        for ent_id in range(4):
+            cache.add(_make_entity(ent_id, str(ent_id % 2)))
+        lock_states = []
+
+        def check_lock():
+            lock_states.append(lock.acquire(False))
+            if lock_states[-1]:
+                lock.release()
+        thread_filter_expr = EvalFilterExpression(eq(text='1'))
+
+        def filter_expr(entities):
+            thr = Thread(target=check_lock)
+            thr.start()
+            thr.join()
+            return thread_filter_expr(entities)
+        with patch.object(EntityState, 'set_state_data',
+                          wraps=EntityState.set_state_data) as set_mock:
+            ents = list(cache.retrieve(filter_expression=filter_expr))
+        self.assert_equal([ent.id for ent in ents], [1, 3])
+        # Only the matching rows were materialized and the filter was
+        # evaluated without holding the lock.
+        self.assert_equal(set_mock.call_count, 2)
+        self.assert_equal(lock_states, [True])
+
+    def test_allow_none_id_false(self):
+        cache = ColumnarEntityCacheMap()[MyEntity]
+        self.assert_raises(ValueError, cache.add, MyEntity())
+
+    def test_compaction(self):
+        cache = ColumnarEntityCacheMap()[MyEntity]
+        num_ents = 4 * ColumnarEntityCache.COMPACTION_THRESHOLD
+        ents = [_make_entity(ent_id, str(ent_id))
+                for ent_id in range(num_ents)]
+        for ent in ents:
+            cache.add(ent)
+        for ent in ents[::2] + ents[1:num_ents // 2:2]:
+            cache.remove(ent)
+        self.assert_equal([ent.text for ent in cache.get_all()],
+                          [str(ent_id)
+                           for ent_id in range(num_ents // 2 + 1, num_ents,
+                                               2)])
+        self.assert_equal(cache.get_by_slug(str(num_ents - 1)).text,
+                          str(num_ents - 1))
+
+    def test_bytes_per_entity(self):
+        # Compares the memory held by the (gc tracked) containers of both
+        # cache layouts; the attribute values are the same for both.
+        num_ents = 1000
+        sizes = []
+        for make_cache in (EntityCache,
+                           lambda: ColumnarEntityCacheMap()[MyEntity]):
+            gc.collect()
+            obj_ids = set(id(obj) for obj in gc.get_objects())
+            obj_ids.add(id(obj_ids))
+            cache = make_cache()
+            for ent_id in range(num_ents):
+                cache.add(_make_entity(ent_id, 'text %d' % ent_id))
+            gc.collect()
+            sizes.append(sum(sys.getsizeof(obj) for obj in gc.get_objects()
+                             if not id(obj) in obj_ids) // num_ents)
+        self.assert_true(sizes[1] < sizes[0] // 4)
+
+
 class EntityCacheMapTestCase(Pep8CompliantTestCase):
     def test_basics(self):
         ecm = EntityCacheMap()
@@ -91,6 +247,20 @@ class EntityCacheMapTestCase(Pep8CompliantTestCase):
         self.assert_equal(ecm[MyEntity].get_by_id(0), ent)
         self.assert_true(ent in ecm)
         self.assert_equal(list(ecm.keys()), [MyEntity])
+        self.assert_true(isinstance(ecm[MyEntity], OrderedEntityCache))
+        ecm.remove(MyEntity, ent)
+        self.assert_false(ent in ecm)
+        ecm = EntityCacheMap(cache_class=EntityCache)
+        self.assert_true(isinstance(ecm[MyEntity], EntityCache))
+
+    def test_columnar_basics(self):
+        ecm = ColumnarEntityCacheMap()
+        ent = MyEntity(id=0)
+        ecm.add(MyEntity, ent)
+        self.assert_true(isinstance(ecm[MyEntity], ColumnarEntityCache))
+        self.assert_equal(ecm.get_by_id(MyEntity, 0).id, 0)
+        self.assert_true(ent in ecm)
+        self.assert_equal([e.id for e in ecm.query(MyEntity)], [0])
         ecm.remove(MyEntity, ent)
         self.assert_false(ent in ecm)
 
@@ -99,3 +269,9 @@ class MyEntity(Entity):
     __everest_attributes__ = dict(text=terminal_attribute(str, 'text'))
     text = None
 
+
+def _make_entity(entity_id, text):
+    ent = MyEntity(id=entity_id)
+    ent.text = text
+    return ent
+
@@ -10,6 +10,9 @@ from everest.messaging import UserMessageChecker
 from everest.messaging import UserMessageHandlingContextManager
 from everest.messaging import UserMessageNotifier
 from everest.testing import TestCaseWithConfiguration
+from mock import patch
+from pyramid.registry import Registry
+from threading import Thread
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['MessagingTestCase',
@@ -79,6 +82,41 @@ class MessagingTestCase(TestCaseWithConfiguration):
         self.assert_is_none(checker1.myvote)
         self.assert_equal(checker2.myvote, -1)
 
+    def test_checker_is_thread_local(self):
+        checker1 = MyChecker1()
+        reg = self.config.registry
+        thread_values = []
+
+        def send():
+            # The thread needs the registry of the test's configuration.
+            self.config.begin()
+            try:
+                msg_notifier = reg.getUtility(IUserMessageNotifier)
+                thread_values.append(msg_notifier.notify(MESSAGE_TWO))
+            finally:
+                self.config.end()
+        with UserMessageHandlingContextManager(checker1):
+            self.assert_equal(list(reg.registeredSubscriptionAdapters()), [])
+            thr = Thread(target=send)
+            thr.start()
+            thr.join()
+            self.__routine_which_sends_user_message(MESSAGE_TWO)
+        # The message sent from the other thread is not vetoed.
+        self.assert_equal(thread_values, [True])
+        self.assert_equal(self.values, [])
+
+    def test_checker_is_bound_to_registry(self):
+        checker1 = MyChecker1()
+        other_reg = Registry('other')
+        other_reg.registerUtility(UserMessageNotifier(), # pylint:disable=E1103
+                                  IUserMessageNotifier)
+        with UserMessageHandlingContextManager(checker1):
+            with patch('everest.messaging.get_current_registry',
+                       return_value=other_reg):
+                notifier = other_reg.getUtility(IUserMessageNotifier)
+                self.assert_true(notifier.notify(MESSAGE_TWO))
+        self.assert_equal(checker1.myvote, -1)
+
     def __routine_which_sends_user_message(self, msg):
         msg_notifier = \
           self.config.get_registered_utility(IUserMessageNotifier)
@@ -98,6 +98,16 @@ class RdbTestCase(Pep8CompliantTestCase):
         self.assert_true(MyDerivedEntity.__dict__['slug'].expr
                          is slug_expr)
         self.assert_true(isinstance(MyDerivedEntity.slug, Function))
+        self.assert_equal(len(t2.indexes), 0)
+        mpr.dispose()
+        # Optional functional index on the slug expression.
+        class MyIndexedEntity(MyEntity):
+            pass
+        t3 = self._make_table(False)
+        mpr = mapper(MyIndexedEntity, t3, id_attribute='my_id',
+                     slug_expression=slug_expr, slug_index=True)
+        self.assert_equal([idx.name for idx in t3.indexes],
+                          ['ix_my_table_with_id_col_slug'])
         mpr.dispose()
         # Test mapping polymorphic class with custom slug in the base class.
         base_mpr = mapper(MyEntityWithCustomId, t2,
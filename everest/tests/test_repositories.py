@@ -4,13 +4,21 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 Created on Jun 1, 2012.
 """
+from everest.entities.interfaces import IEntity
 from everest.entities.system import UserMessage
 from everest.entities.utils import get_root_aggregate
 from everest.interfaces import IUserMessage
 from everest.mime import CsvMime
+from everest.querying.utils import get_filter_specification_factory
 from everest.repositories.constants import REPOSITORY_TYPES
 from everest.repositories.memory import Aggregate
 from everest.repositories.memory import Repository
+from everest.repositories.memory.cache import EntityCache
+from everest.repositories.memory.querying import EvalFilterExpression
+from everest.repositories.rdb import Repository as RdbRepository
+from everest.repositories.rdb.querying import Query as RdbQuery
+from everest.repositories.rdb.utils import get_metadata
+from everest.repositories.uow import UnitOfWork
 from everest.resources.storing import get_collection_name
 from everest.resources.storing import get_read_collection_path
 from everest.resources.staging import create_staging_collection
@@ -28,7 +36,19 @@ from everest.tests.complete_app.resources import MyEntityMember
 from everest.tests.simple_app.entities import FooEntity
 from everest.tests.simple_app.interfaces import IFoo
 from everest.tests.simple_app.resources import FooMember
+from everest.repositories.utils import get_engine
+from everest.repositories.utils import read_only
 from everest.utils import get_repository_manager
+from sqlalchemy import Column
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import Table
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm import mapper as sa_mapper
+from sqlalchemy.pool import StaticPool
+from mock import patch
+from threading import Thread
+from zope.interface import implementer # pylint: disable=E0611,F0401
 import glob
 import os
 import shutil
@@ -38,11 +58,15 @@ from everest.utils import classproperty
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['BasicRepositoryTestCase',
+           'ColumnarFileSystemRepositoryTestCase',
            'FileSystemEmptyRepositoryTestCase',
            'FileSystemRepositoryTestCase',
            'MemorySystemRepositoryTestCase',
+           'RdbRepositoryPoolTestCase',
+           'RdbRepositoryReplicaTestCase',
            'RdbSystemRepositoryTestCase',
            'RepositoryManagerTestCase',
+           'WeakEntityCacheFileSystemRepositoryTestCase',
            ]
 
 
@@ -53,6 +77,115 @@ class BasicRepositoryTestCase(Pep8CompliantTestCase):
                            autocommit=True, join_transaction=True)
 
 
+class RdbRepositoryPoolTestCase(Pep8CompliantTestCase):
+    def test_pool_configuration(self):
+        repo = RdbRepository('POOL_TEST', autocommit=True,
+                             join_transaction=False)
+        repo.configure(pool_pre_ping=True, pool_statistics=True)
+        repo.initialize()
+        engine = get_engine(repo.name)
+        stats = repo.pool_statistics
+        self.assert_equal(engine.pool.__class__.__name__,
+                          'InstrumentedStaticPool')
+        # The connection used to check the query class was returned.
+        self.assert_true(stats.checkouts > 0)
+        self.assert_equal(stats.checked_out, 0)
+        num_checkouts = stats.checkouts
+        conn = engine.connect()
+        self.assert_equal(stats.checked_out, 1)
+        conn.close()
+        self.assert_equal(stats.checkouts, num_checkouts + 1)
+        self.assert_equal(stats.checked_out, 0)
+        self.assert_equal(stats.max_checked_out, 1)
+        self.assert_equal(stats.timeouts, 0)
+        self.assert_true(stats.max_wait_time >= stats.mean_wait_time)
+        engine.dispose()
+
+    def test_file_database_pool(self):
+        # A database file does not need a shared connection, so each thread
+        # gets its own pysqlite connection from the default pool.
+        data_dir = tempfile.mkdtemp()
+        try:
+            repo = RdbRepository('FILE_POOL_TEST', autocommit=True,
+                                 join_transaction=False)
+            repo.configure(db_string='sqlite:///%s'
+                                     % os.path.join(data_dir, 'pool.db'))
+            repo.initialize()
+            engine = get_engine(repo.name)
+            self.assert_false(isinstance(engine.pool, StaticPool))
+            conns = []
+
+            def connect():
+                conn = engine.connect()
+                conns.append(conn.connection.connection)
+                conn.close()
+            thr = Thread(target=connect)
+            thr.start()
+            thr.join()
+            connect()
+            self.assert_false(conns[0] is conns[1])
+            engine.dispose()
+        finally:
+            shutil.rmtree(data_dir)
+
+
+@implementer(IEntity)
+class _ReplicaTestEntity(object):
+    def __init__(self, id): # redefining id pylint: disable=W0622
+        self.id = id
+
+
+def _create_replica_test_metadata(engine):
+    metadata = MetaData()
+    tbl = Table('replica_test', metadata,
+                Column('id', Integer, primary_key=True))
+    sa_mapper(_ReplicaTestEntity, tbl)
+    metadata.create_all(bind=engine)
+    return metadata
+
+
+class RdbRepositoryReplicaTestCase(Pep8CompliantTestCase):
+    def set_up(self):
+        self.__data_dir = tempfile.mkdtemp()
+        self.__repo = None
+
+    def tear_down(self):
+        if not self.__repo is None:
+            for engine in [get_engine(self.__repo.name)] \
+                          + self.__repo.replica_engines:
+                engine.dispose()
+            class_mapper(_ReplicaTestEntity).dispose()
+        shutil.rmtree(self.__data_dir)
+
+    def test_read_replica(self):
+        db_tmpl = 'sqlite:///' + os.path.join(self.__data_dir, '%s.db')
+        repo = RdbRepository('REPLICA_TEST', autocommit=True,
+                             join_transaction=False)
+        repo.configure(db_string=db_tmpl % 'primary',
+                       replica_db_strings=[db_tmpl % 'replica'],
+                       metadata_factory=_create_replica_test_metadata)
+        repo.initialize()
+        self.__repo = repo
+        self.assert_equal(len(repo.replica_engines), 1)
+        metadata = get_metadata(repo.name)
+        metadata.create_all(bind=repo.replica_engines[0])
+        # Write a record to the primary only.
+        tbl = metadata.tables['replica_test']
+        get_engine(repo.name).execute(tbl.insert().values(id=0))
+        session = repo.session_factory()
+        query = session.query(_ReplicaTestEntity, query_class=RdbQuery)
+        self.assert_equal(query.count(), 1)
+        with read_only():
+            self.assert_equal(query.count(), 0)
+        # After a write, the session sticks to the primary.
+        session.add(_ReplicaTestEntity, _ReplicaTestEntity(1))
+        with read_only():
+            self.assert_equal(query.count(), 2)
+        session.close()
+        with read_only():
+            self.assert_equal(query.count(), 0)
+
+
 class RepositoryManagerTestCase(ResourceTestCase):
     package_name = 'everest.tests.complete_app'
     config_file_name = 'configure_no_rdb.zcml'
@@ -306,11 +439,114 @@ class FileSystemRepositoryTestCase(_FileSystemRepositoryTestCaseMixin,
         data = lines[1].split(',')
         self.assert_equal(data[2], '"%s"' % TEXT)
 
+    def test_commit_clean_does_not_dump(self):
+        dumps = []
+        repo_mgr = get_repository_manager()
+        repo = repo_mgr.get(REPOSITORY_TYPES.FILE_SYSTEM)
+        repo.configure(dump_hook=dumps.append)
+        coll = get_root_collection(IMyEntity)
+        mb = next(iter(coll))
+        self.assert_is_not_none(mb.parent)
+        transaction.commit()
+        self.assert_equal(dumps, [])
+        mb = next(iter(coll))
+        mb.text = 'Changed.'
+        transaction.commit()
+        self.assert_equal(len(dumps), 1)
+        self.assert_equal(list(dumps[0].keys()), [MyEntity])
+        self.assert_true(dumps[0][MyEntity] > 0)
+
+    def test_commit_with_dump_delay(self):
+        dumps = []
+        repo_mgr = get_repository_manager()
+        repo = repo_mgr.get(REPOSITORY_TYPES.FILE_SYSTEM)
+        repo.configure(dump_delay=3600, dump_hook=dumps.append)
+        coll = get_root_collection(IMyEntity)
+        for text in ('Changed.', 'Changed again.'):
+            mb = next(iter(coll))
+            mb.text = text
+            transaction.commit()
+        self.assert_equal(dumps, [])
+        written = repo.dump_pending()
+        self.assert_equal(list(written.keys()), [MyEntity])
+        self.assert_equal(dumps, [written])
+        self.assert_equal(repo.dump_pending(), {})
+
     def test_configure(self):
         repo_mgr = get_repository_manager()
         repo = repo_mgr.get(REPOSITORY_TYPES.FILE_SYSTEM)
         self.assert_raises(ValueError, repo.configure, foo='bar')
 
+    def test_retrieve_snapshot(self):
+        repo_mgr = get_repository_manager()
+        repo = repo_mgr.get(REPOSITORY_TYPES.FILE_SYSTEM)
+        self.assert_false(repo.lock is
+                          repo_mgr.get(REPOSITORY_TYPES.MEMORY).lock)
+        ents = repo.retrieve(MyEntity)
+        coll = get_root_collection(IMyEntity)
+        coll.add(MyEntityMember.create_from_entity(MyEntity(id=2)))
+        transaction.commit()
+        # Readers keep iterating over the version they started with.
+        self.assert_equal(len(list(ents)), 1)
+        self.assert_equal(len(list(repo.retrieve(MyEntity))), 2)
+
+    def test_snapshot_state(self):
+        repo = get_repository_manager().get(REPOSITORY_TYPES.FILE_SYSTEM)
+        snapshot = repo.snapshot
+        ent = next(repo.retrieve(MyEntity))
+        old_text = ent.text
+        coll = get_root_collection(IMyEntity)
+        for text in ('Changed.', 'Changed again.'):
+            mb = next(iter(coll))
+            mb.text = text
+            transaction.commit()
+            self.assert_false(repo.snapshot is snapshot)
+            # Readers of the old snapshot keep seeing the old state.
+            self.assert_equal(self.__get_text(snapshot, ent), old_text)
+            self.assert_equal(
+                    self.__get_text(repo.snapshot,
+                                    next(repo.retrieve(MyEntity))),
+                    text)
+
+    def test_retrieve_filtered_during_flush(self):
+        repo = get_repository_manager().get(REPOSITORY_TYPES.FILE_SYSTEM)
+        coll = get_root_collection(IMyEntity)
+        coll.add(MyEntityMember.create_from_entity(MyEntity(id=2)))
+        transaction.commit()
+        spec_fac = get_filter_specification_factory()
+        filter_expr = EvalFilterExpression(
+                            spec_fac.create_equal_to('text', 'Changed.'))
+        counts = []
+        readers = []
+        def read():
+            counts.append(len(list(repo.retrieve(
+                                    MyEntity,
+                                    filter_expression=filter_expr))))
+        mark_persisted = UnitOfWork.mark_persisted
+        def mark_persisted_and_read(uow, entity):
+            mark_persisted(uow, entity)
+            if len(readers) == 0:
+                # Read while the flush is in progress.
+                reader = Thread(target=read)
+                readers.append(reader)
+                reader.start()
+                reader.join(1)
+        with patch.object(UnitOfWork, 'mark_persisted',
+                          mark_persisted_and_read):
+            for mb in coll:
+                mb.text = 'Changed.'
+            transaction.commit()
+        readers[0].join()
+        # The reader sees either none or all of the changes.
+        self.assert_true(counts[0] in (0, 2))
+        read()
+        self.assert_equal(counts[1], 2)
+
+    def __get_text(self, snapshot, entity):
+        state = snapshot.get_state_data(entity)
+        return dict([(attr.entity_attr, value)
+                     for (attr, value) in state.items()])['text']
+
     def __copy_data_files(self):
         orig_data_dir = os.path.join(self._data_dir, 'original')
         for fn in glob.glob1(orig_data_dir, "*.csv"):
@@ -321,6 +557,28 @@ class FileSystemRepositoryTestCase(_FileSystemRepositoryTestCaseMixin,
             os.unlink(os.path.join(self._data_dir, fn))
 
 
+class ColumnarFileSystemRepositoryTestCase(FileSystemRepositoryTestCase):
+    def _load_custom_zcml(self):
+        repo_mgr = get_repository_manager()
+        repo = repo_mgr.get(REPOSITORY_TYPES.FILE_SYSTEM)
+        repo.configure(columnar_store=True)
+
+    def test_references(self):
+        mb = next(iter(get_root_collection(IMyEntity)))
+        self.assert_equal(mb.parent.id, 0)
+        self.assert_equal([child.id for child in mb.children], [0])
+        child = next(iter(mb.children))
+        self.assert_equal(child.parent.id, mb.id)
+
+
+class WeakEntityCacheFileSystemRepositoryTestCase(
+                                            FileSystemRepositoryTestCase):
+    def _load_custom_zcml(self):
+        repo_mgr = get_repository_manager()
+        repo = repo_mgr.get(REPOSITORY_TYPES.FILE_SYSTEM)
+        repo.configure(entity_cache_class=EntityCache)
+
+
 class MemoryRepoWithCacheLoaderTestCase(ResourceTestCase):
     package_name = 'everest.tests.complete_app'
     config_file_name = 'configure_memory_repo_with_cache_loader.zcml'
@@ -14,6 +14,8 @@ from everest.mime import JsonMime
 from everest.mime import XmlMime
 from everest.querying.utils import get_filter_specification_factory
 from everest.querying.utils import get_order_specification_factory
+from everest.repositories.rdb.session import ScopedSessionMaker as Session
+from everest.repositories.rdb.testing import RdbTestCaseMixin
 from everest.representers.attributes import MappedAttribute
 from everest.representers.config import IGNORE_OPTION
 from everest.representers.config import REPR_NAME_OPTION
@@ -48,6 +50,8 @@ from everest.tests.complete_app.interfaces import IMyEntity
 from everest.tests.complete_app.resources import MyEntityMember
 from everest.tests.complete_app.resources import MyEntityParentMember
 from everest.tests.complete_app.testing import create_collection
+from everest.tests.complete_app.testing import create_entity
+from mock import patch
 from zope.interface import Interface # pylint: disable=E0611,F0401
 
 
@@ -55,6 +59,7 @@ __docformat__ = 'reStructuredText en'
 __all__ = ['AtomRepresentationTestCase',
            'AttributesTestCase',
            'CsvRepresenterTestCase',
+           'JsonRepresenterRdbTestCase',
            'JsonRepresenterTestCase',
            'RepresenterConfigurationNoTypesTestCase',
            'RepresenterConfigurationTestCase',
@@ -250,6 +255,21 @@ class JsonRepresenterTestCase(_RepresenterTestCase):
     def test_json_with_two_collections_expanded(self):
         self._test_with_two_collections_expanded(None)
 
+    def test_json_load_attributes(self):
+        agg = self._collection.get_aggregate()
+        agg_clones = []
+        def clone():
+            agg_clone = type(agg).clone(agg)
+            agg_clones.append(agg_clone)
+            return agg_clone
+        with patch.object(agg, 'clone', side_effect=clone):
+            self._test_with_member_expanded(None, do_roundtrip=False)
+        # The load options are set on a clone of the aggregate.
+        self.assert_is_none(agg.load_attributes)
+        self.assert_equal([agg_clone.load_attributes
+                           for agg_clone in agg_clones],
+                          [['parent']])
+
     def test_json_data_tree_traverser(self):
         mp_reg = get_mapping_registry(JsonMime)
         default_mp = mp_reg.find_or_create_mapping(MyEntityMember)
@@ -266,6 +286,48 @@ class JsonRepresenterTestCase(_RepresenterTestCase):
             self.assert_true(str(cm.exception).startswith(exc_msg))
 
 
+class JsonRepresenterRdbTestCase(RdbTestCaseMixin, ResourceTestCase):
+    package_name = 'everest.tests.complete_app'
+    config_file_name = 'configure.zcml'
+
+    def test_json_select_count_with_collections_expanded(self):
+        coll = get_root_collection(IMyEntity)
+        for idx in range(5):
+            coll.create_member(create_entity(entity_id=idx,
+                                             entity_text=str(idx)))
+        agg = coll.get_aggregate()
+        agg.sync_with_repository()
+        Session.expunge_all()
+        rpr = as_representer(coll, JsonMime)
+        rpr.configure(attribute_options=
+                        {('date_time',):{IGNORE_OPTION:True},
+                         ('parent',):{WRITE_AS_LINK_OPTION:False},
+                         ('children',):{IGNORE_OPTION:False,
+                                        WRITE_AS_LINK_OPTION:False},
+                         ('children', 'children'):
+                                {IGNORE_OPTION:False,
+                                 WRITE_AS_LINK_OPTION:False},
+                         })
+        dialect = Session.connection().dialect
+        # The entities with their parents, the children and the
+        # grandchildren are loaded with one statement each.
+        with patch.object(dialect, 'do_execute',
+                          wraps=dialect.do_execute) as exec_mock:
+            rpr_str = rpr.to_string(coll)
+        self.assert_equal(exec_mock.call_count, 3)
+        self.assert_equal(rpr_str.count('myentity-grandchild'), 5)
+        # The entities of a prefetched page are not fetched again.
+        Session.expunge_all()
+        coll.slice = slice(0, 3)
+        coll.set_page(agg.iterator())
+        with patch.object(dialect, 'do_execute',
+                          wraps=dialect.do_execute) as exec_mock:
+            rpr_str = rpr.to_string(coll)
+        self.assert_equal(exec_mock.call_count, 3)
+        self.assert_false('LIMIT' in exec_mock.call_args_list[0][0][1])
+        self.assert_equal(rpr_str.count('myentity-grandchild'), 3)
+
+
 class CsvRepresenterTestCase(_RepresenterTestCase):
     package_name = 'everest.tests.complete_app'
     config_file_name = 'configure_no_rdb.zcml'
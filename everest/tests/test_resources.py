@@ -5,9 +5,14 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 Created on Jun 14, 2012.
 """
 from everest.entities.base import Entity
+from everest.entities.utils import get_entity_class
 from everest.querying.specifications import ConjunctionFilterSpecification
 from everest.querying.specifications import ValueEqualToFilterSpecification
 from everest.querying.utils import get_filter_specification_factory
+from everest.resources.classmap import ResourceClassMap
+from everest.resources.utils import as_member
+from everest.resources.utils import get_collection_class
+from everest.resources.utils import get_member_class
 from everest.resources.utils import get_root_collection
 from everest.testing import ResourceTestCase
 from everest.tests.complete_app.testing import create_collection
@@ -16,6 +21,8 @@ from everest.tests.simple_app.interfaces import IFoo
 from everest.tests.simple_app.resources import FooCollection
 from everest.tests.simple_app.resources import FooMember
 from mock import patch
+from zope.interface.interfaces import ComponentLookupError # pylint: disable=E0611,F0401
+import gc
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['ResourcesFilteringTestCase',
@@ -75,6 +82,50 @@ class ResourcesTestCase(ResourceTestCase):
         coll_str = str(coll)
         self.assert_true(coll_str.startswith('<FooCollection'))
 
+    def test_member_allocations(self):
+        # Micro benchmark: Creating a member allocates only the member
+        # instance itself (and not also an instance dictionary, a set of
+        # links, and a self link with its dictionary).
+        ents = [FooEntity(id=idx) for idx in range(1000)]
+        # Warm up the resource class lookups.
+        as_member(ents[0])
+        gc.collect()
+        num_objs = len(gc.get_objects())
+        mbs = [as_member(ent) for ent in ents]
+        self.assert_true(len(gc.get_objects()) - num_objs < 2 * len(mbs))
+        mb = mbs[0]
+        self.assert_false(any(isinstance(ref, dict)
+                              for ref in gc.get_referents(mb)))
+        self.assert_equal([link.rel for link in mb.links], ['self'])
+        self.assert_false(any(isinstance(ref, dict)
+                              for ref in gc.get_referents(mb)))
+
+    def test_resource_class_map(self):
+        reg = self.config.registry
+        foo = FooEntity(id=0)
+        # Build the map before patching the registry.
+        get_member_class(IFoo)
+        with patch.object(reg, 'getUtility') as util_mock, \
+             patch.object(reg, 'getAdapter') as adapter_mock:
+            for rc in (IFoo, FooMember, FooCollection, FooEntity, foo):
+                self.assert_true(get_member_class(rc) is FooMember)
+                self.assert_true(get_collection_class(rc) is FooCollection)
+                self.assert_true(get_entity_class(rc) is FooEntity)
+            mb = as_member(foo)
+            self.assert_true(isinstance(mb, FooMember))
+            self.assert_true(mb.get_entity() is foo)
+            self.assert_false(util_mock.called)
+            self.assert_false(adapter_mock.called)
+        # Changing the registry invalidates the map.
+        cls_map = ResourceClassMap.for_registry(reg)
+        self.assert_true(ResourceClassMap.for_registry(reg) is cls_map)
+        reg.registerUtility(FooCollection, IFoo, name='member-class')
+        self.assert_true(get_member_class(IFoo) is FooCollection)
+        self.assert_false(ResourceClassMap.for_registry(reg) is cls_map)
+        # Unregistered classes are looked up in the registry.
+        with self.assert_raises(ComponentLookupError):
+            get_member_class(UnregisteredEntity)
+
 
 #class RelatedResourcesTestCase(ResourceTestCase):
 #    package_name = 'everest.tests.complete_app'
@@ -0,0 +1,36 @@
+"""
+This file is part of the everest project.
+See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
+
+Created on Oct 18, 2026.
+"""
+from everest.root import RootFactory
+from everest.testing import Pep8CompliantTestCase
+from mock import MagicMock
+from mock import patch
+
+__docformat__ = 'reStructuredText en'
+__all__ = ['RootFactoryTestCase',
+           ]
+
+
+class RootFactoryTestCase(Pep8CompliantTestCase):
+    def test_root_is_published_after_start(self):
+        root_factory = RootFactory()
+        srv = MagicMock()
+        roots = []
+
+        def start():
+            # Simulates a request arriving while the service is starting.
+            if srv.start.call_count == 1:
+                roots.append(root_factory(None))
+        srv.start.side_effect = start
+        with patch('everest.root.get_service', return_value=srv):
+            self.assert_true(root_factory(None) is srv)
+            # The concurrent request did not get the service without
+            # starting it (which waits for a startup in progress).
+            self.assert_equal(roots, [srv])
+            self.assert_equal(srv.start.call_count, 2)
+            # Later requests get the started service.
+            self.assert_true(root_factory(None) is srv)
+            self.assert_equal(srv.start.call_count, 2)
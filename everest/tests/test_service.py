@@ -5,10 +5,15 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 Created on Jun 14, 2012.
 """
 from everest.resources.base import Collection
+from everest.resources.service import Service
 from everest.resources.utils import get_collection_class
 from everest.resources.utils import get_service
 from everest.testing import ResourceTestCase
 from everest.tests.complete_app.interfaces import IMyEntity
+from everest.tests.complete_app.interfaces import IMyEntityParent
+from mock import patch
+from threading import Event
+from threading import Thread
 from zope.interface import Interface # pylint: disable=E0611,F0401
 
 __docformat__ = 'reStructuredText en'
@@ -44,6 +49,42 @@ class ServiceTestCase(ResourceTestCase):
     def test_add_with_existing_name_raises_error(self):
         self.assert_raises(ValueError, self.srv.add, IMyEntity)
 
+    def test_concurrent_start(self):
+        srv = Service()
+        srv.register(IMyEntity)
+        srv.register(IMyEntityParent)
+        entered = Event()
+        proceed = Event()
+        srv_add = srv.add
+
+        def add(irc):
+            entered.set()
+            proceed.wait(5)
+            srv_add(irc)
+        lens = []
+
+        def start():
+            # The thread needs the registry of the test's configuration.
+            self.config.begin()
+            try:
+                srv.start()
+                lens.append(len(srv))
+            finally:
+                self.config.end()
+        with patch.object(srv, 'add', side_effect=add):
+            thr1 = Thread(target=start)
+            thr1.start()
+            entered.wait(5)
+            thr2 = Thread(target=start)
+            thr2.start()
+            # The second call waits for the startup in the first thread.
+            thr2.join(0.1)
+            self.assert_true(thr2.is_alive())
+            proceed.set()
+            thr1.join()
+            thr2.join()
+        self.assert_equal(lens, [2, 2])
+
 
 class IFooResource(Interface): # pylint: disable=W0232
     pass
@@ -30,3 +30,13 @@ class TraversalPathTestCase(Pep8CompliantTestCase):
         tp.pop()
         self.assert_equal(len(tp), 0)
         self.assert_false(key in tp)
+
+    def test_duplicate_keys(self):
+        key = ('source', 'target')
+        tp = TraversalPath()
+        tp.push('proxy0', key, 'attribute', 'relation_operation')
+        tp.push('proxy1', key, 'attribute', 'relation_operation')
+        tp.pop()
+        self.assert_true(key in tp)
+        tp.pop()
+        self.assert_false(key in tp)
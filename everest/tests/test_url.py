@@ -4,6 +4,11 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 
 Created on Jun 1, 2012.
 """
+from everest.querying.filterparser import CqlFilterParser
+from everest.querying.filterparser import parse_filter
+from everest.querying.filterparser import parse_filter_reference
+from everest.querying.specifications import asc
+from everest.querying.specifications import eq
 from everest.querying.utils import get_filter_specification_factory
 from everest.querying.utils import get_order_specification_factory
 from everest.repositories.rdb.testing import RdbTestCaseMixin
@@ -15,6 +20,8 @@ from everest.tests.complete_app.interfaces import IMyEntityParent
 from everest.tests.complete_app.resources import MyEntityMember
 from everest.tests.complete_app.testing import create_collection
 from everest.tests.complete_app.testing import create_entity
+from mock import DEFAULT
+from mock import patch
 from pyramid.compat import urlparse
 from everest.utils import classproperty
 
@@ -105,6 +112,43 @@ class UrlTestCaseBase(ResourceTestCase):
                          schema='http', path='/my-entities/', params='',
                          query='sort=id:asc~text:desc')
 
+    def test_resource_to_url_cache(self):
+        req = self._request
+        with patch.object(req, 'resource_url',
+                          wraps=req.resource_url) as url_mock:
+            urls = [resource_to_url(mb) for mb in self.coll]
+            self.assert_equal(urls, ['%s0/' % self.base_url,
+                                     '%s1/' % self.base_url])
+            # The collection URL is only built once per request.
+            self.assert_equal(resource_to_url(self.coll), self.base_url)
+            self.assert_equal(url_mock.call_count, 1)
+            # Nested resources referencing an exposed root collection
+            # reuse the cached root collection URL.
+            parent_urls = [resource_to_url(mb.parent) for mb in self.coll]
+            self.assert_equal(parent_urls,
+                              ['%s/my-entity-parents/%d/' % (self.app_url, idx)
+                               for idx in range(2)])
+            self.assert_equal(url_mock.call_count, 2)
+
+    def test_resource_to_url_memoized_cql_strings(self):
+        self.coll.filter = eq(id=0)
+        self.coll.order = asc('id')
+        url = resource_to_url(self.coll)
+        self.assert_equal(self.coll.filter.cql_string, 'id:equal-to:0')
+        self.assert_equal(self.coll.order.cql_string, 'id:asc')
+        with patch.multiple('everest.url',
+                            get_filter_specification_visitor=DEFAULT,
+                            get_order_specification_visitor=DEFAULT) \
+                            as vst_mocks:
+            self.assert_equal(resource_to_url(self.coll.clone()), url)
+            for vst_mock in vst_mocks.values():
+                self.assert_false(vst_mock.called)
+        # Resource values are rendered as request dependent URLs.
+        parent = get_root_collection(IMyEntityParent)['0']
+        self.coll.filter = eq(parent=parent)
+        resource_to_url(self.coll)
+        self.assert_is_none(self.coll.filter.cql_string)
+
     def test_url_to_resource_nonexisting_collection(self):
         with self.assert_raises(KeyError) as cm:
             url_to_resource('http://0.0.0.0:6543/my-foos/')
@@ -254,6 +298,23 @@ class UrlTestCaseBase(ResourceTestCase):
         coll_from_url = url_to_resource(url)
         self.assert_equal(len(coll_from_url), 2)
 
+    def test_url_filter_not_cached(self):
+        nested_url = self.app_url + '/my-entity-parents/?q=id:less-than:1'
+        criterion = 'parent:contained:"%s"' % nested_url
+        # Resource URLs are resolved afresh for each parse.
+        parser = CqlFilterParser(criterion)
+        spec = parser.parse()
+        self.assert_true(parser.has_resources)
+        self.assert_false(parse_filter(criterion) is spec)
+        self.assert_false(parse_filter(criterion) is parse_filter(criterion))
+
+    def test_url_filter_reference(self):
+        par_url = self.app_url + '/my-entity-parents/'
+        criterion = 'parent:equal-to:"%s","%s"' \
+                    % (par_url + '0/', par_url + '1/')
+        self.assert_equal(parse_filter(criterion),
+                          parse_filter_reference(criterion))
+
     def test_url_to_resource_contained_with_simple_collection_link(self):
         nested_url = self.app_url \
                      + '/my-entity-parents/?q=id:less-than:1'
@@ -12,6 +12,7 @@ from pyramid.compat import NativeIO
 
 from everest.testing import Pep8CompliantTestCase
 from everest.utils import BidirectionalLookup
+from everest.utils import LruCache
 from everest.utils import TruncatingFormatter
 from everest.utils import WeakList
 from everest.utils import WeakOrderedSet
@@ -212,6 +213,22 @@ class UtilsTestCase(Pep8CompliantTestCase):
         self.assert_equal(wos, other_wos)
         self.assert_equal(wos, values)
 
+    def test_lru_cache(self):
+        cache = LruCache(2)
+        self.assert_equal(cache.max_size, 2)
+        self.assert_is_none(cache.get('a'))
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # Accessing "a" makes "b" the least recently used item.
+        self.assert_equal(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assert_equal(len(cache), 2)
+        self.assert_false('b' in cache)
+        self.assert_equal(cache.get('b', -1), -1)
+        self.assert_equal(cache.get('c'), 3)
+        cache.clear()
+        self.assert_equal(len(cache), 0)
+
     def test_truncating_formatter(self):
         buf = NativeIO()
         logger = logging.Logger('test', logging.DEBUG)
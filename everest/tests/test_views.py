@@ -7,6 +7,7 @@ Created on Nov 17, 2011.
 from pkg_resources import resource_filename # pylint: disable=E0611
 from pyramid.compat import bytes_
 from pyramid.compat import native_
+from pyramid.compat import urlparse
 from pyramid.testing import DummyRequest
 import transaction
 
@@ -14,6 +15,7 @@ from everest.constants import RequestMethods
 from everest.mime import CSV_MIME
 from everest.mime import CsvMime
 from everest.mime import XmlMime
+from everest.querying.ordering import Keyset
 from everest.renderers import RendererFactory
 from everest.repositories.rdb.testing import RdbTestCaseMixin
 from everest.resources.interfaces import IService
@@ -21,6 +23,7 @@ from everest.resources.utils import get_collection_class
 from everest.resources.utils import get_root_collection
 from everest.resources.utils import get_service
 from everest.resources.utils import resource_to_url
+from everest.resources.utils import url_to_resource
 from everest.testing import FunctionalTestCase
 from everest.testing import ResourceTestCase
 from everest.tests.complete_app.entities import MyEntity
@@ -36,10 +39,12 @@ from everest.tests.simple_app.views import ExceptionPutMemberView
 from everest.tests.simple_app.views import UserMessagePostCollectionView
 from everest.tests.simple_app.views import UserMessagePutMemberView
 from everest.traversal import SuffixResourceTraverser
+from everest.url import UrlPartsConverter
 from everest.utils import get_repository_manager
 from everest.views.getcollection import GetCollectionView
 from everest.views.static import public_view
 from everest.views.utils import accept_csv_only
+from mock import patch
 import os
 
 
@@ -129,6 +134,18 @@ class BasicViewTestCase(FunctionalTestCase):
                            status=200)
         self.assert_is_not_none(res)
 
+    def test_get_collection_with_cursor(self):
+        create_collection()
+        cursor = UrlPartsConverter.make_keyset_string(Keyset([0]))
+        res = self.app.get(self.path, params=dict(cursor=cursor, size=1),
+                           status=200)
+        self.assert_is_not_none(res)
+        self.assert_true(res.body.find(b'too1') != -1)
+        self.assert_true(res.body.find(b'foo0') == -1)
+        res = self.app.get(self.path, params=dict(cursor='foo', size=1),
+                           status=500)
+        self.assert_is_not_none(res)
+
     def test_get_collection_with_refs_options(self):
         # The links options are not processed by the renderers, so we need
         # a native everest view with a defined response MIME type.
@@ -489,6 +506,84 @@ class GetCollectionViewTestCase(ResourceTestCase):
         self.assert_equal(view.context.slice.start, 0)
         self.assert_equal(view.context.slice.stop, FooCollection.max_limit)
 
+    def test_get_collection_view_with_cursor(self):
+        coll = get_root_collection(IFoo)
+        for idx in range(3):
+            coll.create_member(FooEntity(id=idx))
+        cursor = UrlPartsConverter.make_keyset_string(Keyset([0]))
+        app_url = self._get_app_url()
+        path_url = 'http://0.0.0.0:6543/foos/'
+        req = DummyRequest(application_url=app_url, host_url=app_url,
+                           path_url=path_url,
+                           url=path_url + '?cursor=%s&size=1' % cursor,
+                           params=dict(cursor=cursor, size=1),
+                           registry=self.config.registry,
+                           accept=['*/*'])
+        req.get_response = lambda exc: None
+        view = GetCollectionView(coll, req)
+        agg = coll.get_aggregate()
+        # The page is fetched once for rendering and for the navigation
+        # links.
+        with patch.object(agg, 'iterator', wraps=agg.iterator) \
+                                                        as iterator_mock:
+            res = view()
+            self.assert_equal([mb.id for mb in view.context], [1])
+        self.assert_equal(iterator_mock.call_count, 1)
+        self.assert_is_not_none(res)
+        self.assert_equal(view.context.keyset, Keyset([0]))
+        links = dict((lnk.rel, lnk) for lnk in view.context.links)
+        self.assert_equal(set(links.keys()),
+                          set(['self', 'first', 'previous', 'next', 'last']))
+        next_url = links['next'].href
+        self.assert_true('cursor=' in next_url)
+        self.assert_false('start=' in next_url)
+        next_coll = url_to_resource(next_url)
+        self.assert_equal(next_coll.keyset, Keyset([1]))
+        prev_coll = url_to_resource(links['previous'].href)
+        self.assert_equal(prev_coll.keyset, Keyset([1], is_forward=False))
+
+
+class KeysetGetCollectionViewTestCase(ResourceTestCase):
+    package_name = 'everest.tests.complete_app'
+    config_file_name = 'configure_no_rdb.zcml'
+
+    def test_get_collection_view_with_sorted_cursor(self):
+        create_collection()
+        cursor = UrlPartsConverter.make_keyset_string(Keyset())
+        url = self._get_app_url() + '/my-entities/' \
+              + '?sort=text:desc&size=1&cursor=%s' % cursor
+        texts, links = self.__get_keyset_page(url)
+        self.assert_equal(texts, ['too1'])
+        next_url = links['next'].href
+        self.assert_true('sort=' in next_url)
+        self.assert_equal([mb.text for mb in url_to_resource(next_url)],
+                          ['foo0'])
+        texts, links = self.__get_keyset_page(next_url)
+        self.assert_equal(texts, ['foo0'])
+        self.assert_false('next' in links)
+        prev_url = links['previous'].href
+        self.assert_true('sort=' in prev_url)
+        texts, links = self.__get_keyset_page(prev_url)
+        self.assert_equal(texts, ['too1'])
+        self.assert_false('previous' in links)
+
+    def __get_keyset_page(self, url):
+        # Runs a GET collection view for the given URL and returns the
+        # texts of the members on the page and the links by relation.
+        path_url, query_string = url.split('?')
+        app_url = self._get_app_url()
+        req = DummyRequest(application_url=app_url, host_url=app_url,
+                           path_url=path_url, url=url,
+                           params=dict(urlparse.parse_qsl(query_string)),
+                           registry=self.config.registry,
+                           accept=['*/*'])
+        req.get_response = lambda exc: None
+        view = GetCollectionView(get_root_collection(IMyEntity), req)
+        view()
+        texts = [mb.text for mb in view.context]
+        links = dict((lnk.rel, lnk) for lnk in view.context.links)
+        return texts, links
+
 
 class StaticViewTestCase(FunctionalTestCase):
     package_name = 'everest.tests.complete_app'
@@ -124,6 +124,8 @@ class FilterVisitorTestCase(VisitorTestCase):
             self.specs_factory.create_greater_than_or_equal_to('age', 34)
         sm['in-range'] = \
             self.specs_factory.create_in_range('age', (30, 40))
+        sm['in-set'] = \
+            self.specs_factory.create_in_set('age', [44, 34])
         left_spec = self.specs_factory.create_greater_than('age', 34)
         right_spec = self.specs_factory.create_equal_to('name', 'Nikos')
         sm['conjunction'] = left_spec & right_spec
@@ -147,6 +149,7 @@ class FilterVisitorTestCase(VisitorTestCase):
         sm['not-greater-than'] = ~sm['greater-than']
         sm['not-greater-than-or-equal-to'] = ~sm['greater-than-or-equal-to']
         sm['not-in-range'] = ~sm['in-range']
+        sm['not-in-set'] = ~sm['in-set']
         return sm
 
 
@@ -205,6 +208,23 @@ class CqlFilterSpecificationVisitorTestCase(FilterVisitorTestCase):
         expr = self._run_visitor('in-range')
         self.assert_equal(str(expr), expected_cql)
 
+    def test_visit_value_in_set(self):
+        expected_cql = 'age:equal-to:34,44'
+        expr = self._run_visitor('in-set')
+        self.assert_equal(str(expr), expected_cql)
+
+    def test_visit_value_in_set_mixed_types(self):
+        # Values are sorted on their CQL representation.
+        expected_cql = 'age:equal-to:"Nikos",34,44'
+        spec = self.specs_factory.create_in_set('age', [44, 'Nikos', 34])
+        spec.accept(self.visitor)
+        self.assert_equal(str(self.visitor.expression), expected_cql)
+
+    def test_visit_value_not_in_set(self):
+        expected_cql = 'age:not-equal-to:34,44'
+        expr = self._run_visitor('not-in-set')
+        self.assert_equal(str(expr), expected_cql)
+
     def test_visit_Conjunction(self):
         expected_cql = 'age:greater-than:34~name:equal-to:"Nikos"'
         expr = self._run_visitor('conjunction')
@@ -334,6 +354,11 @@ class SqlFilterSpecificationVisitorTestCase(FilterVisitorTestCase):
         expr = self._run_visitor('in-range')
         self.assert_equal(str(expr), str(expected_expr))
 
+    def test_visit_value_in_set(self):
+        expected_expr = Person.age.in_([34, 44])
+        expr = self._run_visitor('in-set')
+        self.assert_equal(str(expr), str(expected_expr))
+
     def test_visit_Conjunction(self):
         expected_expr = sa.and_(Person.age > 34, Person.name == 'Nikos')
         expr = self._run_visitor('conjunction')
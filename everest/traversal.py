@@ -18,21 +18,31 @@ from everest.interfaces import IDataTraversalProxyAdapter
 from everest.interfaces import IDataTraversalProxyFactory
 from everest.resources.interfaces import IResource
 from everest.traversalpath import TraversalPath
+from logging import DEBUG
 from logging import getLogger as get_logger
+from pyramid.compat import iteritems_
 from pyramid.compat import itervalues_
 from pyramid.threadlocal import get_current_registry
 from pyramid.traversal import ResourceTreeTraverser
+from threading import Lock
+from threading import local
+from timeit import default_timer
 from zope.interface import implementer # pylint: disable=E0611,F0401
+from zope.interface import providedBy as provided_by # pylint: disable=E0611,F0401
 #from everest.resources.staging import create_staging_collection
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['ConvertingDataTraversalProxyMixin',
+           'CountingTraversalHook',
            'DataSequenceTraversalProxy',
            'DataTraversalProxy',
            'DataTraversalProxyAdapter',
            'DataTraversalProxyFactory',
+           'LoggingTraversalHook',
            'SourceTargetDataTreeTraverser',
            'SuffixResourceTraverser',
+           'TraversalHook',
+           'run_traversal',
            ]
 
 
@@ -86,9 +96,19 @@ class DataTraversalProxy(object):
     By providing a uniform interface to the nodes of data trees
     encountered during tree traversal, this proxy makes it possible to use
     different data structures as source or target for the traversal.
+
+    Proxies are created for every node in a traversed data tree; to keep
+    them lightweight, they use slots and look up the relationship
+    attributes of the proxied data type only once (see
+    :meth:`_get_attribute_cache_key`).
     """
+    __slots__ = ('relationship_direction', '_data', '_accessor',
+                 '_relationships', '__node_key')
     #: Constant indicating that this proxy is for member resource data.
     proxy_for = RESOURCE_KINDS.MEMBER
+    #: Cache for relationship attribute lists. Maps (proxy class, attribute
+    #: cache key) tuples to tuples of attributes.
+    __relationship_attributes = {}
 
     def __init__(self, data, accessor, relationship_direction):
         """
@@ -101,18 +121,59 @@ class DataTraversalProxy(object):
         self._data = data
         self._accessor = accessor
         self._relationships = {}
+        self.__node_key = None
 
-    def get_relationship_attributes(self):
+    def get_relationship_attributes(self, relation_operation=None):
         """
         Returns an iterator over the relationship attributes (i.e.,
         non-terminal attributes) of the proxied data.
 
+        :param str relation_operation: If this is given, only attributes
+          that cascade this relation operation are returned. One of the
+          constants defined in :class:`everest.constants.RELATION_OPERATIONS`.
         :returns: iterator yielding objects implementing
           :class:`everest.resources.interfaces.IResourceAttribute`.
         """
-        for attr in self._attribute_iterator():
-            if not is_terminal_attribute(attr):
-                yield attr
+        cache_key = self._get_attribute_cache_key()
+        if cache_key is None:
+            attrs = self.__iter_relationship_attributes()
+        else:
+            key = (type(self), cache_key)
+            attrs = self.__relationship_attributes.get(key)
+            if attrs is None:
+                attrs = tuple(self.__iter_relationship_attributes())
+                self.__relationship_attributes[key] = attrs
+        if relation_operation is None:
+            result = iter(attrs)
+        else:
+            # The cascade settings are checked on every call as they may
+            # be changed at runtime.
+            result = (attr for attr in attrs
+                      if bool(attr.cascade & relation_operation))
+        return result
+
+    def has_relationship_data(self, relation_operation):
+        """
+        Checks if the proxied data have non-empty values for any of the
+        relationship attributes that cascade the given relation operation.
+
+        :param str relation_operation: Relation operation. One of the
+          constants defined in :class:`everest.constants.RELATION_OPERATIONS`.
+        """
+        for attr in self.get_relationship_attributes(relation_operation):
+            try:
+                attr_val = self._get_relation_attribute_value(attr)
+            except AttributeError:
+                continue
+            if attr_val is None:
+                continue
+            card = get_attribute_cardinality(attr)
+            if card == CARDINALITY_CONSTANTS.MANY \
+               and isinstance(attr_val, (list, set, tuple)) \
+               and len(attr_val) == 0:
+                continue
+            return True
+        return False
 
     def get_matching(self, source_id):
         """
@@ -120,15 +181,33 @@ class DataTraversalProxy(object):
         """
         value = self._accessor.get_by_id(source_id)
         if not value is None:
-            reg = get_current_registry()
-            prx_fac = reg.getUtility(IDataTraversalProxyFactory)
-            prx = prx_fac.make_proxy(value,
-                                     self._accessor,
-                                     self.relationship_direction)
+            prx = self.make_matching(value)
         else:
             prx = None
         return prx
 
+    def get_matching_values(self, source_ids):
+        """
+        Looks up the matching target values for the given source IDs in one
+        batch.
+
+        :returns: Dictionary mapping source IDs to target values. IDs
+          without a matching target value are not included.
+        """
+        return dict((value.id, value)
+                    for value in self._accessor.get_by_ids(source_ids))
+
+    def make_matching(self, value):
+        """
+        Returns a proxy for the given matching target value (as returned by
+        :meth:`get_matching_values`).
+        """
+        reg = get_current_registry()
+        prx_fac = reg.getUtility(IDataTraversalProxyFactory)
+        return prx_fac.make_proxy(value,
+                                  self._accessor,
+                                  self.relationship_direction)
+
     @property
     def update_attribute_value_items(self):
         """
@@ -225,6 +304,22 @@ class DataTraversalProxy(object):
         """
         raise NotImplementedError('Abstract method.')
 
+    @property
+    def node_key(self):
+        """
+        Returns a hashable key identifying the proxied data node. This is
+        built from the entity type and the ID of the proxied data or, if the
+        ID is None, from the runtime object ID. The key is computed only
+        once.
+        """
+        if self.__node_key is None:
+            data_id = self.get_id()
+            if data_id is None:
+                self.__node_key = (None, id(self._data))
+            else:
+                self.__node_key = (self._get_entity_type(), data_id)
+        return self.__node_key
+
     def _get_entity_type(self):
         """
         Returns the entity type of the proxied data.
@@ -248,6 +343,16 @@ class DataTraversalProxy(object):
         """
         raise NotImplementedError('Abstract method.')
 
+    def _get_attribute_cache_key(self):
+        """
+        Returns a hashable key under which the relationship attributes of
+        the proxied data can be cached or `None`, if they should not be
+        cached. This default implementation returns `None`; subclasses
+        where the proxied attributes only depend on the type of the
+        proxied data should return the data type.
+        """
+        return None
+
     def _get_relation_attribute_value(self, attribute):
         """
         Returns the value for the given relation attribute from the proxied
@@ -274,18 +379,19 @@ class DataTraversalProxy(object):
         """
         raise NotImplementedError('Abstract method.')
 
+    def __iter_relationship_attributes(self):
+        for attr in self._attribute_iterator():
+            if not is_terminal_attribute(attr):
+                yield attr
+
     def __str__(self):
         return "%s(id=%s)" % (self._data.__class__.__name__, self.get_id())
 
     def __hash__(self):
         """
-        The hash value is built either from the ID and the entity type of
-        the proxied data or, if the ID is None, from the runtime object
-        ID.
+        The hash value is built from the node key (see :attr:`node_key`).
         """
-        data_id = self.get_id()
-        return data_id is None and id(self._data) \
-               or hash((self._get_entity_type(), data_id))
+        return hash(self.node_key)
 
     def __eq__(self, other):
         """
@@ -298,7 +404,15 @@ class DataTraversalProxy(object):
 class DataTraversalProxyFactory(object):
     """
     Factory for data traversal proxies.
+
+    The data traversal proxy adapters are looked up once for each set of
+    interfaces provided by the data (so data objects which directly provide
+    interfaces are adapted correctly).
     """
+    def __init__(self):
+        # Map provided interface specification -> adapter factory (or None).
+        self.__adapter_factories = {}
+
     def make_source_proxy(self, data, options=None):
         """
         Returns a data traversal proxy for the given source data.
@@ -347,8 +461,7 @@ class DataTraversalProxyFactory(object):
         # We first check if we have a registered adapter for the given data;
         # if not, we assume it is a mutable sequence or set; if that fails,
         # we raise a ValueError.
-        reg = get_current_registry()
-        adp = reg.queryAdapter(data, IDataTraversalProxyAdapter)
+        adp = self.__get_adapter(data)
         if not adp is None:
             prx = getattr(adp, method_name)(*args, **options)
         else:
@@ -359,7 +472,7 @@ class DataTraversalProxyFactory(object):
             else:
                 prxs = []
                 for item in data:
-                    adp = reg.queryAdapter(item, IDataTraversalProxyAdapter)
+                    adp = self.__get_adapter(item)
                     if adp is None:
                         raise ValueError('Invalid data type for traversal: '
                                          '%s.' % type(item))
@@ -368,6 +481,21 @@ class DataTraversalProxyFactory(object):
                 prx = DataSequenceTraversalProxy(prxs)
         return prx
 
+    def __get_adapter(self, data):
+        provided = provided_by(data)
+        try:
+            adp_fac = self.__adapter_factories[provided]
+        except KeyError:
+            reg = get_current_registry()
+            adp_fac = reg.adapters.lookup((provided,),
+                                          IDataTraversalProxyAdapter)
+            self.__adapter_factories[provided] = adp_fac
+        if not adp_fac is None:
+            adp = adp_fac(data)
+        else:
+            adp = None
+        return adp
+
 
 @implementer(IDataTraversalProxyAdapter)
 class DataTraversalProxyAdapter(object):
@@ -432,6 +560,139 @@ class ConvertingDataTraversalProxyMixin(object):
         raise NotImplementedError('Abstract method.')
 
 
+class TraversalHook(object):
+    """
+    Base class for traversal instrumentation hooks.
+
+    Hooks are installed with :meth:`SourceTargetDataTreeTraverser.add_hook`
+    and are notified when a traversal starts and finishes and when a node
+    is entered and exited. The default implementations do nothing.
+    """
+    def start_run(self, source, target, visitor):
+        """
+        Called when a traversal of the given source and target root proxies
+        with the given visitor starts.
+        """
+
+    def finish_run(self, source, target, visitor):
+        """
+        Called when a traversal of the given source and target root proxies
+        with the given visitor has finished. This is also called if the
+        traversal raised an exception.
+        """
+
+    def enter_node(self, path, attribute, source, target):
+        """
+        Called before the child nodes of the given source/target node pair
+        are traversed.
+
+        :param path: Current traversal path.
+        :type path: :class:`everest.traversalpath.TraversalPath`
+        :param attribute: Resource attribute of the node or `None` for the
+          root node.
+        """
+
+    def exit_node(self, path, attribute, source, target):
+        """
+        Called after the given source/target node pair has been visited.
+        """
+
+
+class CountingTraversalHook(TraversalHook):
+    """
+    Traversal hook collecting node counts and timings.
+
+    The hook may be shared by traversals running in several threads; the
+    counters are updated while holding a lock and the start times are
+    kept per thread.
+    """
+    def __init__(self):
+        TraversalHook.__init__(self)
+        self.__lock = Lock()
+        #: Number of traversals run.
+        self.run_count = 0
+        #: Total number of nodes traversed.
+        self.node_count = 0
+        #: Number of nodes traversed per relation operation.
+        self.operation_counts = dict.fromkeys((RELATION_OPERATIONS.ADD,
+                                               RELATION_OPERATIONS.REMOVE,
+                                               RELATION_OPERATIONS.UPDATE),
+                                              0)
+        #: Maximum traversal path length encountered.
+        self.max_depth = 0
+        #: Total time spent in traversals (in seconds).
+        self.total_time = 0.0
+        self.__local = local()
+
+    def start_run(self, source, target, visitor):
+        with self.__lock:
+            self.run_count += 1
+        self.__get_start_times().append(default_timer())
+
+    def finish_run(self, source, target, visitor):
+        elapsed = default_timer() - self.__get_start_times().pop()
+        with self.__lock:
+            self.total_time += elapsed
+
+    def enter_node(self, path, attribute, source, target):
+        op = RELATION_OPERATIONS.check(source, target)
+        with self.__lock:
+            self.node_count += 1
+            self.operation_counts[op] += 1
+            self.max_depth = max(self.max_depth, len(path))
+
+    def reset(self):
+        """
+        Resets all counters and timings.
+        """
+        self.__init__()
+
+    def __get_start_times(self):
+        # Nested traversals push their start times on this stack.
+        start_times = getattr(self.__local, 'start_times', None)
+        if start_times is None:
+            start_times = self.__local.start_times = []
+        return start_times
+
+
+class LoggingTraversalHook(TraversalHook):
+    """
+    Traversal hook writing a debug log of the traversed nodes.
+
+    Nothing is formatted unless the logger is enabled for the DEBUG level.
+    """
+    def __init__(self, logger=None):
+        TraversalHook.__init__(self)
+        if logger is None:
+            logger = get_logger('everest.traversal')
+        self.__logger = logger
+
+    def start_run(self, source, target, visitor):
+        if self.__logger.isEnabledFor(DEBUG):
+            self.__logger.debug('Traversing %s->%s with %s',
+                                source, target, visitor)
+
+    def enter_node(self, path, attribute, source, target):
+        if not self.__logger.isEnabledFor(DEBUG):
+            return
+        if target is None:
+            mode = 'ADD'
+            data = '%s,None' % source
+        elif source is None:
+            mode = 'REMOVE'
+            data = 'None,%s' % target
+        else:
+            mode = 'UPDATE'
+            data = '%s,%s' % (source, target)
+        if not attribute is None:
+            parent = "(%s)" % path.parent
+            self.__logger.debug('%s%s %s.%s (%s)' %
+                                ("  "*len(path), mode, parent,
+                                 attribute.resource_attr, data))
+        else:
+            self.__logger.debug('%s ROOT (%s)' % (mode, data))
+
+
 class SourceTargetDataTreeTraverser(object):
     """
     Traverser for synchronous traversal of a source and a target data tree.
@@ -455,25 +716,93 @@ class SourceTargetDataTreeTraverser(object):
     When traversing along the REMOVE cascade, a child node of a node that is
     being removed is also removed if it has an ID (i.e., the "id" attribute
     is not None).
+
+    By default, the traversal uses an explicit stack (see
+    :func:`run_traversal`) and is therefore not limited in depth by the
+    Python recursion limit.
+
+    Traversals can be instrumented with :class:`TraversalHook` instances
+    installed with :meth:`add_hook`; without hooks, no instrumentation code
+    is run.
     """
-    def __init__(self, source_proxy, target_proxy):
+    #: Installed traversal hooks.
+    __hooks = ()
+
+    def __init__(self, source_proxy, target_proxy, iterative=True):
+        """
+        :param bool iterative: Flag indicating if the traversal should be
+          run with an explicit stack rather than recursively.
+        """
         self._src_prx = source_proxy
         self._tgt_prx = target_proxy
+        self.__iterative = iterative
         self.__trv_path = TraversalPath()
+        # Map (attribute type, source ID) -> matching target value for
+        # target values prefetched by :meth:`traverse_many`.
+        self.__matching_values = {}
         self.__root_is_sequence = \
             (not source_proxy is None and
              source_proxy.proxy_for == RESOURCE_KINDS.COLLECTION) \
             or (not target_proxy is None and
                 target_proxy.proxy_for == RESOURCE_KINDS.COLLECTION)
-        if __debug__:
-            self.__logger = get_logger('everest.traversal')
+        self.__hooks = SourceTargetDataTreeTraverser.__hooks
+
+    @classmethod
+    def add_hook(cls, hook):
+        """
+        Installs the given traversal hook for all traversers created
+        subsequently. Installing a hook that is already installed has no
+        effect.
+
+        :param hook: Traversal hook.
+        :type hook: :class:`TraversalHook`
+        """
+        hooks = SourceTargetDataTreeTraverser.__hooks
+        if not hook in hooks:
+            SourceTargetDataTreeTraverser.__hooks = hooks + (hook,)
+
+    @classmethod
+    def remove_hook(cls, hook):
+        """
+        Removes the given traversal hook.
+        """
+        SourceTargetDataTreeTraverser.__hooks = \
+            tuple([hk for hk in SourceTargetDataTreeTraverser.__hooks
+                   if not hk is hook])
+
+    def get_flat_add_entities(self):
+        """
+        Returns the entities for the source data of this ADD traversal
+        if none of the source data items have relationship data to traverse
+        (i.e., the data form a "flat" tree of new items).
+
+        This allows callers to bypass running the traversal when adding
+        large numbers of flat data items.
+
+        :returns: List of entities or `None`, if the source data contain
+          relationship data.
+        """
+        if self._src_prx is None or not self._tgt_prx is None:
+            raise ValueError('Flat entities are only available for ADD '
+                             'traversals.')
+        if self.__root_is_sequence:
+            source_proxies = self._src_prx
         else:
-            self.__logger = None
+            source_proxies = [self._src_prx]
+        entities = []
+        for prx in source_proxies:
+            if prx.do_traverse() \
+               and prx.has_relationship_data(RELATION_OPERATIONS.ADD):
+                entities = None
+                break
+            entities.append(prx.get_entity())
+        return entities
 
     @classmethod
     def make_traverser(cls, source_data, target_data, relation_operation,
                        accessor=None, manage_back_references=True,
-                       source_proxy_options=None, target_proxy_options=None):
+                       source_proxy_options=None, target_proxy_options=None,
+                       iterative=True):
         """
         Factory method to create a tree traverser depending on the input
         source and target data combination.
@@ -485,6 +814,7 @@ class SourceTargetDataTreeTraverser(object):
         :param accessor: Accessor for looking up target nodes for update
           operations.
         :param bool manage_back_references: Flag passed to the target proxy.
+        :param bool iterative: Flag passed to the traverser.
         """
         reg = get_current_registry()
         prx_fac = reg.getUtility(IDataTraversalProxyFactory)
@@ -531,16 +861,13 @@ class SourceTargetDataTreeTraverser(object):
                         raise ValueError('Entity with ID %s to update not '
                                          'found.' % source_id)
                 else:
-                    # Look up collection of targets to update.
-                    target_root = []
-                    for src_prx in source_proxy:
-                        tgt_ent_id = src_prx.get_id()
-                        if tgt_ent_id is None:
-                            continue
-                        tgt_ent = accessor.get_by_id(tgt_ent_id)
-                        if tgt_ent is None:
-                            continue
-                        target_root.append(tgt_ent)
+                    # Look up collection of targets to update in one batch.
+                    tgt_ent_ids = [src_prx.get_id()
+                                   for src_prx in source_proxy]
+                    target_root = accessor.get_by_ids(
+                                            [tgt_ent_id
+                                             for tgt_ent_id in tgt_ent_ids
+                                             if not tgt_ent_id is None])
                 target_proxy = prx_fac.make_target_proxy(
                                             target_root,
                                             accessor,
@@ -559,7 +886,7 @@ class SourceTargetDataTreeTraverser(object):
                 raise ValueError('When both source and target root nodes are '
                                  'given, they can either both be sequences '
                                  'or both not be sequences.')
-        return cls(source_proxy, target_proxy)
+        return cls(source_proxy, target_proxy, iterative=iterative)
 
     def run(self, visitor):
         """
@@ -567,22 +894,31 @@ class SourceTargetDataTreeTraverser(object):
         :type visitor: subclass of
             :class:`everest.entities.traversal.DomainVisitor`
         """
-        if __debug__:
-            self.__log_run(visitor)
-        visitor.prepare()
-        if self.__root_is_sequence:
-            if not self._tgt_prx is None:
-                tgts = iter(self._tgt_prx)
-            else:
-                tgts = None
-            if not self._src_prx is None:
-                srcs = iter(self._src_prx)
+        # The hooks which were started are finished even if the traversal
+        # raises an exception.
+        started_hooks = []
+        try:
+            for hook in self.__hooks:
+                hook.start_run(self._src_prx, self._tgt_prx, visitor)
+                started_hooks.append(hook)
+            visitor.prepare()
+            if self.__root_is_sequence:
+                if not self._tgt_prx is None:
+                    tgts = iter(self._tgt_prx)
+                else:
+                    tgts = None
+                if not self._src_prx is None:
+                    srcs = iter(self._src_prx)
+                else:
+                    srcs = None
+                self.traverse_many(None, srcs, tgts, visitor)
             else:
-                srcs = None
-            self.traverse_many(None, srcs, tgts, visitor)
-        else:
-            self.traverse_one(None, self._src_prx, self._tgt_prx, visitor)
-        visitor.finalize()
+                self.traverse_one(None, self._src_prx, self._tgt_prx,
+                                  visitor)
+            visitor.finalize()
+        finally:
+            for hook in started_hooks:
+                hook.finish_run(self._src_prx, self._tgt_prx, visitor)
 
     def traverse_one(self, attribute, source, target, visitor):
         """
@@ -591,15 +927,50 @@ class SourceTargetDataTreeTraverser(object):
         :param target: target data proxy
         :type target: instance of `DataTraversalProxy` or None
         """
-        if __debug__:
-            self.__log_traverse_one(self.__trv_path, attribute, source, target)
+        run_traversal(self.__traverse_one(attribute, source, target,
+                                          visitor),
+                      iterative=self.__iterative)
+
+    def traverse_many(self, attribute, source_sequence, target_sequence,
+                      visitor):
+        """
+        Traverses the given source and target sequences and makes appropriate
+        calls to :method:`traverse_one`.
+
+        Algorithm:
+        1) Build a map target item ID -> target data item from the target
+           sequence;
+        2) For each source data item in the source sequence check if it
+           has a not-None ID; if yes, remove the corresponding target from the
+           map generated in step 1) and use as target data item for the
+           source data item; if no, use `None` as target data item;
+        3) For the remaining items in the target map from 1), call
+           :method:`traverse_one` passing `None` as source (REMOVE);
+        4) For all source/target data item pairs generated in 2, call
+           :method:`traverse_one` (ADD or UPDATE depending on whether target
+           item is `None`).
+
+        :param source_sequence: iterable of source data proxies
+        :type source_sequence: iterator yielding instances of
+                               `DataTraversalProxy` or None
+        :param target_sequence: iterable of target data proxies
+        :type target_sequence: iterator yielding instances of
+                               `DataTraversalProxy` or None
+        """
+        run_traversal(self.__traverse_many(attribute, source_sequence,
+                                           target_sequence, visitor),
+                      iterative=self.__iterative)
+
+    def __traverse_one(self, attribute, source, target, visitor):
+        hooks = self.__hooks
+        if hooks:
+            for hook in hooks:
+                hook.enter_node(self.__trv_path, attribute, source, target)
         prx = source or target
         if prx.do_traverse():
             rel_op = RELATION_OPERATIONS.check(source, target)
-            for attr in prx.get_relationship_attributes():
-                # Check cascade settings.
-                if not bool(attr.cascade & rel_op):
-                    continue
+            # Only attributes with matching cascade settings are traversed.
+            for attr in prx.get_relationship_attributes(rel_op):
                 if not source is None:
                     try:
                         attr_source = source.get_attribute_proxy(attr)
@@ -648,43 +1019,26 @@ class SourceTargetDataTreeTraverser(object):
                             if not src_id is None:
                                 # If the source ID is None, this is a replace
                                 # operation (ADD source, REMOVE target).
-                                src_target = attr_target.get_matching(src_id)
+                                src_target = self.__get_matching(
+                                                    attr, attr_target, src_id)
                                 if not src_target is None:
                                     tgt_items.append(src_target)
                 else:
                     src_items = attr_source
                     tgt_items = attr_target
-                self.__trv_path.push(parent, (source, target), attr, rel_op)
-                self.traverse_many(attr, src_items, tgt_items, visitor)
+                self.__trv_path.push(parent,
+                                     self.__make_path_key(source, target),
+                                     attr, rel_op)
+                yield self.__traverse_many(attr, src_items, tgt_items,
+                                           visitor)
                 self.__trv_path.pop() # path.pop()
         visitor.visit(self.__trv_path, attribute, source, target)
+        if hooks:
+            for hook in hooks:
+                hook.exit_node(self.__trv_path, attribute, source, target)
 
-    def traverse_many(self, attribute, source_sequence, target_sequence,
-                      visitor):
-        """
-        Traverses the given source and target sequences and makes appropriate
-        calls to :method:`traverse_one`.
-
-        Algorithm:
-        1) Build a map target item ID -> target data item from the target
-           sequence;
-        2) For each source data item in the source sequence check if it
-           has a not-None ID; if yes, remove the corresponding target from the
-           map generated in step 1) and use as target data item for the
-           source data item; if no, use `None` as target data item;
-        3) For the remaining items in the target map from 1), call
-           :method:`traverse_one` passing `None` as source (REMOVE);
-        4) For all source/target data item pairs generated in 2, call
-           :method:`traverse_one` (ADD or UPDATE depending on whether target
-           item is `None`).
-
-        :param source_sequence: iterable of source data proxies
-        :type source_sequence: iterator yielding instances of
-                               `DataTraversalProxy` or None
-        :param target_sequence: iterable of target data proxies
-        :type target_sequence: iterator yielding instances of
-                               `DataTraversalProxy` or None
-        """
+    def __traverse_many(self, attribute, source_sequence, target_sequence,
+                        visitor):
         target_map = {}
         if not target_sequence is None:
             for target in target_sequence:
@@ -700,34 +1054,102 @@ class SourceTargetDataTreeTraverser(object):
                     # Source is new, there is no target, so ADD.
                     target = None
                 src_tgt_pairs.append((source, target))
+        if len(src_tgt_pairs) > 1:
+            self.__prefetch_matching_values(src_tgt_pairs)
         # All targets that are now still in the map where not present in the
         # source and therefore need to be REMOVEd.
         for target in itervalues_(target_map):
-            if not (None, target) in self.__trv_path:
-                self.traverse_one(attribute, None, target, visitor)
+            if not self.__make_path_key(None, target) in self.__trv_path:
+                yield self.__traverse_one(attribute, None, target, visitor)
         #
         for source, target in src_tgt_pairs:
-            if not (source, target) in self.__trv_path:
-                self.traverse_one(attribute, source, target, visitor)
-
-    def __log_run(self, visitor):
-        self.__logger.debug('Traversing %s->%s with %s'
-                            % (self._src_prx, self._tgt_prx, visitor))
-
-    def __log_traverse_one(self, path, attribute, source, target):
-        if target is None:
-            mode = 'ADD'
-            data = '%s,None' % source
-        elif source is None:
-            mode = 'REMOVE'
-            data = 'None,%s' % target
+            if not self.__make_path_key(source, target) in self.__trv_path:
+                yield self.__traverse_one(attribute, source, target, visitor)
+
+    def __prefetch_matching_values(self, src_tgt_pairs):
+        # For UPDATE pairs, the target items matching changed source items
+        # referenced through attributes of cardinality ONE are looked up
+        # (see :meth:`traverse_one`). We collect the source IDs of all
+        # these lookups and perform them with one call per attribute.
+        lookups = {}
+        for source, target in src_tgt_pairs:
+            if source is None or target is None or not source.do_traverse():
+                continue
+            for attr in source.get_relationship_attributes(
+                                                RELATION_OPERATIONS.UPDATE):
+                if get_attribute_cardinality(attr) \
+                                        != CARDINALITY_CONSTANTS.ONE:
+                    continue
+                try:
+                    attr_source = source.get_attribute_proxy(attr)
+                except AttributeError:
+                    continue
+                if attr_source is None:
+                    continue
+                attr_target = target.get_attribute_proxy(attr)
+                if attr_target is None:
+                    continue
+                src_id = attr_source.get_id()
+                if src_id is None or src_id == attr_target.get_id() \
+                   or (attr.attr_type, src_id) in self.__matching_values:
+                    continue
+                tgt_prx, src_ids = lookups.setdefault(attr.attr_type,
+                                                      (attr_target, set()))
+                src_ids.add(src_id)
+        for attr_type, (tgt_prx, src_ids) in iteritems_(lookups):
+            values = tgt_prx.get_matching_values(list(src_ids))
+            for src_id in src_ids:
+                self.__matching_values[(attr_type, src_id)] = \
+                                                    values.get(src_id)
+
+    @staticmethod
+    def __make_path_key(source, target):
+        # The path is keyed on the node keys of the source and the target.
+        if not source is None:
+            src_key = source.node_key
         else:
-            mode = 'UPDATE'
-            data = '%s,%s' % (source, target)
-        if not attribute is None:
-            parent = "(%s)" % path.parent
-            self.__logger.debug('%s%s %s.%s (%s)' %
-                                ("  "*len(path), mode, parent,
-                                 attribute.resource_attr, data))
+            src_key = None
+        if not target is None:
+            tgt_key = target.node_key
         else:
-            self.__logger.debug('%s ROOT (%s)' % (mode, data))
+            tgt_key = None
+        return (src_key, tgt_key)
+
+    def __get_matching(self, attribute, target, source_id):
+        key = (attribute.attr_type, source_id)
+        if key in self.__matching_values:
+            value = self.__matching_values[key]
+            if not value is None:
+                prx = target.make_matching(value)
+            else:
+                prx = None
+        else:
+            prx = target.get_matching(source_id)
+        return prx
+
+
+def run_traversal(traversal, iterative=True):
+    """
+    Runs the given traversal generator to completion.
+
+    A traversal generator yields the traversal generators for the child
+    nodes of its node; each of these has to be run to completion before the
+    parent generator is resumed (which allows the parent to visit its node
+    after all its children were visited).
+
+    :param traversal: Traversal generator to run.
+    :param bool iterative: If this is set, the generators are run with an
+      explicit stack; otherwise, they are run recursively.
+    """
+    if iterative:
+        stack = [traversal]
+        while stack:
+            try:
+                child = next(stack[-1])
+            except StopIteration:
+                stack.pop()
+            else:
+                stack.append(child)
+    else:
+        for child in traversal:
+            run_traversal(child, iterative=False)
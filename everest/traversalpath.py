@@ -32,34 +32,47 @@ class TraversalPathNode(object):
 class TraversalPath(object):
     """
     Value object tracking a path taken by a data tree traverser.
+
+    The keys of the nodes on the path are tracked in a hash map alongside
+    the node list so that checking if a key is on the path (e.g., to detect
+    cycles) takes constant time.
     """
     def __init__(self, nodes=None):
         if nodes is None:
             nodes = []
         self.nodes = nodes
-        self.__keys = set()
+        # Map node key -> number of nodes on the path with this key.
+        self.__key_counts = {}
+        for node in nodes:
+            self.__add_key(node.key)
 
     def push(self, proxy, key, attribute, relation_operation):
         """
         Adds a new :class:`TraversalPathNode` constructed from the given
         arguments to this traversal path.
+
+        :param key: Hashable key for the new node.
         """
         node = TraversalPathNode(proxy, key, attribute, relation_operation)
         self.nodes.append(node)
-        self.__keys.add(key)
+        self.__add_key(key)
 
     def pop(self):
         """
         Removes the last traversal path node from this traversal path.
         """
         node = self.nodes.pop()
-        self.__keys.remove(node.key)
+        cnt = self.__key_counts[node.key]
+        if cnt == 1:
+            del self.__key_counts[node.key]
+        else:
+            self.__key_counts[node.key] = cnt - 1
 
     def __len__(self):
         return len(self.nodes)
 
     def __contains__(self, key):
-        return key in self.__keys
+        return key in self.__key_counts
 
     @property
     def parent(self):
@@ -84,3 +97,6 @@ class TraversalPath(object):
         else:
             rel_op = None
         return rel_op
+
+    def __add_key(self, key):
+        self.__key_counts[key] = self.__key_counts.get(key, 0) + 1
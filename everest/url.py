@@ -11,6 +11,7 @@ from everest.interfaces import IResourceUrlConverter
 from everest.querying.base import EXPRESSION_KINDS
 from everest.querying.filterparser import parse_filter
 from everest.querying.orderparser import parse_order
+from everest.querying.ordering import Keyset
 from everest.resources.interfaces import ICollectionResource
 from everest.resources.interfaces import IMemberResource
 from everest.resources.interfaces import IResource
@@ -20,18 +21,30 @@ from everest.utils import get_order_specification_visitor
 from pyparsing import ParseException
 from pyramid.compat import url_unquote
 from pyramid.compat import urlparse
+from pyramid.encode import urlencode
 from pyramid.traversal import find_resource
+from pyramid.traversal import quote_path_segment
 from pyramid.traversal import traversal_path
 from zope.interface import implementer # pylint: disable=E0611,F0401
 from zope.interface import providedBy as provided_by # pylint: disable=E0611,F0401
 from everest.querying.refsparser import parse_refs
+from iso8601.iso8601 import ParseError
+from iso8601.iso8601 import parse_date
+import base64
+import datetime
+import json
 
 __docformat__ = 'reStructuredText en'
 __all__ = ['ResourceUrlConverter',
+           'URL_CACHE_ATTRIBUTE',
            'UrlPartsConverter',
            ]
 
 
+#: Name of the request attribute holding the per-request URL cache.
+URL_CACHE_ATTRIBUTE = '_everest_url_cache'
+
+
 @implementer(IResourceUrlConverter)
 class ResourceUrlConverter(object):
     """
@@ -44,6 +57,9 @@ class ResourceUrlConverter(object):
     def __init__(self, request):
         # The request is needed for access to app URL, registry, traversal.
         self.__request = request
+        # Converters are created on demand for each URL conversion; the URL
+        # cache is therefore stored with the request.
+        self.__cache = _ResourceUrlCache.for_request(request)
 
     def url_to_resource(self, url):
         """
@@ -72,7 +88,11 @@ class ResourceUrlConverter(object):
                     UrlPartsConverter.make_order_specification(order_string)
             start_string = params.get('start')
             size_string = params.get('size')
-            if not (start_string is None or size_string is None):
+            cursor_string = params.get('cursor')
+            if not (cursor_string is None or size_string is None):
+                rc.keyset = UrlPartsConverter.make_keyset(cursor_string)
+                rc.slice = UrlPartsConverter.make_slice_key('0', size_string)
+            elif not (start_string is None or size_string is None):
                 rc.slice = \
                   UrlPartsConverter.make_slice_key(start_string, size_string)
         elif not IMemberResource in provided_by(rc):
@@ -103,41 +123,99 @@ class ResourceUrlConverter(object):
             if not resource.order is None:
                 query['sort'] = \
                     UrlPartsConverter.make_order_string(resource.order)
-            if not resource.slice is None:
+            if not resource.keyset is None:
+                query['cursor'] = \
+                    UrlPartsConverter.make_keyset_string(resource.keyset)
+                query['size'] = \
+                    UrlPartsConverter.make_slice_strings(resource.slice)[1]
+            elif not resource.slice is None:
                 query['start'], query['size'] = \
                     UrlPartsConverter.make_slice_strings(resource.slice)
-            if query != {}:
-                options = dict(query=query)
-            else:
-                options = dict()
             if not resource.is_root_collection:
                 # For nested collections, we check if the referenced root
                 # collection is exposed (i.e., has the service as parent).
                 # If yes, we return an absolute URL, else a nested URL.
-                root_coll = get_root_collection(resource)
-                if not root_coll.has_parent:
-                    url = self.__request.resource_url(resource, **options)
-                else:
-                    url = self.__request.resource_url(root_coll, **options)
+                url = self.__get_root_collection_url(resource)
+                if url is None:
+                    url = self.__request.resource_url(resource)
             else:
-                url = self.__request.resource_url(resource, **options)
+                url = self.__get_collection_url(resource)
+            if query != {}:
+                url = '%s?%s' % (url, urlencode(query))
         else:
             if not resource.is_root_member:
                 # For nested members, we check if the referenced root
                 # collection is exposed (i.e., has the service as parent).
                 # If yes, we return an absolute URL, else a nested URL.
-                root_coll = get_root_collection(resource)
-                if not root_coll.has_parent:
+                par_url = self.__get_root_collection_url(resource)
+                if par_url is None:
                     par_url = self.__request.resource_url(resource)
-                else:
-                    par_url = self.__request.resource_url(root_coll)
                 url = "%s%s/" % (par_url, resource.__name__)
             else:
-                url = self.__request.resource_url(resource)
+                # Member URLs are composed from the (cached) URL of the
+                # parent collection and the quoted member name.
+                url = "%s%s/" % \
+                        (self.__get_collection_url(resource.__parent__),
+                         quote_path_segment(resource.__name__))
         if not quote:
             url = url_unquote(url)
         return url
 
+    def __get_collection_url(self, collection):
+        # Returns the quoted URL (without query string) for the given root
+        # collection. The URL only depends on the collection's name and
+        # parent, so we cache it per collection class.
+        coll_cls = type(collection)
+        entry = self.__cache.collection_urls.get(coll_cls)
+        if entry is None or not entry[0] is collection.__parent__ \
+           or entry[1] != collection.__name__:
+            entry = (collection.__parent__, collection.__name__,
+                     self.__request.resource_url(collection))
+            self.__cache.collection_urls[coll_cls] = entry
+        return entry[2]
+
+    def __get_root_collection_url(self, resource):
+        # Returns the quoted URL of the root collection for the given nested
+        # resource or None if the root collection is not exposed. The root
+        # collection lookup is cached per resource class.
+        rc_cls = type(resource)
+        try:
+            url = self.__cache.root_collection_urls[rc_cls]
+        except KeyError:
+            root_coll = get_root_collection(resource)
+            if root_coll.has_parent:
+                url = self.__get_collection_url(root_coll)
+            else:
+                url = None
+            self.__cache.root_collection_urls[rc_cls] = url
+        return url
+
+
+class _ResourceUrlCache(object):
+    """
+    Per-request cache for resource URL generation.
+    """
+    __slots__ = ('collection_urls', 'root_collection_urls')
+
+    def __init__(self):
+        #: Maps root collection classes to (parent, name, URL) tuples.
+        self.collection_urls = {}
+        #: Maps nested resource classes to the URL of their root collection
+        #: (or None if the root collection is not exposed).
+        self.root_collection_urls = {}
+
+    @classmethod
+    def for_request(cls, request):
+        """
+        Returns the URL cache for the given request, creating it on first
+        access.
+        """
+        cache = getattr(request, URL_CACHE_ATTRIBUTE, None)
+        if cache is None:
+            cache = cls()
+            setattr(request, URL_CACHE_ATTRIBUTE, cache)
+        return cache
+
 
 class UrlPartsConverter(object):
     """
@@ -158,11 +236,22 @@ class UrlPartsConverter(object):
     def make_filter_string(cls, filter_specification):
         """
         Converts the given filter specification to a CQL filter expression.
+
+        The result is memoized on the specification unless it contains
+        resource values.
         """
-        visitor_cls = get_filter_specification_visitor(EXPRESSION_KINDS.CQL)
-        visitor = visitor_cls()
-        filter_specification.accept(visitor)
-        return str(visitor.expression)
+        cql_string = filter_specification.cql_string
+        if cql_string is None:
+            visitor_cls = \
+                    get_filter_specification_visitor(EXPRESSION_KINDS.CQL)
+            visitor = visitor_cls()
+            filter_specification.accept(visitor)
+            cql_string = str(visitor.expression)
+            # Resource values are rendered as URLs which depend on the
+            # current request.
+            if not getattr(visitor, 'has_resource_values', True):
+                filter_specification.cql_string = cql_string
+        return cql_string
 
     @classmethod
     def make_order_specification(cls, order_string):
@@ -178,11 +267,18 @@ class UrlPartsConverter(object):
     def make_order_string(cls, order_specification):
         """
         Converts the given order specification to a CQL order expression.
+
+        The result is memoized on the specification.
         """
-        visitor_cls = get_order_specification_visitor(EXPRESSION_KINDS.CQL)
-        visitor = visitor_cls()
-        order_specification.accept(visitor)
-        return str(visitor.expression)
+        cql_string = order_specification.cql_string
+        if cql_string is None:
+            visitor_cls = \
+                    get_order_specification_visitor(EXPRESSION_KINDS.CQL)
+            visitor = visitor_cls()
+            order_specification.accept(visitor)
+            cql_string = str(visitor.expression)
+            order_specification.cql_string = cql_string
+        return cql_string
 
     @classmethod
     def make_slice_key(cls, start_string, size_string):
@@ -217,6 +313,35 @@ class UrlPartsConverter(object):
         size = slice_key.stop - start
         return (str(start), str(size))
 
+    @classmethod
+    def make_keyset(cls, cursor_string):
+        """
+        Converts the given opaque cursor query part to a keyset.
+
+        :return: keyset
+        :rtype: :class:`everest.querying.ordering.Keyset`
+        """
+        try:
+            cursor_bytes = base64.urlsafe_b64decode(str(cursor_string))
+            json_string = cursor_bytes.decode('utf-8')
+            is_forward, values = \
+                    json.loads(json_string,
+                               object_hook=cls.__decode_cursor_value)
+        except (TypeError, ValueError, ParseError):
+            raise ValueError('Query parameter "cursor" is invalid.')
+        return Keyset(values=values, is_forward=is_forward)
+
+    @classmethod
+    def make_keyset_string(cls, keyset):
+        """
+        Converts the given keyset to an opaque cursor query part.
+        """
+        json_string = json.dumps([keyset.is_forward, keyset.values],
+                                 default=cls.__encode_cursor_value,
+                                 separators=(',', ':'))
+        return base64.urlsafe_b64encode(
+                            json_string.encode('utf-8')).decode('ascii')
+
     @classmethod
     def make_refs_options(cls, refs_string):
         """
@@ -227,3 +352,25 @@ class UrlPartsConverter(object):
             return parse_refs(refs_string)
         except ParseException as err:
             raise ValueError('Refs string has errors. %s' % err)
+
+    @staticmethod
+    def __encode_cursor_value(value):
+        # Dates and datetimes are encoded as tagged ISO 8601 strings.
+        if isinstance(value, datetime.datetime):
+            result = dict(datetime=value.isoformat())
+        elif isinstance(value, datetime.date):
+            result = dict(date=value.isoformat())
+        else:
+            raise TypeError('Can not encode cursor value "%s".' % value)
+        return result
+
+    @staticmethod
+    def __decode_cursor_value(value_map):
+        if 'datetime' in value_map:
+            result = parse_date(value_map['datetime'],
+                                default_timezone=None)
+        elif 'date' in value_map:
+            result = parse_date(value_map['date']).date()
+        else:
+            result = value_map
+        return result
@@ -7,6 +7,7 @@ See LICENSE.txt for licensing, CONTRIBUTORS.txt for contributor information.
 Created on Oct 7, 2011.
 """
 from collections import MutableSet
+from collections import OrderedDict
 from everest.querying.interfaces import IFilterSpecificationVisitor
 from everest.querying.interfaces import IOrderSpecificationVisitor
 from everest.repositories.interfaces import IRepositoryManager
@@ -14,6 +15,7 @@ from functools import update_wrapper
 from pyramid.compat import NativeIO
 from pyramid.compat import iteritems_
 from pyramid.threadlocal import get_current_registry
+from threading import Lock
 from weakref import WeakKeyDictionary
 from weakref import ref
 import re
@@ -24,6 +26,7 @@ import functools
 __docformat__ = 'reStructuredText en'
 __all__ = ['BidirectionalLookup',
            'EMAIL_REGEX',
+           'LruCache',
            'WeakList',
            'WeakOrderedSet',
            'check_email',
@@ -32,6 +35,7 @@ __all__ = ['BidirectionalLookup',
            'get_filter_specification_visitor',
            'get_nested_attribute',
            'get_order_specification_visitor',
+           'get_registry_lru_cache',
            'get_repository_manager',
            'get_traceback',
            'id_generator',
@@ -290,6 +294,84 @@ class BidirectionalLookup(object):
         self.__right.clear()
 
 
+class LruCache(object):
+    """
+    Bounded, thread-safe mapping which discards the least recently used
+    item when full.
+    """
+
+    def __init__(self, max_size):
+        """
+        :param int max_size: maximum number of items to hold.
+        """
+        self.__max_size = max_size
+        self.__items = OrderedDict()
+        self.__lock = Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value cached for the given key, marking it as the most
+        recently used item, or the given default value if the key is not
+        cached.
+        """
+        with self.__lock:
+            try:
+                value = self.__items.pop(key)
+            except KeyError:
+                value = default
+            else:
+                self.__items[key] = value
+        return value
+
+    def set(self, key, value):
+        """
+        Caches the given value for the given key, discarding the least
+        recently used item if the cache is full.
+        """
+        with self.__lock:
+            self.__items.pop(key, None)
+            if len(self.__items) >= self.__max_size:
+                self.__items.popitem(last=False)
+            self.__items[key] = value
+
+    def clear(self):
+        with self.__lock:
+            self.__items.clear()
+
+    def __contains__(self, key):
+        return key in self.__items
+
+    def __len__(self):
+        return len(self.__items)
+
+    @property
+    def max_size(self):
+        return self.__max_size
+
+
+_registry_cache_lock = Lock()
+
+
+def get_registry_lru_cache(name, max_size):
+    """
+    Returns the :class:`LruCache` with the given name which is kept on the
+    current registry, creating it with the given maximum size if needed.
+
+    Use this for caching values which depend on the utilities registered
+    with the registry (e.g., the specification factories).
+    """
+    reg = get_current_registry()
+    caches = reg.__dict__.get('_everest_lru_caches')
+    cache = None if caches is None else caches.get(name)
+    if cache is None:
+        with _registry_cache_lock:
+            caches = reg.__dict__.setdefault('_everest_lru_caches', {})
+            cache = caches.get(name)
+            if cache is None:
+                cache = caches[name] = LruCache(max_size)
+    return cache
+
+
 class WeakList(list):
     """
     List containing weakly referenced items.
@@ -29,6 +29,7 @@ from everest.mime import get_registered_mime_type_for_name
 from everest.mime import get_registered_mime_type_for_string
 from everest.representers.utils import UpdatedRepresenterConfigurationContext
 from everest.representers.utils import as_representer
+from everest.repositories.utils import read_only
 from everest.resources.system import UserMessageMember
 from everest.resources.utils import resource_to_url
 from everest.url import UrlPartsConverter
@@ -289,6 +290,13 @@ class GetResourceView(RepresentingResourceView): # still abstract pylint: disabl
         RepresentingResourceView.__init__(self, resource, request, **kw)
 
     def __call__(self):
+        # GET requests do not modify resources, so we flag all repository
+        # access as read only (which allows repositories to route queries
+        # to read replicas).
+        with read_only():
+            return self.__process()
+
+    def __process(self):
         self._logger.debug('Request URL: %s.', self.request.url)
         try:
             if self._enable_messaging:
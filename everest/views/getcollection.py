@@ -9,6 +9,7 @@ Created on Oct 7, 2011.
 from copy import deepcopy
 
 from everest.batch import Batch
+from everest.querying.ordering import Keyset
 from everest.resources.base import Link
 from everest.url import UrlPartsConverter
 from everest.utils import get_traceback
@@ -29,7 +30,9 @@ class GetCollectionView(GetResourceView):
         try:
             self.__filter_collection()
             self.__order_collection()
-            self.__slice_collection()
+            use_keyset = self.__keyset_collection()
+            if not use_keyset:
+                self.__slice_collection()
         except ValueError as err:
             result = self._handle_unknown_exception(err.args[0],
                                                     get_traceback())
@@ -40,29 +43,80 @@ class GetCollectionView(GetResourceView):
                 # to guarantee an order on the result set. This should not
                 # be reflected in the links' URLs.
                 self.context.order = deepcopy(self.context.default_order)
-            # Build batch links.
-            batch = self.__create_batch()
             self_link = Link(self.context, 'self', self.context.title)
             self.context.add_link(self_link)
-            if batch.index > 0:
-                first_link = self.__create_nav_link(batch.first, 'first',
-                                                    not needs_default_order)
-                self.context.add_link(first_link)
-            if not batch.previous is None:
-                prev_link = self.__create_nav_link(batch.previous, 'previous',
-                                                   not needs_default_order)
-                self.context.add_link(prev_link)
-            if not batch.next is None:
-                next_link = self.__create_nav_link(batch.next, 'next',
-                                                   not needs_default_order)
-                self.context.add_link(next_link)
-            if not batch.index == batch.number - 1:
-                last_link = self.__create_nav_link(batch.last, 'last',
-                                                   not needs_default_order)
-                self.context.add_link(last_link)
+            if use_keyset:
+                # The keyset cursors hold the values of the order keys,
+                # so the links have to keep the requested order; only an
+                # injected default order is cleared.
+                self.__add_keyset_nav_links(needs_default_order)
+            else:
+                self.__add_batch_nav_links(not needs_default_order)
             result = self.context
         return result
 
+    def __add_batch_nav_links(self, reset_order):
+        batch = self.__create_batch()
+        if batch.index > 0:
+            first_link = self.__create_nav_link(batch.first, 'first',
+                                                reset_order)
+            self.context.add_link(first_link)
+        if not batch.previous is None:
+            prev_link = self.__create_nav_link(batch.previous, 'previous',
+                                               reset_order)
+            self.context.add_link(prev_link)
+        if not batch.next is None:
+            next_link = self.__create_nav_link(batch.next, 'next',
+                                               reset_order)
+            self.context.add_link(next_link)
+        if not batch.index == batch.number - 1:
+            last_link = self.__create_nav_link(batch.last, 'last',
+                                               reset_order)
+            self.context.add_link(last_link)
+
+    def __add_keyset_nav_links(self, reset_order):
+        keyset = self.context.keyset
+        size = self.context.slice.stop
+        # Fetch one more entity than requested to find out if there are
+        # more entities in paging direction. The entities on the page are
+        # passed on to the context so they are not fetched again when the
+        # context is rendered.
+        agg = self.context.get_aggregate()
+        self.context.slice = slice(0, size + 1)
+        ents = list(agg.iterator())
+        self.context.slice = slice(0, size)
+        has_more = len(ents) > size
+        if keyset.is_forward:
+            ents = ents[:size]
+            has_previous = not keyset.values is None
+            has_next = has_more
+        else:
+            ents = ents[-size:]
+            has_previous = has_more
+            has_next = not keyset.values is None
+        self.context.set_page(ents)
+        if has_previous:
+            first_link = self.__create_keyset_nav_link(Keyset(), 'first',
+                                                       reset_order)
+            self.context.add_link(first_link)
+            if len(ents) > 0:
+                values = Keyset.get_values(agg.order, ents[0])
+                prev_link = self.__create_keyset_nav_link(
+                                            Keyset(values, is_forward=False),
+                                            'previous', reset_order)
+                self.context.add_link(prev_link)
+        if has_next:
+            if len(ents) > 0:
+                values = Keyset.get_values(agg.order, ents[-1])
+                next_link = self.__create_keyset_nav_link(
+                                            Keyset(values, is_forward=True),
+                                            'next', reset_order)
+                self.context.add_link(next_link)
+            last_link = self.__create_keyset_nav_link(
+                                            Keyset(is_forward=False),
+                                            'last', reset_order)
+            self.context.add_link(last_link)
+
     def __create_batch(self):
         start = self.context.slice.start
         size = self.context.slice.stop - start
@@ -77,6 +131,13 @@ class GetCollectionView(GetResourceView):
                                  batch.start + batch.size)
         return Link(coll_clone, rel, self.context.title)
 
+    def __create_keyset_nav_link(self, keyset, rel, reset_order):
+        coll_clone = self.context.clone()
+        if reset_order:
+            coll_clone.order = None
+        coll_clone.keyset = keyset
+        return Link(coll_clone, rel, self.context.title)
+
     def __filter_collection(self):
         query_string = self.request.params.get('q')
         if not query_string is None:
@@ -91,8 +152,24 @@ class GetCollectionView(GetResourceView):
                 UrlPartsConverter.make_order_specification(order_string)
             self.context.order = order_spec
 
-    def __slice_collection(self):
-        start_string = self.request.params.get('start')
+    def __keyset_collection(self):
+        cursor_string = self.request.params.get('cursor')
+        if not cursor_string is None:
+            keyset = UrlPartsConverter.make_keyset(cursor_string)
+        elif self.context.keyset_paging \
+             and self.request.params.get('start') is None:
+            keyset = Keyset()
+        else:
+            keyset = None
+        if not keyset is None:
+            self.context.keyset = keyset
+            # Keyset pages are always sliced from the keyset position.
+            self.__slice_collection(start_string='0')
+        return not keyset is None
+
+    def __slice_collection(self, start_string=None):
+        if start_string is None:
+            start_string = self.request.params.get('start')
         if start_string is None:
             start_string = '0'
         size_string = self.request.params.get('size')